@@ -0,0 +1,267 @@
+import os
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+from .embedding_cache import EmbeddingCache, hash_file
+from .store import ResultsStore
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')
+
+# Claves pesadas de los resultados que no se mantienen en memoria
+HEAVY_RESULT_KEYS = ('processed_files', 'no_face_files', 'error_files')
+
+class Catalog:
+    """
+    In-memory index of the input images and of group membership.
+
+    It is filled from disk once (first access) and then kept current by the
+    routes that change the workspace (upload, delete, process, clear), so read
+    endpoints answer without scanning folders or querying the results store.
+    ``watch`` optionally follows external changes to the input folder.
+    Inputs also carry their content hash (computed lazily for files that did
+    not arrive through an upload) so duplicate uploads can be detected; with
+    a ``cache`` the hashes persist across restarts. ``upload_lock`` serializes
+    the duplicate check and registration of uploads to this catalog.
+    """
+
+    def __init__(self, input_folder: str, output_folder: str, store: ResultsStore,
+                 cache: Optional[EmbeddingCache] = None):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.store = store
+        self.cache = cache
+        self.upload_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._hash_lock = threading.Lock()
+        self._loaded = False
+        self._inputs: Dict[str, Optional[str]] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._unhashed: Set[str] = set()
+        self._groups: Dict[str, List[str]] = {}
+        # Conjuntos por grupo para comprobar pertenencia, creados al consultarlos
+        self._group_sets: Dict[str, Set[str]] = {}
+        self._grouped_count = 0
+        self._results: Optional[Dict] = None
+        self._watcher: Optional[threading.Thread] = None
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reload()
+
+    def reload(self):
+        """
+        Rebuild the catalog from the filesystem.
+        """
+        with self._lock:
+            self._inputs = {}
+            self._by_hash = {}
+            self._unhashed = set()
+            if os.path.exists(self.input_folder):
+                for filename in sorted(os.listdir(self.input_folder)):
+                    if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                        self._inputs[filename] = None
+                        self._unhashed.add(filename)
+
+            results = None
+            try:
+                results = self.store.results()
+            except Exception as e:
+                logger.error(f"Error loading previous results: {e}")
+            self._set_results(results)
+            self._loaded = True
+        logger.info(f"📚 Catalog loaded: {len(self._inputs)} inputs, {len(self._groups)} groups")
+
+    def _set_results(self, results: Optional[Dict]):
+        self._group_sets = {}
+        if results is None:
+            self._results = None
+            self._groups = {}
+            self._grouped_count = 0
+            return
+        self._results = {k: v for k, v in results.items() if k not in HEAVY_RESULT_KEYS}
+        self._groups = {group['name']: list(group['images']) for group in results.get('groups', [])}
+        self._grouped_count = sum(len(images) for images in self._groups.values())
+
+    def set_results(self, results: Dict):
+        """
+        Replace group membership with the results of a finished grouping run.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if results.get('success'):
+                self._set_results(results)
+
+    def add_input(self, filename: str, content_hash: Optional[str] = None):
+        with self._lock:
+            self._ensure_loaded()
+            self._forget_hash(filename)
+            self._inputs[filename] = content_hash
+            if content_hash is None:
+                self._unhashed.add(filename)
+            else:
+                self._unhashed.discard(filename)
+                self._by_hash.setdefault(content_hash, filename)
+                if self.cache is not None:
+                    self.cache.remember_file_hash(os.path.join(self.input_folder, filename), content_hash)
+
+    def remove_input(self, filename: str):
+        with self._lock:
+            self._ensure_loaded()
+            self._forget_hash(filename)
+            self._unhashed.discard(filename)
+            self._inputs.pop(filename, None)
+
+    def _forget_hash(self, filename: str):
+        content_hash = self._inputs.get(filename)
+        if content_hash is not None and self._by_hash.get(content_hash) == filename:
+            del self._by_hash[content_hash]
+
+    def _hash(self, path: str) -> str:
+        return self.cache.file_hash(path) if self.cache is not None else hash_file(path)
+
+    def index_hashes(self):
+        """
+        Hash the inputs not hashed yet (only new or changed files are read when
+        there is a cache). Blocking; call off the event loop.
+        """
+        # Se hashea fuera de self._lock para no bloquear las consultas de las
+        # páginas; _hash_lock solo evita que dos llamadas hasheen lo mismo
+        with self._hash_lock:
+            with self._lock:
+                self._ensure_loaded()
+                pending = list(self._unhashed)
+            hashed = {}
+            for filename in pending:
+                try:
+                    hashed[filename] = self._hash(os.path.join(self.input_folder, filename))
+                except OSError:
+                    continue
+            with self._lock:
+                for filename, file_hash in hashed.items():
+                    # Pudo borrarse o reemplazarse mientras tanto
+                    if filename not in self._unhashed:
+                        continue
+                    self._unhashed.discard(filename)
+                    self._inputs[filename] = file_hash
+                    self._by_hash.setdefault(file_hash, filename)
+
+    def find_by_hash(self, content_hash: str) -> Optional[str]:
+        """
+        Name of an input with the given content hash, or None. Hashes inputs
+        not hashed yet on the way; blocking, call off the event loop.
+        """
+        self.index_hashes()
+        with self._lock:
+            return self._by_hash.get(content_hash)
+
+    def clear(self):
+        with self._lock:
+            self._inputs = {}
+            self._by_hash = {}
+            self._unhashed = set()
+            self._set_results(None)
+            self._loaded = True
+
+    # Consultas
+
+    @property
+    def input_count(self) -> int:
+        self._ensure_loaded()
+        return len(self._inputs)
+
+    @property
+    def group_count(self) -> int:
+        self._ensure_loaded()
+        return len(self._groups)
+
+    @property
+    def grouped_count(self) -> int:
+        self._ensure_loaded()
+        return self._grouped_count
+
+    @property
+    def results(self) -> Optional[Dict]:
+        """
+        Summary of the last run (without the per-file tables).
+        """
+        self._ensure_loaded()
+        return self._results
+
+    def inputs_page(self, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[str], int]:
+        with self._lock:
+            self._ensure_loaded()
+            filenames = list(self._inputs)
+        end = None if limit is None else offset + limit
+        return filenames[offset:end], len(filenames)
+
+    def group_images(self, group_name: str) -> Optional[List[str]]:
+        self._ensure_loaded()
+        return self._groups.get(group_name)
+
+    def in_group(self, group_name: str, filename: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            members = self._group_sets.get(group_name)
+            if members is None:
+                images = self._groups.get(group_name)
+                if images is None:
+                    return False
+                members = self._group_sets[group_name] = set(images)
+        return filename in members
+
+    def groups(self) -> Dict[str, List[str]]:
+        self._ensure_loaded()
+        return self._groups
+
+    def groups_page(self, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Tuple[str, List[str]]], int]:
+        with self._lock:
+            self._ensure_loaded()
+            names = list(self._groups)
+        end = None if limit is None else offset + limit
+        return [(name, self._groups[name]) for name in names[offset:end]], len(names)
+
+    # Cambios externos
+
+    def watch(self) -> bool:
+        """
+        Follow external changes to the input folder and results store in a
+        background thread. Requires the optional ``watchfiles`` package;
+        returns False when it is not installed.
+        """
+        try:
+            import watchfiles
+        except ImportError:
+            logger.warning("watchfiles is not installed; catalog will not follow external changes")
+            return False
+
+        if self._watcher is not None:
+            return True
+
+        # Las confirmaciones del store escriben primero en el WAL de SQLite
+        store_files = {os.path.abspath(self.store.db_path), os.path.abspath(self.store.db_path) + "-wal"}
+        input_folder = os.path.abspath(self.input_folder)
+
+        def run():
+            paths = [input_folder, os.path.abspath(self.store.path)]
+            for changes in watchfiles.watch(*paths, recursive=False):
+                for change, path in changes:
+                    path = os.path.abspath(path)
+                    if path in store_files:
+                        self.reload()
+                        break
+                    if os.path.dirname(path) != input_folder:
+                        continue
+                    filename = os.path.basename(path)
+                    if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                        continue
+                    if change == watchfiles.Change.deleted:
+                        self.remove_input(filename)
+                    else:
+                        self.add_input(filename)
+
+        self._watcher = threading.Thread(target=run, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"👀 Watching {input_folder} for external changes")
+        return True
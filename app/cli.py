@@ -0,0 +1,342 @@
+"""
+Headless batch entry point: groups arbitrary folders or file lists without
+starting the web app (FastAPI is never imported).
+
+    # Single pass
+    python -m app.cli group /archive/2019 /archive/2020 --recursive --output runs/all
+
+    # Four independent shards (processes or machines), then merge
+    python -m app.cli group /archive --recursive --shard 0/4 --output runs/shard-0
+    ...
+    python -m app.cli merge runs/shard-0 runs/shard-1 runs/shard-2 runs/shard-3 --output runs/merged
+
+Every ``--output`` is a self-contained workspace: ``inputs/`` (symlinks to the
+selected originals), ``groups/`` (one folder per person), ``store/`` (results
+store) and ``embedding_cache.sqlite3``. Running ``group`` again on the same
+workspace only processes new files; a merged workspace can be extended the
+same way.
+"""
+import os
+import sys
+import json
+import zlib
+import shutil
+import argparse
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+from .clustering import cluster_embeddings
+from .embedding_cache import EmbeddingCache
+from .extraction import DEFAULT_BATCH_SIZE
+from .grouping import CLUSTERING_MODES, DETECTOR_CASCADES, SUPPORTED_EXTENSIONS, group_faces
+from .groups import FaceGroups
+from .materialize import DEFAULT_STRATEGY, STRATEGIES as MATERIALIZATION_STRATEGIES, materialize
+from .store import ResultsStore
+from .workspaces import workspace_paths
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.6
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse ``"i/N"`` (0 <= i < N).
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected i/N")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected 0 <= i < N")
+    return index, count
+
+def collect_images(paths: Iterable[str], recursive: bool = False) -> List[str]:
+    """
+    Absolute paths of the supported images among ``paths`` (files, or folders
+    scanned one level deep or recursively), sorted and without duplicates.
+    """
+    found: Set[str] = set()
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for root, _, files in os.walk(path):
+                    found.update(os.path.join(root, name) for name in files
+                                 if name.lower().endswith(SUPPORTED_EXTENSIONS))
+            else:
+                found.update(entry.path for entry in os.scandir(path)
+                             if entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS))
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            found.add(path)
+        else:
+            logger.warning(f"⚠️ Skipping {path}: not a folder or supported image")
+    return sorted(os.path.abspath(path) for path in found)
+
+def shard_key(source: str, roots: Iterable[str]) -> str:
+    """
+    Path of ``source`` relative to the outermost of ``roots`` (the folders it
+    was collected from) that contains it, or its file name if none does, so
+    shards do not depend on where each machine mounts the archive.
+    """
+    for root in sorted(roots, key=len):
+        if source.startswith(root.rstrip(os.sep) + os.sep):
+            return os.path.relpath(source, root).replace(os.sep, '/')
+    return os.path.basename(source)
+
+def in_shard(key: str, shard: Tuple[int, int]) -> bool:
+    # Hash estable de la clave: un archivo nuevo no mueve a los demás de shard
+    index, count = shard
+    return zlib.crc32(key.encode('utf-8')) % count == index
+
+def _unique_name(filename: str, taken: Set[str]) -> str:
+    if filename not in taken:
+        return filename
+    stem, extension = os.path.splitext(filename)
+    counter = 1
+    while f"{stem}-{counter}{extension}" in taken:
+        counter += 1
+    return f"{stem}-{counter}{extension}"
+
+def stage_inputs(sources: Iterable[str], folder: str) -> Dict[str, str]:
+    """
+    Link every source into ``folder`` under a flat, unique name, reusing the
+    link (and name) of sources staged by earlier runs so incremental runs
+    recognise them. Returns ``{absolute source path: staged name}``.
+    """
+    os.makedirs(folder, exist_ok=True)
+    staged: Dict[str, str] = {}
+    taken: Set[str] = set()
+    for entry in os.scandir(folder):
+        taken.add(entry.name)
+        if entry.is_symlink():
+            staged[os.readlink(entry.path)] = entry.name
+
+    names = {}
+    for source in sources:
+        source = os.path.abspath(source)
+        if source not in staged:
+            name = _unique_name(os.path.basename(source), taken)
+            os.symlink(source, os.path.join(folder, name))
+            taken.add(name)
+            staged[source] = name
+        names[source] = staged[source]
+    return names
+
+def _read_file_list(path: str) -> List[str]:
+    handle = sys.stdin if path == "-" else open(path)
+    try:
+        return [line.strip() for line in handle if line.strip()]
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def run_group(paths: List[str], output: str, recursive: bool = False, files_from: Optional[str] = None,
+              shard: Optional[Tuple[int, int]] = None, cache_path: Optional[str] = None,
+              **params) -> Dict:
+    """
+    Stage the selected images (the ``shard`` share of them, if given) in the
+    ``output`` workspace and group them with ``group_faces``.
+    """
+    sources = collect_images(paths, recursive)
+    if files_from:
+        sources = sorted(set(sources) | set(collect_images(_read_file_list(files_from))))
+    if shard is not None:
+        roots = [os.path.abspath(path) for path in paths if os.path.isdir(path)]
+        sources = [source for source in sources if in_shard(shard_key(source, roots), shard)]
+    logger.info(f"📁 {len(sources)} images selected" + (f" for shard {shard[0]}/{shard[1]}" if shard else ""))
+
+    workspace = workspace_paths(output)
+    stage_inputs(sources, workspace['inputs'])
+
+    store = ResultsStore(workspace['store'])
+    cache = EmbeddingCache(cache_path or workspace['cache']) if params.get('use_cache', True) else None
+    try:
+        results = group_faces(input_folder=workspace['inputs'], output_folder=workspace['groups'],
+                              store=store, cache=cache, **params)
+    finally:
+        store.close()
+    if shard is not None:
+        results['shard'] = f"{shard[0]}/{shard[1]}"
+    return results
+
+def merge_groups(shard_groups: List[FaceGroups], threshold: float = DEFAULT_THRESHOLD) -> List[np.ndarray]:
+    """
+    Match groups across shards by centroid similarity. Returns, per shard, the
+    merged label of each of its groups; labels follow first appearance.
+    Centroids are clustered all at once, so the result does not depend on the
+    order in which shards finished.
+    """
+    sizes = [len(groups) for groups in shard_groups]
+    dims = {groups.dim for groups in shard_groups if len(groups)}
+    if not dims:
+        return [np.zeros(0, dtype=np.int64) for _ in shard_groups]
+    if len(dims) > 1:
+        raise ValueError(f"Shards use different embedding sizes: {sorted(dims)}")
+    centroids = np.concatenate([groups.centroids for groups in shard_groups if len(groups)])
+    labels = cluster_embeddings(centroids, threshold)
+    return np.split(labels, np.cumsum(sizes)[:-1])
+
+def run_merge(shards: List[str], output: str, threshold: float = DEFAULT_THRESHOLD,
+              materialization: str = DEFAULT_STRATEGY) -> Dict:
+    """
+    Combine shard workspaces into a new workspace at ``output`` whose groups
+    are the shard groups merged by ``merge_groups``. Faces, embeddings and
+    summed centroids are carried over, so no image is processed again.
+    Shards without results (no images selected) are skipped.
+    """
+    opened = [ResultsStore(workspace_paths(shard)['store']) for shard in shards]
+    try:
+        # Un shard sin imágenes seleccionadas no llega a guardar resultados: no aporta nada
+        present = []
+        for shard, store in zip(shards, opened):
+            if store.summary() is None:
+                logger.warning(f"⚠️ Skipping {shard}: no grouping results")
+            else:
+                present.append((shard, store))
+        if not present:
+            raise ValueError("No grouping results in any shard")
+        shards = [shard for shard, _ in present]
+        stores = [store for _, store in present]
+
+        shard_groups = []
+        for shard, store in zip(shards, stores):
+            groups = store.load_groups()
+            if groups is None:
+                raise ValueError(f"No grouping results in {shard}")
+            shard_groups.append(groups)
+        shard_labels = merge_groups(shard_groups, threshold)
+
+        workspace = workspace_paths(output)
+        if os.path.exists(workspace['groups']):
+            shutil.rmtree(workspace['groups'])
+        os.makedirs(workspace['groups'])
+        merged_store = ResultsStore(workspace['store'])
+        merged_store.clear()
+
+        # Centroides fusionados: sumas y conteos acumulados de los grupos de cada shard
+        group_count = int(max((labels.max() + 1 for labels in shard_labels if len(labels)), default=0))
+        dim = next(groups.dim for groups in shard_groups if len(groups)) if group_count else 0
+        sums = np.zeros((group_count, dim), dtype=np.float32)
+        counts = np.zeros(group_count, dtype=np.int64)
+        for groups, labels in zip(shard_groups, shard_labels):
+            if not len(groups):
+                # Shard con imágenes pero sin rostros
+                continue
+            np.add.at(sums, labels, groups.sums)
+            np.add.at(counts, labels, groups.counts)
+        names = [f"person_{label + 1}" for label in range(group_count)]
+        images: List[List[str]] = [[] for _ in range(group_count)]
+
+        # Originales de cada shard enlazados en el workspace unido; el mismo nombre
+        # en dos shards recibe un sufijo
+        shard_sources = []
+        for shard, store in zip(shards, stores):
+            shard_inputs = workspace_paths(shard)['inputs']
+            shard_sources.append({filename: os.readlink(os.path.join(shard_inputs, filename))
+                                  for filename in store.seen_files()})
+        staged = stage_inputs([source for sources in shard_sources for source in sources.values()],
+                              workspace['inputs'])
+
+        stats = {"shards": len(shards), "shard_groups": sum(len(groups) for groups in shard_groups),
+                 "total_groups": group_count, "processed": 0, "no_face": 0, "faces": 0, "materialized": {}}
+        for store, labels, sources in zip(stores, shard_labels, shard_sources):
+            embeddings = store.embeddings()
+            for filename, faces in store.grouped_faces():
+                name = staged[sources[filename]]
+                face_groups = [int(labels[face['group_idx']]) for face in faces]
+                memberships = []
+                for group_idx in dict.fromkeys(face_groups):
+                    if materialization == "virtual":
+                        destination = os.path.join(workspace['inputs'], name)
+                    else:
+                        group_folder = os.path.join(workspace['groups'], names[group_idx])
+                        os.makedirs(group_folder, exist_ok=True)
+                        destination = os.path.join(group_folder, name)
+                    used = materialize(os.path.join(workspace['inputs'], name), destination, materialization)
+                    stats["materialized"][used] = stats["materialized"].get(used, 0) + 1
+                    images[group_idx].append(name)
+                    memberships.append((group_idx, destination))
+                merged_store.add_image(name, [dict(face, embedding=embeddings[face['id']], group_idx=group_idx)
+                                              for face, group_idx in zip(faces, face_groups)], memberships)
+                stats["processed"] += 1
+                stats["faces"] += len(faces)
+            for filename in store.no_face_files():
+                merged_store.add_no_face(staged[sources[filename]])
+                stats["no_face"] += 1
+
+        merged = FaceGroups.from_arrays(names, images, sums, counts)
+        summary = {
+            'success': True,
+            'message': f"Merged {stats['shard_groups']} groups from {len(shards)} shards into {group_count} groups",
+            'mode': "merge",
+            'materialization': materialization,
+            'output_folder': workspace['groups'],
+            'stats': stats
+        }
+        try:
+            merged_store.save_groups(merged)
+            merged_store.save_summary(summary)
+            merged_store.commit()
+        finally:
+            merged_store.close()
+        logger.info(f"🔗 {summary['message']}")
+        return dict(summary, groups=merged.to_list(workspace['groups']))
+    finally:
+        for store in opened:
+            store.close()
+
+def _print_results(results: Dict, full: bool):
+    if not full:
+        results = {k: v for k, v in results.items() if k not in ('groups', 'processed_files', 'no_face_files', 'error_files')}
+    print(json.dumps(results, indent=2, default=str))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Group faces without the web app.")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--full-output", action="store_true", help="print groups and per-file records too")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    group = commands.add_parser("group", help="group images from folders or file lists into a workspace")
+    group.add_argument("paths", nargs="*", help="image files or folders")
+    group.add_argument("--output", required=True, help="workspace folder")
+    group.add_argument("--recursive", action="store_true", help="scan folders recursively")
+    group.add_argument("--files-from", help="file with one image path per line ('-' for stdin)")
+    group.add_argument("--shard", type=parse_shard, help="process only shard i of N (e.g. 0/4)")
+    group.add_argument("--mode", choices=("incremental", "full"), default="incremental")
+    group.add_argument("--clustering", choices=CLUSTERING_MODES, default="greedy")
+    group.add_argument("--detectors", choices=sorted(DETECTOR_CASCADES), default="accurate")
+    group.add_argument("--matching", choices=("exact", "ann"), default="exact")
+    group.add_argument("--materialization", choices=MATERIALIZATION_STRATEGIES, default=DEFAULT_STRATEGY)
+    group.add_argument("--workers", type=int, help="extraction processes (all cores by default)")
+    group.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    group.add_argument("--cache", help="embedding cache path (default: inside the workspace)")
+    group.add_argument("--no-cache", action="store_true")
+
+    merge = commands.add_parser("merge", help="merge shard workspaces by centroid similarity")
+    merge.add_argument("shards", nargs="+", help="shard workspace folders")
+    merge.add_argument("--output", required=True, help="merged workspace folder")
+    merge.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    merge.add_argument("--materialization", choices=MATERIALIZATION_STRATEGIES, default=DEFAULT_STRATEGY)
+
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    try:
+        if args.command == "group":
+            if not args.paths and not args.files_from:
+                parser.error("group needs image paths or --files-from")
+            results = run_group(args.paths, args.output, recursive=args.recursive, files_from=args.files_from,
+                                shard=args.shard, cache_path=args.cache, use_cache=not args.no_cache,
+                                workers=args.workers, batch_size=args.batch_size, matching=args.matching,
+                                mode=args.mode, materialization=args.materialization,
+                                clustering=args.clustering, detectors=args.detectors)
+        else:
+            results = run_merge(args.shards, args.output, args.threshold, args.materialization)
+    except (ValueError, FileNotFoundError) as e:
+        logger.error(f"❌ {str(e)}")
+        return 1
+
+    _print_results(results, args.full_output)
+    return 0 if results.get('success') else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import numpy as np
+from typing import Iterator, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 4096 x 4096 float32 = 64 MB por bloque de similitudes
+DEFAULT_TILE_SIZE = 4096
+DEFAULT_MIN_SAMPLES = 1
+
+def _tiles(n: int, tile_size: int) -> Iterator[Tuple[int, int, int, int]]:
+    """
+    Upper-triangular blocks ``(row_start, row_end, col_start, col_end)`` of an n x n matrix.
+    """
+    for row_start in range(0, n, tile_size):
+        row_end = min(n, row_start + tile_size)
+        for col_start in range(row_start, n, tile_size):
+            yield row_start, row_end, col_start, min(n, col_start + tile_size)
+
+def _tile_neighbors(embeddings: np.ndarray, tile: Tuple[int, int, int, int],
+                    threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs ``(i, j)`` with ``i < j`` inside a tile whose similarity exceeds the
+    threshold, plus their similarities.
+    """
+    row_start, row_end, col_start, col_end = tile
+    similarities = embeddings[row_start:row_end] @ embeddings[col_start:col_end].T
+    rows, cols = np.nonzero(similarities > threshold)
+    similarities = similarities[rows, cols]
+    rows += row_start
+    cols += col_start
+    if row_start == col_start:
+        # Bloque diagonal: solo el triángulo superior (sin la diagonal)
+        upper = rows < cols
+        rows, cols, similarities = rows[upper], cols[upper], similarities[upper]
+    return rows, cols, similarities
+
+def _find(parent: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    roots = parent[nodes]
+    while True:
+        next_roots = parent[roots]
+        if np.array_equal(next_roots, roots):
+            break
+        roots = next_roots
+    # Compresión de caminos
+    parent[nodes] = roots
+    return roots
+
+def _union(parent: np.ndarray, left: np.ndarray, right: np.ndarray):
+    """
+    Vectorized union-find: merge the components of every ``(left, right)`` pair,
+    always keeping the smaller index as root.
+    """
+    while len(left):
+        left_roots = _find(parent, left)
+        right_roots = _find(parent, right)
+        pending = left_roots != right_roots
+        if not pending.any():
+            break
+        left, right = left[pending], right[pending]
+        left_roots, right_roots = left_roots[pending], right_roots[pending]
+        np.minimum.at(parent, np.maximum(left_roots, right_roots), np.minimum(left_roots, right_roots))
+
+def cluster_embeddings(embeddings: np.ndarray, threshold: float = 0.6,
+                       min_samples: int = DEFAULT_MIN_SAMPLES,
+                       tile_size: int = DEFAULT_TILE_SIZE) -> np.ndarray:
+    """
+    Cluster unit-norm embeddings in two tiled passes over the similarity matrix.
+
+    Two faces are neighbours when their cosine similarity exceeds ``threshold``.
+    Faces with at least ``min_samples`` neighbours are core points; connected
+    components of core points form the clusters (DBSCAN-style, so
+    ``min_samples=1`` is plain connected components). Every other face joins
+    the cluster of its most similar core neighbour, or becomes a cluster of
+    its own. The first pass counts neighbours, the second links them; only one
+    ``tile_size`` x ``tile_size`` block of similarities exists at a time, so
+    memory is O(n + tile_size^2).
+
+    Returns one label per face, numbered by first appearance in the input.
+    """
+    n = len(embeddings)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    # Pasada 1: número de vecinos de cada rostro
+    # (con min_samples=1 todo rostro con vecinos es núcleo y los aislados no se unen: se omite)
+    if min_samples <= 1:
+        core = np.ones(n, dtype=bool)
+    else:
+        neighbor_counts = np.zeros(n, dtype=np.int64)
+        for tile in _tiles(n, tile_size):
+            rows, cols, _ = _tile_neighbors(embeddings, tile, threshold)
+            neighbor_counts += np.bincount(rows, minlength=n)
+            neighbor_counts += np.bincount(cols, minlength=n)
+        core = neighbor_counts >= min_samples
+
+    # Pasada 2: unir núcleos vecinos y recordar el núcleo más parecido de cada borde
+    parent = np.arange(n, dtype=np.int64)
+    best_core = np.full(n, -1, dtype=np.int64)
+    best_similarity = np.full(n, -np.inf, dtype=np.float32)
+    for tile in _tiles(n, tile_size):
+        rows, cols, similarities = _tile_neighbors(embeddings, tile, threshold)
+        both_core = core[rows] & core[cols]
+        _union(parent, rows[both_core], cols[both_core])
+
+        for border, other in ((rows, cols), (cols, rows)):
+            mask = ~core[border] & core[other]
+            if not mask.any():
+                continue
+            border_idx, other_idx, sims = border[mask], other[mask], similarities[mask]
+            # Mejor vecino núcleo por rostro dentro del bloque
+            order = np.lexsort((-sims, border_idx))
+            border_idx, other_idx, sims = border_idx[order], other_idx[order], sims[order]
+            first = np.concatenate(([True], border_idx[1:] != border_idx[:-1]))
+            border_idx, other_idx, sims = border_idx[first], other_idx[first], sims[first]
+            better = sims > best_similarity[border_idx]
+            best_core[border_idx[better]] = other_idx[better]
+            best_similarity[border_idx[better]] = sims[better]
+
+    roots = _find(parent, np.arange(n, dtype=np.int64))
+    attached = ~core & (best_core >= 0)
+    roots[attached] = roots[best_core[attached]]
+
+    # Etiquetas en orden de primera aparición
+    _, first_index, inverse = np.unique(roots, return_index=True, return_inverse=True)
+    rank = np.empty(len(first_index), dtype=np.int64)
+    rank[np.argsort(first_index)] = np.arange(len(first_index))
+    labels = rank[inverse]
+    logger.info(f"🧩 Clustered {n} faces into {len(first_index)} clusters")
+    return labels
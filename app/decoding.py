@@ -0,0 +1,115 @@
+import math
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+import numpy as np
+from PIL import Image, ImageOps
+import logging
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Lado máximo de la imagen sobre la que corre el detector
+DEFAULT_MAX_SIDE = 1600
+# Imágenes decodificadas por adelantado mientras el modelo trabaja
+DEFAULT_PREFETCH = 2
+
+_decoder: Optional[ThreadPoolExecutor] = None
+
+DECODE_SECONDS = REGISTRY.histogram("image_decode_seconds", "Image decode and downscale time")
+
+class DecodedImage:
+    """
+    An image decoded once, upright (EXIF orientation applied), as BGR arrays:
+    ``full`` at original resolution for cropping and alignment, and
+    ``detection`` with its longest side capped at ``max_side``. ``scale`` maps
+    detection coordinates back to the original (``full = detection * scale``).
+    """
+
+    def __init__(self, full: np.ndarray, detection: np.ndarray, scale: float):
+        self.full = full
+        self.detection = detection
+        self.scale = scale
+
+    def to_original(self, facial_area: Dict) -> Dict:
+        """
+        Map a facial area found on ``detection`` to ``full`` coordinates.
+        """
+        if self.scale == 1.0:
+            return dict(facial_area)
+        mapped = {}
+        for key, value in facial_area.items():
+            if value is None:
+                mapped[key] = None
+            elif isinstance(value, (tuple, list)):
+                mapped[key] = [int(round(v * self.scale)) for v in value]
+            else:
+                mapped[key] = int(round(value * self.scale))
+        return mapped
+
+def decode_image(image_path: str, max_side: int = DEFAULT_MAX_SIDE) -> DecodedImage:
+    with DECODE_SECONDS.time():
+        return _decode(image_path, max_side)
+
+def _decode(image_path: str, max_side: int) -> DecodedImage:
+    with Image.open(image_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        full = np.ascontiguousarray(np.asarray(image)[:, :, ::-1])
+
+        longest = max(image.size)
+        if not max_side or longest <= max_side:
+            return DecodedImage(full, full, 1.0)
+        scale = longest / max_side
+        size = (max(1, round(image.width / scale)), max(1, round(image.height / scale)))
+        small = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    detection = np.ascontiguousarray(np.asarray(small)[:, :, ::-1])
+    return DecodedImage(full, detection, scale)
+
+def iter_decoded(image_paths: Sequence[str], max_side: int = DEFAULT_MAX_SIDE,
+                 prefetch: int = DEFAULT_PREFETCH) -> Iterator[Tuple[str, Union[DecodedImage, Exception]]]:
+    """
+    Decode images in order, keeping up to ``prefetch`` decodes running ahead
+    on a thread pool (PIL releases the GIL while decoding). Failures are
+    yielded as the exception instead of a ``DecodedImage``.
+    """
+    global _decoder
+    if _decoder is None:
+        _decoder = ThreadPoolExecutor(max_workers=max(1, prefetch), thread_name_prefix="decode")
+
+    futures = {}
+    for i, image_path in enumerate(image_paths):
+        for j in range(i, min(len(image_paths), i + prefetch + 1)):
+            if j not in futures:
+                # En una copia del contexto, para que el tiempo cuente en la ejecución que lo pidió
+                futures[j] = _decoder.submit(contextvars.copy_context().run, decode_image, image_paths[j], max_side)
+        try:
+            yield image_path, futures.pop(i).result()
+        except Exception as e:
+            yield image_path, e
+
+def crop_face(image: np.ndarray, facial_area: Dict, align: bool = True) -> np.ndarray:
+    """
+    Crop a face from a BGR image, rotating it first so the eyes are level
+    (same rotation as DeepFace's ``align_img_wrt_eyes``) when ``align`` is set
+    and both eyes are known.
+    """
+    x, y, w, h = facial_area['x'], facial_area['y'], facial_area['w'], facial_area['h']
+    left_eye, right_eye = facial_area.get('left_eye'), facial_area.get('right_eye')
+    if not (align and left_eye and right_eye):
+        return image[max(0, y):y + h, max(0, x):x + w]
+
+    # Ventana holgada alrededor del rostro para que el giro no deje esquinas vacías
+    cx, cy = x + w / 2, y + h / 2
+    half = max(w, h) * 0.75
+    x0, y0 = max(0, int(cx - half)), max(0, int(cy - half))
+    x1, y1 = min(image.shape[1], int(math.ceil(cx + half))), min(image.shape[0], int(math.ceil(cy + half)))
+    window = image[y0:y1, x0:x1]
+
+    angle = float(np.degrees(np.arctan2(left_eye[1] - right_eye[1], left_eye[0] - right_eye[0])))
+    rotated = np.asarray(Image.fromarray(np.ascontiguousarray(window)).rotate(
+        angle, resample=Image.BICUBIC, center=(cx - x0, cy - y0)))
+
+    top, left = max(0, int(round(cy - y0 - h / 2))), max(0, int(round(cx - x0 - w / 2)))
+    return rotated[top:top + h, left:left + w]
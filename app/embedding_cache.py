@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_CACHE_PATH = "embedding_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 200_000
+COMMIT_EVERY = 256
+
+def hash_file(path: str) -> str:
+    """
+    Return the SHA-256 hex digest of a file's contents, read in fixed-size chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed store of face embeddings backed by SQLite.
+
+    Entries are keyed by the hash of the image bytes plus the embedding
+    settings, so renamed or re-uploaded files still hit and a change of model
+    or detector never returns stale vectors. Each entry holds every face found
+    in the image (embeddings as one float32 matrix, boxes and confidences as
+    JSON); "no face" results are cached as an empty list. The least recently
+    used entries are evicted once the store grows beyond ``max_entries``.
+
+    Content hashes of files are remembered too, by absolute path, size and
+    modification time, so an unchanged file is never read twice to hash it.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS face_embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " embeddings BLOB NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " faces TEXT NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_face_embeddings_last_access ON face_embeddings (last_access)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " hash TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM face_embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(content_hash: str, settings: Dict) -> str:
+        """
+        Combine an image content hash with the embedding settings into a cache key.
+        """
+        payload = content_hash + json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def file_hash(self, path: str) -> str:
+        """
+        Content hash of a file, read from disk only if the file is new or
+        changed since it was last hashed.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row is not None:
+            return row[0]
+        content_hash = hash_file(path)
+        self._remember(path, stat, content_hash)
+        return content_hash
+
+    def remember_file_hash(self, path: str, content_hash: str):
+        """
+        Record the hash of a file computed elsewhere (e.g. while it was uploaded).
+        """
+        path = os.path.abspath(path)
+        self._remember(path, os.stat(path), content_hash)
+
+    def _remember(self, path: str, stat: os.stat_result, content_hash: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, content_hash)
+            )
+            self._maybe_commit()
+
+    def key_for_file(self, image_path: str, settings: Dict) -> str:
+        return self.make_key(self.file_hash(image_path), settings)
+
+    def get(self, key: str) -> Tuple[bool, List[Dict]]:
+        """
+        Look up the faces of an image. Returns ``(found, faces)``; ``faces`` is
+        empty for a cached "no face" result.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embeddings, dim, faces FROM face_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return False, []
+
+            self._hits += 1
+            self._conn.execute(
+                "UPDATE face_embeddings SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._maybe_commit()
+
+        blob, dim, faces_json = row
+        faces = json.loads(faces_json)
+        if faces:
+            embeddings = np.frombuffer(blob, dtype=np.float32).reshape(len(faces), dim)
+            for face, embedding in zip(faces, embeddings.copy()):
+                face['embedding'] = embedding
+        return True, faces
+
+    def put(self, key: str, faces: List[Dict]):
+        """
+        Store the faces of an image (empty for "no face") and evict old entries if needed.
+        """
+        if faces:
+            embeddings = np.stack([np.asarray(f['embedding'], dtype=np.float32).ravel() for f in faces])
+            blob, dim = embeddings.tobytes(), embeddings.shape[1]
+        else:
+            blob, dim = b'', 0
+        meta = json.dumps([{k: v for k, v in f.items() if k != 'embedding'} for f in faces])
+
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM face_embeddings WHERE key = ?", (key,)
+            ).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO face_embeddings (key, embeddings, dim, faces, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, blob, dim, meta, time.time())
+            )
+            self._writes += 1
+            if not exists:
+                self._entries += 1
+
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM face_embeddings WHERE key IN ("
+                    " SELECT key FROM face_embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self._entries -= overflow
+                self._evictions += overflow
+            self._maybe_commit()
+
+    def _maybe_commit(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self._conn.commit()
+            self._pending = 0
+
+    def flush(self):
+        """
+        Commit pending writes and LRU timestamp updates to disk.
+        """
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM face_embeddings")
+            self._conn.commit()
+            self._pending = 0
+            self._entries = 0
+
+    def reset_stats(self):
+        self._hits = self._misses = self._writes = self._evictions = 0
+
+    def stats(self) -> Dict:
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "writes": self._writes,
+            "evictions": self._evictions,
+            "entries": self._entries,
+            "max_entries": self.max_entries
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,416 @@
+import os
+import json
+import threading
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+from .embedding_cache import EmbeddingCache
+from .decoding import DEFAULT_MAX_SIDE, DecodedImage, crop_face, iter_decoded
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 16
+# Lotes enviados al pool por worker y por llamada a extract (el resto espera su turno)
+BATCHES_IN_FLIGHT_PER_WORKER = 2
+
+# Resultado por imagen: "ok" con rostros, "no_face" (cacheable) o "error" (no se cachea)
+STATUS_OK = "ok"
+STATUS_NO_FACE = "no_face"
+STATUS_ERROR = "error"
+
+# Cada rostro: {'embedding': np.ndarray, 'facial_area': {...}, 'confidence': float}
+Face = Dict
+ImageResult = Tuple[str, List[Face]]
+
+DETECTOR_SECONDS = REGISTRY.histogram(
+    "face_detector_seconds", "Face detector latency per image", ("detector",))
+DETECTOR_ESCALATIONS = REGISTRY.counter(
+    "face_detector_escalations_total", "Images passed on to the next detector of the cascade",
+    ("detector", "reason"))
+FACES_ACCEPTED = REGISTRY.counter(
+    "faces_accepted_total", "Faces kept after filtering, by the detector that found them", ("detector",))
+FACES_REJECTED = REGISTRY.counter(
+    "faces_rejected_total", "Detections dropped before embedding", ("detector", "reason"))
+EMBEDDING_SECONDS = REGISTRY.histogram(
+    "embedding_batch_seconds", "Recognition model forward pass per batch")
+IMAGES_EXTRACTED = REGISTRY.counter(
+    "images_extracted_total", "Images run through detection and embedding", ("status",))
+
+# Modelos de reconocimiento por nombre; se construyen una vez por proceso
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+def default_workers() -> int:
+    return max(1, os.cpu_count() or 1)
+
+def load_model(settings: Dict):
+    """
+    Build the recognition model once per process and keep it for later batches
+    and runs. DeepFace (and TensorFlow) are only imported here, on first use.
+    """
+    with _models_lock:
+        if settings['model_name'] not in _models:
+            from deepface import DeepFace
+            _models[settings['model_name']] = DeepFace.build_model(model_name=settings['model_name'])
+        return _models[settings['model_name']]
+
+def warm_models(settings: Dict):
+    """
+    Load the recognition model and every detector of the cascade and run each
+    once on a blank image, so weight loading and graph tracing are paid here
+    rather than by the first real batch. DeepFace keeps the detectors cached.
+    """
+    from deepface import DeepFace
+    from deepface.modules import preprocessing
+
+    model = load_model(settings)
+    blank = np.zeros((64, 64, 3), dtype=np.uint8)
+    for stage in settings['detector_cascade']:
+        DeepFace.extract_faces(img_path=blank, detector_backend=stage['backend'],
+                               enforce_detection=False, align=False)
+    crop = preprocessing.resize_image(img=blank, target_size=(model.input_shape[1], model.input_shape[0]))
+    crop = preprocessing.normalize_input(img=crop, normalization=settings['normalization'])
+    model.model(crop, training=False)
+
+def _init_worker(settings: Dict):
+    """
+    Process pool initializer: pin each worker to one thread and warm the models.
+    """
+    # Un hilo por proceso; el paralelismo lo da el pool
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    os.environ.setdefault("TF_NUM_INTRAOP_THREADS", "1")
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+    warm_models(settings)
+
+def _warm_worker(settings: Dict) -> int:
+    warm_models(settings)
+    return os.getpid()
+
+def _clean_area(facial_area: Dict) -> Dict:
+    """
+    Make a DeepFace facial_area JSON-serializable (numpy ints, eye tuples).
+    """
+    clean = {}
+    for key, value in facial_area.items():
+        if value is None:
+            clean[key] = None
+        elif isinstance(value, (tuple, list)):
+            clean[key] = [int(v) for v in value]
+        else:
+            clean[key] = int(value)
+    return clean
+
+def _filter_faces(faces: List[Dict], decoded: DecodedImage, stage: Dict,
+                  settings: Dict) -> List[Tuple[Dict, float]]:
+    """
+    Keep the detections of one cascade stage that look like usable faces, as
+    ``(facial_area, confidence)`` in original image coordinates.
+    """
+    # El cuadro completo se reconoce en coordenadas de detección: al escalar, el
+    # redondeo puede dejarlo un píxel por debajo del tamaño original
+    height, width = decoded.detection.shape[:2]
+    kept = []
+    for face in faces:
+        detected_area = _clean_area(face['facial_area'])
+        confidence = float(face.get('confidence') or 0.0)
+        if (detected_area['x'] <= 0 and detected_area['y'] <= 0
+                and detected_area['w'] >= width - 1 and detected_area['h'] >= height - 1):
+            # Sin enforce_detection DeepFace devuelve el cuadro completo cuando no hay rostro
+            reason = "whole_frame"
+        elif confidence < stage['min_confidence']:
+            reason = "low_confidence"
+        elif min(detected_area['w'], detected_area['h']) * decoded.scale < settings['min_face_size']:
+            reason = "too_small"
+        else:
+            kept.append((decoded.to_original(detected_area), confidence))
+            continue
+        FACES_REJECTED.inc(detector=stage['backend'], reason=reason)
+    return kept
+
+def _detect_faces(decoded: DecodedImage, image_path: str, settings: Dict,
+                  target_size: Tuple[int, int]) -> List[Tuple[np.ndarray, Dict, float]]:
+    """
+    Run the detector cascade on the downscaled copy of a decoded image, then
+    crop and align each face from the full-resolution image and preprocess it
+    for the recognition model as ``(crop, facial_area, confidence)``.
+
+    Each stage of ``settings['detector_cascade']`` (cheapest first) drops
+    detections below its ``min_confidence`` or smaller than ``min_face_size``;
+    the image moves on to the next stage only when nothing is left or the
+    weakest face scores below the stage's ``escalate_below``. The latest stage
+    that found faces wins. Every stage reuses the same decoded array and
+    facial areas are in original image coordinates.
+    """
+    from deepface import DeepFace
+    from deepface.modules import preprocessing
+
+    cascade = settings['detector_cascade']
+    accepted: List[Tuple[Dict, float]] = []
+    accepted_by = None
+    for n, stage in enumerate(cascade):
+        with DETECTOR_SECONDS.time(detector=stage['backend']):
+            faces = DeepFace.extract_faces(
+                img_path=decoded.detection,
+                detector_backend=stage['backend'],
+                enforce_detection=False,
+                align=False
+            )
+        kept = _filter_faces(faces, decoded, stage, settings)
+        if kept:
+            accepted, accepted_by = kept, stage['backend']
+        if n == len(cascade) - 1:
+            break
+        if not kept:
+            reason = "no_face"
+        elif min(confidence for _, confidence in kept) < stage['escalate_below']:
+            reason = "low_confidence"
+        else:
+            break
+        logger.debug(f"{stage['backend']} escalated {image_path} ({reason})")
+        DETECTOR_ESCALATIONS.inc(detector=stage['backend'], reason=reason)
+
+    detected = []
+    for facial_area, confidence in accepted:
+        crop = crop_face(decoded.full, facial_area, settings['align'])
+        if crop.size == 0:
+            continue
+        # Mismo preprocesado que DeepFace.represent (resize_image escala a [0, 1])
+        crop = preprocessing.resize_image(img=crop, target_size=(target_size[1], target_size[0]))
+        crop = preprocessing.normalize_input(img=crop, normalization=settings['normalization'])
+        detected.append((crop, facial_area, confidence))
+    if detected:
+        FACES_ACCEPTED.inc(len(detected), detector=accepted_by)
+    return detected
+
+def embed_images(image_paths: Sequence[str], settings: Dict) -> List[ImageResult]:
+    """
+    Detect all faces in a batch of images and embed every crop in one forward
+    pass. Images are decoded once each, ahead of detection, on a thread pool.
+    Results are returned in input order as ``(status, faces)`` tuples.
+    """
+    model = load_model(settings)
+    results: List[ImageResult] = [(STATUS_NO_FACE, []) for _ in image_paths]
+    crops = []
+    owners = []
+
+    decoded_images = iter_decoded(image_paths, settings.get('max_side', DEFAULT_MAX_SIDE))
+    for i, (image_path, decoded) in enumerate(decoded_images):
+        try:
+            if isinstance(decoded, Exception):
+                raise decoded
+            detected = _detect_faces(decoded, image_path, settings, model.input_shape)
+        except Exception as e:
+            logger.error(f"Failed to process {image_path}: {str(e)}")
+            results[i] = (STATUS_ERROR, [])
+            continue
+        for crop, facial_area, confidence in detected:
+            crops.append(crop)
+            owners.append((i, facial_area, confidence))
+
+    if crops:
+        batch = np.concatenate(crops, axis=0)
+        with EMBEDDING_SECONDS.time():
+            embeddings = np.asarray(model.model(batch, training=False), dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings /= norms
+        for (i, facial_area, confidence), embedding in zip(owners, embeddings):
+            # Cada imagen tiene su propia lista: se agrega en el lugar
+            faces = results[i][1]
+            if not faces:
+                results[i] = (STATUS_OK, faces)
+            faces.append({
+                'embedding': embedding,
+                'facial_area': facial_area,
+                'confidence': confidence
+            })
+
+    for status, _ in results:
+        IMAGES_EXTRACTED.inc(status=status)
+    return results
+
+def _embed_batch(image_paths: Sequence[str], settings: Dict) -> Tuple[List[ImageResult], Dict]:
+    """
+    ``embed_images`` plus the metrics it recorded in this process, drained so
+    the caller can merge them (worker processes have their own registry).
+    """
+    results = embed_images(image_paths, settings)
+    return results, REGISTRY.drain()
+
+class EmbeddingExtractor:
+    """
+    Extraction stage used by ``group_faces``.
+
+    ``extract`` yields ``(image_path, status, faces)`` in input order, answering
+    from the embedding cache when possible and sending only the misses to
+    ``_run`` in batches of ``batch_size`` (their results are cached unless
+    ``update_cache`` is False). Subclasses decide where the batches
+    are executed.
+    """
+
+    parallelism = 1
+
+    def __init__(self, settings: Dict, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.settings = settings
+        self.batch_size = max(1, batch_size)
+
+    def _run(self, batches: List[List[str]]) -> Iterator[List[ImageResult]]:
+        raise NotImplementedError
+
+    def warm_up(self):
+        """
+        Load and exercise the models wherever batches will run, ahead of the
+        first ``extract``.
+        """
+        raise NotImplementedError
+
+    def extract(self, image_paths: Sequence[str], cache: Optional[EmbeddingCache] = None,
+                update_cache: bool = True) -> Iterator[Tuple[str, str, List[Face]]]:
+        keys: List[Optional[str]] = [None] * len(image_paths)
+        cached: Dict[int, List[Face]] = {}
+        pending: List[int] = []
+
+        for i, image_path in enumerate(image_paths):
+            if cache is not None:
+                try:
+                    keys[i] = cache.key_for_file(image_path, self.settings)
+                    found, faces = cache.get(keys[i])
+                    if found:
+                        cached[i] = faces
+                        continue
+                except OSError as e:
+                    logger.warning(f"Could not read {image_path} for cache lookup: {str(e)}")
+            pending.append(i)
+
+        # Lotes más pequeños si no alcanzan para ocupar todos los workers
+        size = min(self.batch_size, max(1, -(-len(pending) // self.parallelism)))
+        batches = [pending[start:start + size] for start in range(0, len(pending), size)]
+        batch_results = self._run([[image_paths[i] for i in batch] for batch in batches])
+
+        computed: Dict[int, List[Face]] = {}
+        next_batch = 0
+        for i, image_path in enumerate(image_paths):
+            if i in cached:
+                faces = cached.pop(i)
+                yield image_path, STATUS_OK if faces else STATUS_NO_FACE, faces
+                continue
+
+            # Consumir lotes en orden hasta tener el resultado de esta imagen
+            while i not in computed:
+                for j, (status, faces) in zip(batches[next_batch], next(batch_results)):
+                    computed[j] = status, faces
+                    if update_cache and cache is not None and keys[j] is not None and status != STATUS_ERROR:
+                        cache.put(keys[j], faces)
+                next_batch += 1
+            yield (image_path, *computed.pop(i))
+
+    def close(self):
+        pass
+
+class BatchExtractor(EmbeddingExtractor):
+    """
+    Runs batches in the current process (no pool).
+    """
+
+    def _run(self, batches: List[List[str]]) -> Iterator[List[ImageResult]]:
+        for batch in batches:
+            yield embed_images(batch, self.settings)
+
+    def warm_up(self):
+        warm_models(self.settings)
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+def _shared_pool(workers: int, settings: Dict) -> ProcessPoolExecutor:
+    """
+    The process pool with ``workers`` processes, created on first use and
+    shared by every extractor of that size whatever its settings or batch
+    size: batches carry their settings and each worker loads the models of a
+    configuration the first time it sees it. ``settings`` only picks the
+    models warmed when the workers start. Call with ``_extractors_lock`` held.
+    """
+    if workers not in _pools:
+        # spawn: TensorFlow no es seguro tras fork
+        _pools[workers] = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(settings,)
+        )
+        logger.info(f"⚙️ Inference pool started: {workers} worker(s)")
+    return _pools[workers]
+
+class ProcessPoolExtractor(EmbeddingExtractor):
+    """
+    Runs batches on a shared pool of worker processes (see ``_shared_pool``),
+    kept alive between runs. Concurrent ``extract`` calls interleave on it,
+    each keeping at most ``BATCHES_IN_FLIGHT_PER_WORKER`` batches per worker
+    submitted.
+    """
+
+    def __init__(self, settings: Dict, executor: ProcessPoolExecutor, workers: int,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(settings, batch_size)
+        self.workers = workers
+        self.parallelism = workers
+        self._executor = executor
+
+    def warm_up(self):
+        # Los procesos se crean a demanda: una tarea por worker los arranca y
+        # carga los modelos de esta configuración (reparto aproximado por worker)
+        futures = [self._executor.submit(_warm_worker, self.settings) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def _run(self, batches: List[List[str]]) -> Iterator[List[ImageResult]]:
+        # Solo unos pocos lotes en vuelo: si varios trabajos comparten el pool, sus
+        # lotes se intercalan en la cola en lugar de esperar a que termine el primero
+        pending = iter(batches)
+        futures = deque(self._executor.submit(_embed_batch, batch, self.settings)
+                        for batch in itertools.islice(pending, BATCHES_IN_FLIGHT_PER_WORKER * self.workers))
+        return self._drain(futures, pending)
+
+    def _drain(self, futures: deque, pending: Iterator[List[str]]) -> Iterator[List[ImageResult]]:
+        try:
+            while futures:
+                outcome = futures.popleft().result()
+                for batch in itertools.islice(pending, 1):
+                    futures.append(self._executor.submit(_embed_batch, batch, self.settings))
+                yield self._collect(outcome)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def _collect(outcome: Tuple[List[ImageResult], Dict]) -> List[ImageResult]:
+        results, metrics = outcome
+        REGISTRY.merge(metrics)
+        return results
+
+_extractors: Dict[Tuple, EmbeddingExtractor] = {}
+_extractors_lock = threading.Lock()
+
+def get_extractor(settings: Dict, workers: Optional[int] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> EmbeddingExtractor:
+    """
+    Return a long-lived extractor for the given configuration. ``workers=1``
+    runs in-process; larger values use the shared process pool of that size,
+    so there is one pool per worker count, not per configuration.
+    """
+    workers = workers or default_workers()
+    key = (json.dumps(settings, sort_keys=True), workers, batch_size)
+    # El warm-up de arranque y el primer trabajo pueden pedirlo a la vez
+    with _extractors_lock:
+        if key not in _extractors:
+            if workers <= 1:
+                _extractors[key] = BatchExtractor(settings, batch_size)
+            else:
+                _extractors[key] = ProcessPoolExtractor(settings, _shared_pool(workers, settings), workers,
+                                                        batch_size)
+            logger.debug(f"⚙️ Embedding extractor ready: {workers} worker(s), batch size {batch_size}")
+        return _extractors[key]
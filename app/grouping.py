@@ -1,129 +1,230 @@
 import os
+import time
 import shutil
-import json
 import numpy as np
-from deepface import DeepFace
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Set, Tuple, Optional
 import logging
+from .embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH
+from .extraction import DEFAULT_BATCH_SIZE, STATUS_ERROR, get_extractor
+from .decoding import DEFAULT_MAX_SIDE
+from .groups import FaceGroups
+from .ann import IVFIndex
+from .materialize import DEFAULT_STRATEGY, materialize
+from .clustering import cluster_embeddings
+from .store import DEFAULT_STORE_PATH, ResultsStore
+from .metrics import FINE_LATENCY_BUCKETS, REGISTRY
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def cosine_similarity(embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+# Cascadas de detectores: cada etapa descarta detecciones con confianza menor a
+# min_confidence y pasa la imagen a la siguiente si no queda ningún rostro o el
+# más débil puntúa menos que escalate_below. Las confianzas de OpenCV son pesos
+# del clasificador Haar (no probabilidades), de ahí umbrales distintos.
+DETECTOR_CASCADES = {
+    # RetinaFace siempre; OpenCV solo si RetinaFace no encuentra nada
+    'accurate': [
+        {'backend': 'retinaface', 'min_confidence': 0.5, 'escalate_below': 0.0},
+        {'backend': 'opencv', 'min_confidence': 0.0, 'escalate_below': 0.0}
+    ],
+    # OpenCV primero; RetinaFace solo para imágenes dudosas o sin rostros
+    'fast': [
+        {'backend': 'opencv', 'min_confidence': 0.0, 'escalate_below': 5.0},
+        {'backend': 'retinaface', 'min_confidence': 0.5, 'escalate_below': 0.0}
+    ]
+}
+
+# Parámetros del modelo; forman parte de la clave del cache de embeddings
+EMBEDDING_SETTINGS = {
+    'model_name': 'Facenet',
+    'detector_cascade': DETECTOR_CASCADES['accurate'],
+    'min_face_size': 32,  # píxeles del lado menor, en la imagen original
+    'align': True,
+    'normalization': 'Facenet',
+    'max_side': DEFAULT_MAX_SIDE  # La detección corre sobre una copia reducida
+}
+
+CLUSTERING_MODES = ("greedy", "global")
+# Una reconstrucción completa se arma junto a la carpeta de salida y la reemplaza al confirmarse
+STAGING_SUFFIX = ".partial"
+SUPPORTED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')
+
+# Etapas propias del agrupamiento; decodificación, detección y embeddings se miden en extraction/decoding
+STAGE_SECONDS = REGISTRY.histogram(
+    "grouping_stage_seconds", "Time spent per grouping stage (per image or per face)", ("stage",),
+    buckets=FINE_LATENCY_BUCKETS)
+IMAGES_GROUPED = REGISTRY.counter(
+    "images_grouped_total", "Images handled by grouping runs, by outcome", ("outcome",))
+GROUPS_CREATED = REGISTRY.counter("groups_created_total", "Groups created by grouping runs")
+GROUPING_RUNS = REGISTRY.counter("grouping_runs_total", "Grouping runs, by mode and clustering", ("mode", "clustering"))
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_results_store: Optional[ResultsStore] = None
+
+def get_embedding_cache() -> EmbeddingCache:
     """
-    Calculate cosine similarity between two embeddings.
-    Returns similarity between 0 and 1 (1 = identical, 0 = completely different)
+    Return the process-wide embedding cache, opening it on first use.
     """
-    norm1 = np.linalg.norm(embedding1)
-    norm2 = np.linalg.norm(embedding2)
-    
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    
-    similarity = np.dot(embedding1, embedding2) / (norm1 * norm2)
-    return max(0, min(1, similarity))
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(DEFAULT_CACHE_PATH)
+    return _embedding_cache
 
-def get_face_embedding(image_path: str) -> Optional[np.ndarray]:
+def get_results_store() -> ResultsStore:
     """
-    Extract face embedding from image using DeepFace with fallback options.
+    Return the process-wide results store, opening it on first use.
     """
-    try:
-        # Intenta con RetinaFace primero (más preciso)
-        result = DeepFace.represent(
-            img_path=image_path,
-            model_name='Facenet',
-            detector_backend='retinaface',
-            enforce_detection=True,
-            align=True,
-            normalization='Facenet'
-        )
-        
-        if result and len(result) > 0:
-            embedding = np.array(result[0]['embedding'])
-            normalized_embedding = embedding / np.linalg.norm(embedding)
-            return normalized_embedding
-            
-    except Exception as e:
-        logger.warning(f"RetinaFace failed for {image_path}, trying OpenCV: {str(e)}")
-        
-        # Fallback a OpenCV (más permisivo)
-        try:
-            result = DeepFace.represent(
-                img_path=image_path,
-                model_name='Facenet',
-                detector_backend='opencv',
-                enforce_detection=False,
-                align=True,
-                normalization='Facenet'
-            )
-            
-            if result and len(result) > 0:
-                embedding = np.array(result[0]['embedding'])
-                normalized_embedding = embedding / np.linalg.norm(embedding)
-                logger.info(f"Successfully processed {image_path} with OpenCV fallback")
-                return normalized_embedding
-                
-        except Exception as e2:
-            logger.error(f"Failed to process {image_path}: {str(e2)}")
-            
-    return None
+    global _results_store
+    if _results_store is None:
+        _results_store = ResultsStore(DEFAULT_STORE_PATH)
+    return _results_store
+
+def embedding_settings(detectors: str = "accurate") -> Dict:
+    """
+    Extraction settings for a detector cascade of ``DETECTOR_CASCADES``.
+    """
+    if detectors not in DETECTOR_CASCADES:
+        raise ValueError(f"Unknown detector cascade '{detectors}'")
+    return dict(EMBEDDING_SETTINGS, detector_cascade=DETECTOR_CASCADES[detectors])
+
+def warm_up(detectors: str = "accurate", workers: Optional[int] = None,
+            batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Start the extractor ``group_faces`` would use with these arguments and load
+    its models, so the first run does not pay for them.
+    """
+    started = time.perf_counter()
+    get_extractor(embedding_settings(detectors), workers, batch_size).warm_up()
+    logger.info(f"🔥 Models warmed up in {time.perf_counter() - started:.1f}s")
+
+def get_face_embeddings(image_path: str, cache: Optional[EmbeddingCache] = None, workers: int = 1,
+                        update_cache: bool = True) -> List[Dict]:
+    """
+    Extract every face in an image as ``{'embedding', 'facial_area', 'confidence'}``
+    using the same detection and batching pipeline as ``group_faces``, in
+    process (``workers=1``) or on the shared pool of that size.
+    When a cache is given it is consulted first and, unless ``update_cache``
+    is False (one-off query images), filled with the result.
+    """
+    extractor = get_extractor(EMBEDDING_SETTINGS, workers=workers)
+    _, _, faces = next(iter(extractor.extract([image_path], cache, update_cache)))
+    return faces
 
-def find_best_group(embedding: np.ndarray, groups: List[Dict], threshold: float = 0.6) -> Optional[int]:
+def get_face_embedding(image_path: str, cache: Optional[EmbeddingCache] = None) -> Optional[np.ndarray]:
+    """
+    Extract the embedding of the first detected face, or None.
+    """
+    faces = get_face_embeddings(image_path, cache)
+    return faces[0]['embedding'] if faces else None
+
+def find_best_group(embedding: np.ndarray, groups: FaceGroups, threshold: float = 0.6) -> Optional[int]:
     """
     Find the best matching group for a face embedding.
     """
-    best_group = None
-    best_similarity = 0.0
-    
-    for i, group in enumerate(groups):
-        # Calcula similitud con el centroide del grupo
-        centroid = np.array(group['centroid'])
-        similarity = cosine_similarity(embedding, centroid)
-        
-        if similarity > threshold and similarity > best_similarity:
-            best_similarity = similarity
-            best_group = i
-    
-    return best_group
+    # Una sola multiplicación matriz-vector contra todos los centroides
+    return groups.match(embedding, threshold)
 
-def update_group_centroid(group: Dict, new_embedding: np.ndarray):
+def update_group_centroid(groups: FaceGroups, group_idx: int, new_embedding: np.ndarray):
     """
     Update group centroid with new embedding.
     """
-    group['embeddings'].append(new_embedding.tolist())
-    group['count'] += 1
+    # Suma acumulada y conteo: O(d) por inserción
+    groups.update(group_idx, new_embedding)
+
+def replace_folder(source: str, destination: str):
+    """
+    Move ``source`` to ``destination``, replacing whatever was there.
+    """
+    previous = None
+    if os.path.exists(destination):
+        previous = destination.rstrip(os.sep) + ".old"
+        if os.path.exists(previous):
+            shutil.rmtree(previous)
+        os.rename(destination, previous)
+    os.rename(source, destination)
+    if previous is not None:
+        shutil.rmtree(previous)
+    logger.info(f"✅ Replaced previous results in {destination}")
+
+def load_previous_run(output_folder: str, store: ResultsStore, index: Optional[IVFIndex] = None
+                      ) -> Optional[Tuple[FaceGroups, Set[str]]]:
+    """
+    Load the group state and the files already handled by the last run.
+    Returns None when there is nothing usable to continue from.
+    """
+    if not os.path.isdir(output_folder):
+        return None
     
-    # Recalcular centroide como promedio de todos los embeddings
-    all_embeddings = np.array(group['embeddings'])
-    new_centroid = np.mean(all_embeddings, axis=0)
-    group['centroid'] = (new_centroid / np.linalg.norm(new_centroid)).tolist()
+    try:
+        groups = store.load_groups(index)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load previous grouping state, rebuilding: {str(e)}")
+        return None
+    if groups is None:
+        return None
+    
+    logger.info(f"♻️ Loaded {len(groups)} groups from previous run")
+    return groups, store.seen_files()
 
-def group_faces(input_folder: str = "input_photos", output_folder: str = "grouped_photos") -> Dict:
+def group_faces(input_folder: str = "input_photos", output_folder: str = "grouped_photos",
+                use_cache: bool = True, workers: Optional[int] = None,
+                batch_size: int = DEFAULT_BATCH_SIZE, matching: str = "exact",
+                mode: str = "incremental", materialization: str = DEFAULT_STRATEGY,
+                clustering: str = "greedy", detectors: str = "accurate",
+                store: Optional[ResultsStore] = None, cache: Optional[EmbeddingCache] = None,
+                progress_callback: Optional[Callable[[int, int, Optional[str]], None]] = None) -> Dict:
     """
     Main function to group faces from input folder and save to output folder.
     Returns dictionary with results and group information.
+    With ``use_cache`` embeddings of previously seen images are read from the
+    persistent embedding cache instead of re-running detection and inference.
+    Embeddings are extracted by ``workers`` processes (all cores by default)
+    in batches of ``batch_size`` images; results keep the input order.
+    ``clustering="greedy"`` assigns each face online to the nearest centroid;
+    ``"global"`` extracts every face first and clusters them all at once
+    (order independent, always a full rebuild).
+    ``detectors`` picks a detector cascade from ``DETECTOR_CASCADES``; the
+    time and outcome of every stage are reported in ``stats["stages"]``.
+    Results are persisted in the results store, adding only this run's rows;
+    ``processed_files`` and ``no_face_files`` in the returned dict cover this run.
+    A full rebuild replaces the stored results and the output folder only once
+    it commits; until then (or if it fails) the previous results stay in place.
+    ``store`` and ``cache`` default to the process-wide instances; pass others
+    to keep several result sets apart (e.g. one per shard).
     """
     logger.info("🚀 Starting face grouping process...")
     
+    if matching not in ("exact", "ann"):
+        raise ValueError(f"Unknown matching mode '{matching}'")
+    if clustering not in CLUSTERING_MODES:
+        raise ValueError(f"Unknown clustering mode '{clustering}'")
+    if detectors not in DETECTOR_CASCADES:
+        raise ValueError(f"Unknown detector cascade '{detectors}'")
+    
     # Configuración
     similarity_threshold = 0.6  # Umbral de similitud para agrupar rostros
-    supported_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')
     
-    # Limpiar carpeta de resultados previos
-    if os.path.exists(output_folder):
-        shutil.rmtree(output_folder)
-        logger.info(f"✅ Cleared previous results in {output_folder}")
-    
-    os.makedirs(output_folder, exist_ok=True)
+    index = IVFIndex() if matching == "ann" else None
+    if clustering == "global":
+        # El agrupamiento global reconsidera todos los rostros
+        mode = "full"
+    if store is None:
+        store = get_results_store()
+    # Descartar lo que haya dejado sin confirmar una ejecución fallida
+    store.rollback()
+    previous = load_previous_run(output_folder, store, index) if mode == "incremental" else None
+    if previous is None:
+        mode = "full"
     
     # Verificar que existe la carpeta de entrada
     if not os.path.exists(input_folder):
         raise FileNotFoundError(f"Input folder '{input_folder}' not found!")
     
     # Obtener todas las imágenes
-    image_files = [f for f in os.listdir(input_folder) 
-                   if f.lower().endswith(supported_extensions)]
+    with STAGE_SECONDS.time(stage="discovery"):
+        image_files = [f for f in os.listdir(input_folder) 
+                       if f.lower().endswith(SUPPORTED_EXTENSIONS)]
     
     if not image_files:
         return {
@@ -133,108 +234,273 @@ def group_faces(input_folder: str = "input_photos", output_folder: str = "groupe
             "stats": {"total": 0, "processed": 0, "no_face": 0, "groups_created": 0}
         }
     
-    logger.info(f"📁 Found {len(image_files)} images to process")
+    if mode == "full":
+        # Los resultados previos se borran dentro de la transacción de esta ejecución
+        # y los grupos se arman en otra carpeta: si falla, queda lo anterior
+        store.clear()
+        build_folder = output_folder.rstrip(os.sep) + STAGING_SUFFIX
+        if os.path.exists(build_folder):
+            shutil.rmtree(build_folder)
+    else:
+        build_folder = output_folder
+    os.makedirs(build_folder, exist_ok=True)
     
-    # Inicializar variables de seguimiento
-    groups = []  # Lista de grupos con sus centroides
+    # Inicializar variables de seguimiento (detalle por archivo solo de esta ejecución;
+    # el historial completo queda en el store)
+    if previous is not None:
+        groups, seen = previous
+    else:
+        groups = FaceGroups(index=index)  # Centroides, sumas y conteos en matrices float32
+        seen = set()
     processed_files = {}
+    no_face_files = []
+    error_files = []
+    
+    # En modo incremental solo se procesan imágenes nuevas
+    total_images = len(image_files)
+    image_files = [f for f in image_files if f not in seen]
+    
+    logger.info(f"📁 Found {total_images} images, {len(image_files)} to process ({mode} mode)")
+    
+    if not use_cache:
+        cache = None
+    elif cache is None:
+        cache = get_embedding_cache()
+    if cache is not None:
+        cache.reset_stats()
+    
     stats = {
-        "total": len(image_files),
+        "total": total_images,
         "processed": 0,
         "no_face": 0,
-        "groups_created": 0
+        "errors": 0,
+        "faces_detected": 0,
+        "groups_created": 0,
+        "already_grouped": total_images - len(image_files),
+        "total_groups": 0,
+        "materialized": {},
+        "materialize_seconds": 0.0
     }
     
-    # Procesar cada imagen
-    for idx, image_file in enumerate(image_files, 1):
-        image_path = os.path.join(input_folder, image_file)
-        logger.info(f"[{idx}/{len(image_files)}] Processing: {image_file}")
-        
-        # Extraer embedding del rostro
-        embedding = get_face_embedding(image_path)
+    settings = embedding_settings(detectors)
+    extractor = get_extractor(settings, workers, batch_size)
+    # Métricas solo de esta ejecución, aunque haya otros trabajos en paralelo
+    with REGISTRY.run() as run:
+        GROUPING_RUNS.inc(mode=mode, clustering=clustering)
+        started = time.perf_counter()
+        image_paths = [os.path.join(input_folder, image_file) for image_file in image_files]
         
-        if embedding is None:
-            logger.warning(f"❌ No face detected in {image_file}")
-            stats["no_face"] += 1
-            continue
+        if progress_callback is not None:
+            progress_callback(0, len(image_files), None)
         
-        # Buscar grupo coincidente
-        matching_group_idx = find_best_group(embedding, groups, similarity_threshold)
-        
-        if matching_group_idx is not None:
-            # Agregar a grupo existente
-            group_name = groups[matching_group_idx]['name']
-            logger.info(f"👥 Assigned to existing group: {group_name}")
-            update_group_centroid(groups[matching_group_idx], embedding)
-        else:
-            # Crear nuevo grupo
-            group_name = f"person_{len(groups) + 1}"
-            logger.info(f"🆕 Created new group: {group_name}")
+        def link_image(image_file: str, image_path: str, faces: List[Dict], face_groups: List[int]):
+            # La imagen se enlaza a cada grupo una sola vez aunque tenga varios rostros del mismo
+            image_groups = list(dict.fromkeys(face_groups))
+            face_records = [
+                {
+                    'group': groups.names[group_idx],
+                    'facial_area': face['facial_area'],
+                    'confidence': face['confidence']
+                }
+                for face, group_idx in zip(faces, face_groups)
+            ]
             
-            new_group = {
-                'name': group_name,
-                'centroid': embedding.tolist(),
-                'embeddings': [embedding.tolist()],
-                'count': 1,
-                'images': []
-            }
-            groups.append(new_group)
-            stats["groups_created"] += 1
-            matching_group_idx = len(groups) - 1
+            # Materializar la imagen en la carpeta de cada grupo (enlace, copia o solo manifiesto)
+            destinations = []
+            memberships = []
+            materialize_started = time.perf_counter()
+            for group_idx in image_groups:
+                group_name = groups.names[group_idx]
+                
+                try:
+                    if materialization == "virtual":
+                        destination = image_path
+                        used = materialize(image_path, destination, materialization)
+                    else:
+                        group_folder = os.path.join(build_folder, group_name)
+                        os.makedirs(group_folder, exist_ok=True)
+                        used = materialize(image_path, os.path.join(group_folder, image_file), materialization)
+                        # Ruta definitiva, una vez reemplazada la carpeta de salida
+                        destination = os.path.join(output_folder, group_name, image_file)
+                    stats["materialized"][used] = stats["materialized"].get(used, 0) + 1
+                    groups.images[group_idx].append(image_file)
+                    destinations.append(destination)
+                    memberships.append((group_idx, destination))
+                    logger.debug(f"📋 Linked ({used}) to: {group_name}/{image_file}")
+                    
+                except Exception as e:
+                    logger.error(f"❌ Error materializing {image_file}: {str(e)}")
+            materialize_seconds = time.perf_counter() - materialize_started
+            stats["materialize_seconds"] += materialize_seconds
+            STAGE_SECONDS.observe(materialize_seconds, stage="materialize")
+            
+            if destinations:
+                processed_files[image_file] = {
+                    'groups': [groups.names[group_idx] for group_idx in image_groups],
+                    'paths': destinations,
+                    'faces': face_records
+                }
+                with STAGE_SECONDS.time(stage="store_write"):
+                    store.add_image(image_file, [dict(face, group_idx=group_idx)
+                                                 for face, group_idx in zip(faces, face_groups)], memberships)
+                stats["processed"] += 1
+                IMAGES_GROUPED.inc(outcome="grouped")
+            else:
+                IMAGES_GROUPED.inc(outcome="failed")
         
-        # Crear carpeta del grupo y copiar imagen
-        group_folder = os.path.join(output_folder, group_name)
-        os.makedirs(group_folder, exist_ok=True)
+        # Modo global: primero se extraen todos los rostros y luego se agrupan de una vez
+        pending_images = []
         
-        try:
-            destination = os.path.join(group_folder, image_file)
-            shutil.copy2(image_path, destination)
-            groups[matching_group_idx]['images'].append(image_file)
+        # Procesar cada imagen (los rostros llegan en el orden de entrada)
+        for idx, (image_file, (image_path, status, faces)) in enumerate(
+                zip(image_files, extractor.extract(image_paths, cache)), 1):
+            logger.debug(f"[{idx}/{len(image_files)}] Processing: {image_file}")
+            if progress_callback is not None:
+                progress_callback(idx, len(image_files), image_file)
+            
+            if status == STATUS_ERROR:
+                # No se marca como vista: la próxima ejecución incremental la reintenta
+                logger.warning(f"⚠️ Could not process {image_file}; it will be retried")
+                stats["errors"] += 1
+                error_files.append(image_file)
+                store.add_error(image_file)
+                IMAGES_GROUPED.inc(outcome="error")
+                continue
+            
+            if not faces:
+                logger.debug(f"❌ No face detected in {image_file}")
+                stats["no_face"] += 1
+                no_face_files.append(image_file)
+                store.add_no_face(image_file)
+                IMAGES_GROUPED.inc(outcome="no_face")
+                continue
+            
+            stats["faces_detected"] += len(faces)
+            if clustering == "global":
+                pending_images.append((image_file, image_path, faces))
+                continue
+            
+            # Cada rostro se asigna por separado
+            face_groups = []
+            for face in faces:
+                embedding = face['embedding']
+                
+                # Buscar grupo coincidente
+                with STAGE_SECONDS.time(stage="matching"):
+                    matching_group_idx = find_best_group(embedding, groups, similarity_threshold)
+                
+                if matching_group_idx is not None:
+                    # Agregar a grupo existente
+                    group_name = groups.names[matching_group_idx]
+                    logger.debug(f"👥 Assigned to existing group: {group_name}")
+                    with STAGE_SECONDS.time(stage="centroid_update"):
+                        update_group_centroid(groups, matching_group_idx, embedding)
+                else:
+                    # Crear nuevo grupo
+                    group_name = f"person_{len(groups) + 1}"
+                    logger.debug(f"🆕 Created new group: {group_name}")
+                    
+                    with STAGE_SECONDS.time(stage="centroid_update"):
+                        matching_group_idx = groups.add_group(group_name, embedding)
+                    stats["groups_created"] += 1
+                    GROUPS_CREATED.inc()
+                
+                face_groups.append(matching_group_idx)
             
-            processed_files[image_file] = {
-                'group': group_name,
-                'path': destination
-            }
-            stats["processed"] += 1
-            logger.info(f"📋 Copied to: {group_name}/{image_file}")
+            link_image(image_file, image_path, faces, face_groups)
+        
+        if pending_images:
+            embeddings = np.stack([face['embedding'] for _, _, faces in pending_images for face in faces])
+            clustering_started = time.perf_counter()
+            labels = cluster_embeddings(embeddings, similarity_threshold)
+            clustering_seconds = time.perf_counter() - clustering_started
+            stats["clustering_seconds"] = round(clustering_seconds, 3)
+            STAGE_SECONDS.observe(clustering_seconds, stage="clustering")
             
-        except Exception as e:
-            logger.error(f"❌ Error copying {image_file}: {str(e)}")
+            # Las etiquetas siguen el orden de aparición: person_1, person_2...
+            labels = iter(labels.tolist())
+            for image_file, image_path, faces in pending_images:
+                face_groups = []
+                for face in faces:
+                    group_idx = next(labels)
+                    if group_idx == len(groups):
+                        groups.add_group(f"person_{group_idx + 1}", face['embedding'])
+                        stats["groups_created"] += 1
+                        GROUPS_CREATED.inc()
+                    else:
+                        groups.update(group_idx, face['embedding'])
+                    face_groups.append(group_idx)
+                link_image(image_file, image_path, faces, face_groups)
+        
+        elapsed = time.perf_counter() - started
+        stats["images_per_second"] = round(len(image_files) / elapsed, 2) if elapsed > 0 else 0.0
+        stats["total_groups"] = len(groups)
+        stats["materialize_seconds"] = round(stats["materialize_seconds"], 3)
+        stats["stages"] = run.summary()
+    
+    if cache is not None:
+        cache.flush()
+        stats["embedding_cache"] = cache.stats()
     
     # Preparar resultados
-    result_groups = []
-    for group in groups:
-        group_info = {
-            'name': group['name'],
-            'count': group['count'],
-            'images': group['images'],
-            'folder_path': os.path.join(output_folder, group['name'])
-        }
-        result_groups.append(group_info)
+    result_groups = groups.to_list(output_folder)
+    
+    if mode == "incremental":
+        message = (f"Processed {stats['processed']} new images: {stats['groups_created']} new groups, "
+                   f"{len(groups)} groups in total")
+    else:
+        message = f"Successfully processed {stats['processed']} images into {stats['groups_created']} groups"
     
-    # Guardar resultados en JSON
     results = {
         'success': True,
-        'message': f"Successfully processed {stats['processed']} images into {stats['groups_created']} groups",
+        'message': message,
+        'mode': mode,
+        'materialization': materialization,
+        'clustering': clustering,
+        'detectors': detectors,
+        'output_folder': output_folder,
         'groups': result_groups,
         'stats': stats,
-        'processed_files': processed_files
+        'processed_files': processed_files,
+        'no_face_files': no_face_files,
+        'error_files': error_files
     }
     
+    # Guardar en el store: solo las filas nuevas, confirmadas en una sola transacción
+    committed = False
     try:
-        with open("processing_results.json", 'w') as f:
-            json.dump(results, f, indent=2)
-        logger.info("💾 Results saved to processing_results.json")
+        with STAGE_SECONDS.time(stage="store_commit"):
+            store.save_groups(groups)
+            store.save_summary({k: v for k, v in results.items()
+                                if k not in ('groups', 'processed_files', 'no_face_files', 'error_files')})
+            store.commit()
+        committed = True
+        logger.info(f"💾 Results saved to {store.path}")
     except Exception as e:
+        store.rollback()
         logger.error(f"❌ Error saving results: {str(e)}")
     
+    if build_folder != output_folder:
+        if committed:
+            replace_folder(build_folder, output_folder)
+        else:
+            shutil.rmtree(build_folder, ignore_errors=True)
+    
     # Imprimir resumen
     logger.info("=" * 50)
     logger.info("📊 PROCESSING SUMMARY:")
     logger.info(f"   Total images: {stats['total']}")
+    logger.info(f"   Already grouped: {stats['already_grouped']}")
     logger.info(f"   Successfully processed: {stats['processed']}")
     logger.info(f"   No face detected: {stats['no_face']}")
+    logger.info(f"   Errors (retried next run): {stats['errors']}")
+    logger.info(f"   Faces detected: {stats['faces_detected']}")
     logger.info(f"   Groups created: {stats['groups_created']}")
+    logger.info(f"   Throughput: {stats['images_per_second']} images/s")
+    logger.info(f"   Materialization: {stats['materialized']} in {stats['materialize_seconds']}s")
+    if cache is not None:
+        cache_stats = stats["embedding_cache"]
+        logger.info(f"   Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
     logger.info("=" * 50)
     
     return results
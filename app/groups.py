@@ -0,0 +1,181 @@
+import os
+import numpy as np
+from typing import Dict, List, Optional
+from .ann import IVFIndex
+
+INITIAL_CAPACITY = 64
+
+class FaceGroups:
+    """
+    Grouping state held as contiguous float32 arrays.
+
+    Row ``i`` of the centroid matrix is the normalized running mean of the
+    embeddings assigned to group ``i``; running sums and counts make an update
+    O(d), and matching a face against every group is one matrix-vector product.
+    Storage grows by doubling, so appending a group is amortized O(d).
+
+    With an ``IVFIndex`` attached, ``match`` only scores the candidate groups
+    the index returns (approximate search); without one it is exact.
+    """
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = INITIAL_CAPACITY,
+                 index: Optional[IVFIndex] = None):
+        self.dim = dim
+        self.index = index
+        self.names: List[str] = []
+        self.images: List[List[str]] = []
+        self._capacity = capacity
+        self._sums: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        if dim is not None:
+            self._allocate(dim)
+
+    def _allocate(self, dim: int):
+        self.dim = dim
+        self._sums = np.zeros((self._capacity, dim), dtype=np.float32)
+        self._centroids = np.zeros((self._capacity, dim), dtype=np.float32)
+
+    def _grow(self):
+        self._capacity *= 2
+        for attr in ('_sums', '_centroids', '_counts'):
+            old = getattr(self, attr)
+            new = np.zeros((self._capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self)] = old[:len(self)]
+            setattr(self, attr, new)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """
+        View of the (n_groups, dim) centroid matrix.
+        """
+        if self._centroids is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._centroids[:len(self)]
+
+    @property
+    def counts(self) -> np.ndarray:
+        return self._counts[:len(self)]
+
+    def similarities(self, embedding: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of an embedding against every group centroid.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or len(self) == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        return self.centroids @ (query / norm)
+
+    def match(self, embedding: np.ndarray, threshold: float) -> Optional[int]:
+        """
+        Index of the most similar group above ``threshold``, or None.
+        Ties resolve to the oldest group.
+        """
+        if len(self) == 0:
+            return None
+
+        if self.index is not None:
+            query = np.asarray(embedding, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            candidates = self.index.candidates(query)
+            if candidates is not None:
+                if len(candidates) == 0:
+                    return None
+                similarities = self._centroids[candidates] @ query
+                best = int(np.argmax(similarities))
+                return int(candidates[best]) if similarities[best] > threshold else None
+
+        similarities = self.similarities(embedding)
+        best = int(np.argmax(similarities))
+        return best if similarities[best] > threshold else None
+
+    def add_group(self, name: str, embedding: np.ndarray) -> int:
+        """
+        Create a new group seeded with one embedding and return its index.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        if self._sums is None:
+            self._allocate(vector.shape[0])
+        if len(self) == self._capacity:
+            self._grow()
+
+        idx = len(self)
+        self.names.append(name)
+        self.images.append([])
+        self._sums[idx] = 0.0
+        self._counts[idx] = 0
+        self._accumulate(idx, vector)
+
+        if self.index is not None:
+            if self.index.needs_training(len(self)):
+                self.index.train(self.centroids)
+            else:
+                self.index.add(idx, self._centroids[idx])
+        return idx
+
+    def update(self, idx: int, embedding: np.ndarray):
+        """
+        Add an embedding to group ``idx`` and refresh its centroid in O(d).
+        """
+        self._accumulate(idx, embedding)
+        if self.index is not None:
+            self.index.update(idx, self._centroids[idx])
+
+    def _accumulate(self, idx: int, embedding: np.ndarray):
+        self._sums[idx] += np.asarray(embedding, dtype=np.float32)
+        self._counts[idx] += 1
+        norm = np.linalg.norm(self._sums[idx])
+        self._centroids[idx] = self._sums[idx] / norm if norm > 0 else 0.0
+
+    @property
+    def sums(self) -> np.ndarray:
+        """
+        View of the (n_groups, dim) running sums the centroids derive from.
+        """
+        if self._sums is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._sums[:len(self)]
+
+    @classmethod
+    def from_arrays(cls, names: List[str], images: List[List[str]], sums: np.ndarray,
+                    counts: np.ndarray, index: Optional[IVFIndex] = None) -> 'FaceGroups':
+        """
+        Restore a persisted state; centroids are rebuilt from the sums.
+        """
+        groups = cls(capacity=max(INITIAL_CAPACITY, len(names)), index=index)
+        if len(names) == 0:
+            return groups
+
+        groups._allocate(sums.shape[1])
+        n = len(names)
+        groups.names = list(names)
+        groups.images = images
+        groups._sums[:n] = sums
+        groups._counts[:n] = counts
+        norms = np.linalg.norm(groups._sums[:n], axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        groups._centroids[:n] = groups._sums[:n] / norms
+
+        if index is not None and index.needs_training(n):
+            index.train(groups.centroids)
+        return groups
+
+    def to_list(self, output_folder: str = "") -> List[Dict]:
+        """
+        Group summaries in the format stored in the processing results.
+        ``count`` is the number of images, ``face_count`` the number of faces.
+        """
+        return [
+            {
+                'name': name,
+                'count': len(images),
+                'face_count': int(count),
+                'images': images,
+                'folder_path': os.path.join(output_folder, name)
+            }
+            for name, count, images in zip(self.names, self.counts, self.images)
+        ]
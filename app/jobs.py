@@ -0,0 +1,210 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 50
+DEFAULT_QUEUE = "default"
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+class Job:
+    """
+    A grouping run submitted to the ``JobManager``, with its progress and result.
+    """
+
+    def __init__(self, params: Dict, queue: str = DEFAULT_QUEUE):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.queue = queue
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = 0
+        self.total = 0
+        self.current: Optional[str] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        # Se incrementa en cada cambio; el stream de eventos lo usa para saber si hay novedades
+        self.version = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def report_progress(self, done: int, total: int, current: Optional[str] = None):
+        self.done = done
+        self.total = total
+        self.current = current
+        self.version += 1
+
+    def to_dict(self) -> Dict:
+        throughput = 0.0
+        eta = None
+        if self.started_at is not None and self.done:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            throughput = self.done / elapsed if elapsed > 0 else 0.0
+            if throughput and not self.finished:
+                eta = (self.total - self.done) / throughput
+
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "queue": self.queue,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {
+                "done": self.done,
+                "total": self.total,
+                "current": self.current,
+                "percent": round(100 * self.done / self.total, 1) if self.total else 0.0
+            },
+            "images_per_second": round(throughput, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "result": self.result,
+            "error": self.error
+        }
+
+class JobManager:
+    """
+    In-process scheduler for grouping runs.
+
+    Every job belongs to a queue (in the web app, the workspace it writes to).
+    Up to ``max_concurrent`` jobs run at once on background threads, so the
+    event loop stays free, but never two from the same queue, so concurrent
+    requests never write to one output folder simultaneously. When a slot
+    frees up the next job comes from the queue served least recently, so a
+    queue with a long backlog cannot starve the others.
+    Submitting parameters identical to a job that is still queued or running
+    in the same queue returns that job instead of enqueueing a duplicate.
+    """
+
+    def __init__(self, runner: Callable[..., Dict], max_concurrent: int = 1):
+        self._runner = runner
+        self.max_concurrent = max(1, max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="grouping-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._pending: Dict[str, deque] = {}
+        self._running: Dict[str, Job] = {}
+        # Turno en que se atendió cada cola por última vez
+        self._served: Dict[str, int] = {}
+        self._turn = 0
+        self._usage: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, params: Dict, queue: str = DEFAULT_QUEUE) -> Tuple[Job, bool]:
+        """
+        Enqueue a job. Returns ``(job, created)``; ``created`` is False when an
+        equivalent pending job was reused.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.finished and job.queue == queue and job.params == params:
+                    return job, False
+
+            job = Job(params, queue)
+            self._jobs[job.id] = job
+            self._pending.setdefault(queue, deque()).append(job)
+            self._queue_usage(queue)['submitted'] += 1
+            self._prune()
+            self._dispatch()
+
+        logger.info(f"📥 Queued grouping job {job.id} ({queue})")
+        return job, True
+
+    def _queue_usage(self, queue: str) -> Dict:
+        if queue not in self._usage:
+            self._usage[queue] = {"submitted": 0, "completed": 0, "failed": 0, "busy_seconds": 0.0}
+        return self._usage[queue]
+
+    def _dispatch(self):
+        # Llamar con self._lock tomado
+        while len(self._running) < self.max_concurrent:
+            waiting = [name for name in self._pending if name not in self._running]
+            if not waiting:
+                return
+            queue = min(waiting, key=lambda name: self._served.get(name, -1))
+            job = self._pending[queue].popleft()
+            if not self._pending[queue]:
+                del self._pending[queue]
+            self._turn += 1
+            self._served[queue] = self._turn
+            self._running[queue] = job
+            self._executor.submit(self._run, job)
+
+    def _run(self, job: Job):
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.version += 1
+        try:
+            job.result = self._runner(progress_callback=job.report_progress, **job.params)
+            job.status = COMPLETED if job.result.get('success') else FAILED
+            if not job.result.get('success'):
+                job.error = job.result.get('message')
+        except Exception as e:
+            logger.error(f"❌ Grouping job {job.id} failed: {str(e)}")
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.version += 1
+            with self._lock:
+                del self._running[job.queue]
+                usage = self._queue_usage(job.queue)
+                usage[job.status] += 1
+                usage['busy_seconds'] += job.finished_at - job.started_at
+                self._dispatch()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, queue: Optional[str] = None) -> List[Job]:
+        return [job for job in list(self._jobs.values()) if queue is None or job.queue == queue]
+
+    def active(self, queue: Optional[str] = None) -> Optional[Job]:
+        for job in self.list(queue):
+            if job.status == RUNNING:
+                return job
+        return None
+
+    def busy(self, queue: str) -> bool:
+        """
+        Whether the queue has a job running or waiting.
+        """
+        return any(not job.finished for job in self.list(queue))
+
+    def usage(self, queue: str) -> Dict:
+        """
+        Jobs submitted, completed and failed in a queue, the time spent running
+        them, and how many are running or waiting right now.
+        """
+        with self._lock:
+            usage = dict(self._queue_usage(queue))
+            usage['busy_seconds'] = round(usage['busy_seconds'], 3)
+            usage['running'] = int(queue in self._running)
+            usage['queued'] = len(self._pending.get(queue, ()))
+        return usage
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "running": len(self._running),
+                "queued": sum(len(jobs) for jobs in self._pending.values())
+            }
@@ -0,0 +1,55 @@
+import os
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+# hardlink/reflink: sin espacio extra en el mismo sistema de archivos;
+# symlink: depende de que el original siga en input_photos;
+# virtual: no se crean archivos, las rutas se resuelven desde los resultados.
+STRATEGIES = ("hardlink", "symlink", "reflink", "copy", "virtual")
+DEFAULT_STRATEGY = "hardlink"
+
+# ioctl FICLONE de Linux (btrfs, XFS, bcachefs...)
+FICLONE = 0x40049409
+
+def _reflink(source: str, destination: str):
+    import fcntl
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(destination)
+            raise
+    shutil.copystat(source, destination)
+
+def materialize(source: str, destination: str, strategy: str = DEFAULT_STRATEGY) -> str:
+    """
+    Place ``source`` at ``destination`` using ``strategy`` and return the
+    strategy actually used. Link strategies fall back to a copy when the
+    filesystem does not support them (e.g. hardlinks across devices).
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown materialization strategy '{strategy}'")
+    if strategy == "virtual":
+        return strategy
+
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    try:
+        if strategy == "hardlink":
+            os.link(source, destination)
+            return strategy
+        if strategy == "symlink":
+            os.symlink(os.path.abspath(source), destination)
+            return strategy
+        if strategy == "reflink":
+            _reflink(source, destination)
+            return strategy
+    except (OSError, ImportError) as e:
+        logger.debug(f"{strategy} not available for {destination}, copying instead: {str(e)}")
+
+    shutil.copy2(source, destination)
+    return "copy"
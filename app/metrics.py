@@ -0,0 +1,285 @@
+import time
+import bisect
+import threading
+import contextlib
+import contextvars
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Límites superiores (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Desde 10 µs, para operaciones por rostro (búsqueda, actualización de centroides...)
+FINE_LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025) + LATENCY_BUCKETS
+
+# Registro por ejecución activo en el contexto actual (ver Registry.run)
+_current_run: contextvars.ContextVar[Optional["Registry"]] = contextvars.ContextVar("metrics_run", default=None)
+
+def _run_copy(metric: "Counter") -> Optional["Counter"]:
+    run = _current_run.get()
+    return run._mirror(metric) if run is not None else None
+
+def _escape(value: str, quotes: bool = True) -> str:
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """
+    Monotonic count per label combination.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _blank(self) -> "Counter":
+        return Counter(self.name, self.help, self.labelnames)
+
+    def inc(self, amount: float = 1.0, **labels):
+        self._record(self._key(labels), amount)
+
+    def _record(self, key: Tuple[str, ...], value: float):
+        self._add(key, value)
+        copy = _run_copy(self)
+        if copy is not None:
+            copy._add(key, value)
+
+    def _add(self, key: Tuple[str, ...], amount: float):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values: Dict):
+        self._merge(values)
+        copy = _run_copy(self)
+        if copy is not None:
+            copy._merge(values)
+
+    def _merge(self, values: Dict[Tuple[str, ...], float]):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0.0) + value
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        """
+        Lines of the Prometheus text exposition format for this metric.
+        """
+        lines = [f"# HELP {self.name} {_escape(self.help, quotes=False)}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{self._labels(key)} {_format(value)}")
+        return lines
+
+class Histogram(Counter):
+    """
+    Distribution of observed values per label combination, stored as
+    per-bucket (non-cumulative) counts, the last bucket being +Inf, followed
+    by the sum and the number of observations.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def _blank(self) -> "Histogram":
+        return Histogram(self.name, self.help, self.labelnames, self.buckets)
+
+    def _empty(self) -> List[float]:
+        # Un contador por bucket (+Inf incluido), suma y número de observaciones
+        return [0.0] * (len(self.buckets) + 3)
+
+    def observe(self, value: float, **labels):
+        self._record(self._key(labels), value)
+
+    def _add(self, key: Tuple[str, ...], value: float):
+        with self._lock:
+            counts = self._values.setdefault(key, self._empty())
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List[float]]:
+        with self._lock:
+            return {key: list(counts) for key, counts in self._values.items()}
+
+    def _merge(self, values: Dict[Tuple[str, ...], List[float]]):
+        with self._lock:
+            for key, counts in values.items():
+                current = self._values.setdefault(key, self._empty())
+                for i, value in enumerate(counts):
+                    current[i] += value
+
+    def render(self) -> List[str]:
+        # Prometheus espera buckets acumulados, con +Inf igual al total
+        lines = [f"# HELP {self.name} {_escape(self.help, quotes=False)}", f"# TYPE {self.name} {self.kind}"]
+        for key, counts in sorted(self.snapshot().items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {_format(cumulative)}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format(counts[-2])}")
+            lines.append(f"{self.name}_count{self._labels(key)} {_format(counts[-1])}")
+        return lines
+
+    def quantile(self, counts: List[float], q: float) -> Optional[float]:
+        """
+        Upper bound of the bucket holding the ``q`` quantile (None past the last bucket).
+        """
+        total = counts[-1]
+        if not total:
+            return None
+        seen = 0.0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= q * total:
+                return bound
+        return None
+
+class Registry:
+    """
+    Process-local set of metrics. Worker processes ``drain`` theirs after
+    each batch and the parent ``merge``s the snapshot, so counts from every
+    process end up in one place.
+
+    ``run()`` additionally records, in a separate registry, what the current
+    context (thread or task) updates, so one run's metrics can be reported
+    apart from everything else running in the process.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Counter) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _mirror(self, metric: Counter) -> Counter:
+        with self._lock:
+            if metric.name not in self._metrics:
+                self._metrics[metric.name] = metric._blank()
+            return self._metrics[metric.name]
+
+    @contextlib.contextmanager
+    def run(self) -> Iterator["Registry"]:
+        """
+        Yield a fresh registry that receives a copy of every update made from
+        the current context until the block exits, merges of worker snapshots
+        included. Work handed to other threads is only counted if it runs in
+        a copy of this context (``contextvars.copy_context``).
+        """
+        run = Registry()
+        token = _current_run.set(run)
+        try:
+            yield run
+        finally:
+            _current_run.reset(token)
+
+    def metrics(self) -> List[Counter]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {metric.name: metric.snapshot() for metric in self.metrics()}
+
+    def drain(self) -> Dict[str, Dict]:
+        """
+        Snapshot and reset, as one step per metric.
+        """
+        drained = {}
+        for metric in self.metrics():
+            with metric._lock:
+                drained[metric.name] = metric._values
+                metric._values = {}
+        return drained
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        for name, values in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        return "\n".join(line for metric in self.metrics() for line in metric.render()) + "\n"
+
+    def summary(self, since: Optional[Dict[str, Dict]] = None,
+                exclude: Sequence[str] = ()) -> Dict[str, Dict]:
+        """
+        Readable view of the metrics (optionally only what changed after the
+        ``since`` snapshot): counts for counters, and count, mean, p50 and
+        p95 for histograms, keyed by metric and then by label values.
+        Metrics whose name starts with one of the ``exclude`` prefixes are left out.
+        """
+        since = since or {}
+        summary: Dict[str, Dict] = {}
+        for metric in self.metrics():
+            if exclude and metric.name.startswith(tuple(exclude)):
+                continue
+            previous = since.get(metric.name, {})
+            entries = {}
+            for key, value in metric.snapshot().items():
+                label = ",".join(key) or "total"
+                if isinstance(metric, Histogram):
+                    before = previous.get(key, metric._empty())
+                    counts = [a - b for a, b in zip(value, before)]
+                    if not counts[-1]:
+                        continue
+                    entries[label] = {
+                        "count": int(counts[-1]),
+                        "mean_seconds": round(counts[-2] / counts[-1], 4),
+                        "p50_seconds": metric.quantile(counts, 0.5),
+                        "p95_seconds": metric.quantile(counts, 0.95)
+                    }
+                else:
+                    count = value - previous.get(key, 0.0)
+                    if count:
+                        entries[label] = int(count) if float(count).is_integer() else count
+            if entries:
+                summary[metric.name] = entries
+        return summary
+
+REGISTRY = Registry()
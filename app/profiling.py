@@ -0,0 +1,47 @@
+import os
+import time
+import pstats
+import cProfile
+import contextlib
+from typing import Dict, Iterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FOLDER = os.environ.get("FACE_GROUPING_PROFILE_DIR", "profiles")
+PROFILE_TOP_FUNCTIONS = 25
+
+@contextlib.contextmanager
+def profiled(name: str, folder: str = PROFILE_FOLDER) -> Iterator[Dict]:
+    """
+    Run the block under cProfile and dump the stats to ``folder/<name>-<timestamp>.prof``
+    (readable with ``python -m pstats`` or snakeviz). The yielded dict is filled
+    on exit with the dump path and the top functions by cumulative time.
+
+    Only the calling thread is profiled: with ``workers > 1`` detection and
+    embedding run in other processes and show up as time spent waiting on them.
+    """
+    report: Dict = {}
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        profiler.dump_stats(path)
+
+        stats = pstats.Stats(profiler).stats
+        top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+        report['path'] = path
+        report['top_functions'] = [
+            {
+                'function': f"{os.path.basename(filename)}:{line}({function})",
+                'calls': calls,
+                'own_seconds': round(own, 4),
+                'cumulative_seconds': round(cumulative, 4)
+            }
+            for (filename, line, function), (_, calls, own, cumulative, _) in top
+        ]
+        logger.info(f"🔬 Profile saved to {path}")
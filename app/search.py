@@ -0,0 +1,143 @@
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+import logging
+from .metrics import REGISTRY
+from .store import ResultsStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 10
+# Candidatos por resultado pedido: una imagen con varios rostros parecidos ocupa varios
+IMAGE_CANDIDATES_FACTOR = 4
+
+SEARCH_SECONDS = REGISTRY.histogram("search_seconds", "Face search latency by stage", ("stage",))
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the ``k`` highest scores, best first, without a full sort.
+    """
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+class FaceSearchIndex:
+    """
+    In-memory copy of the stored face embeddings and group centroids for
+    similarity search.
+
+    It is filled from the results store on first use and, after a run,
+    ``invalidate`` makes the next query catch up: incremental runs only append
+    faces (the embedding file is append-only), so just the new rows are read;
+    full rebuilds reload everything. Queries are one matrix-vector product over
+    unit vectors (cosine similarity) plus a partial sort.
+    Without a store the index only serves what is passed to ``load``.
+    """
+
+    def __init__(self, store: Optional[ResultsStore] = None):
+        self.store = store
+        self._lock = threading.Lock()
+        self._stale = self._full = store is not None
+        self.load(np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int32), [], [],
+                  np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self._faces[2])
+
+    def load(self, embeddings: np.ndarray, face_groups: np.ndarray, face_files: List[str],
+             group_names: List[str], centroids: np.ndarray, face_counts: np.ndarray):
+        """
+        Replace the indexed data (faces aligned row by row, groups by index).
+        """
+        with self._lock:
+            self._faces = (np.ascontiguousarray(embeddings, dtype=np.float32), face_groups, face_files)
+            self._groups = (list(group_names), np.ascontiguousarray(centroids, dtype=np.float32), face_counts)
+
+    def invalidate(self, full: bool = False):
+        """
+        Mark the index out of date; ``full`` after a rebuild or a clear.
+        """
+        if self.store is None:
+            return
+        with self._lock:
+            self._stale = True
+            self._full = self._full or full
+
+    def _sync(self):
+        with self._lock:
+            if not self._stale:
+                return
+            full = self._full
+            self._stale = self._full = False
+            embeddings, face_groups, face_files = self._faces
+
+        try:
+            stored = self.store.embeddings()
+            # Menos filas que las indexadas: el store se reconstruyó
+            start = 0 if full or len(stored) < len(embeddings) else len(embeddings)
+            new_groups, new_files = self.store.face_owners(start, len(stored))
+            new_embeddings = np.array(stored[start:start + len(new_files)], dtype=np.float32)
+            groups = self.store.load_groups()
+        except Exception:
+            self.invalidate(full=True)
+            raise
+
+        if not start:
+            embeddings, face_groups, face_files = new_embeddings, new_groups, new_files
+        elif new_files:
+            embeddings = np.concatenate([embeddings, new_embeddings])
+            face_groups = np.concatenate([face_groups, new_groups])
+            face_files = face_files + new_files
+
+        if groups is None:
+            names, centroids, counts = [], np.zeros((0, embeddings.shape[1]), dtype=np.float32), np.zeros(0)
+        else:
+            names, centroids, counts = groups.names, groups.centroids.copy(), groups.counts.copy()
+        self.load(embeddings, face_groups, face_files, names, centroids, counts)
+        logger.info(f"🔎 Search index: {len(face_files)} faces ({len(new_files)} new), {len(names)} groups")
+
+    def search(self, embedding: np.ndarray, top_k: int = DEFAULT_TOP_K,
+               min_similarity: Optional[float] = None) -> Dict[str, List[Dict]]:
+        """
+        Most similar groups (by centroid) and images (by their best face) to a
+        face embedding, with cosine similarities, best first.
+        """
+        self._sync()
+        with SEARCH_SECONDS.time(stage="query"):
+            with self._lock:
+                embeddings, face_groups, face_files = self._faces
+                names, centroids, counts = self._groups
+            query = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                query = query / norm
+
+            groups = []
+            if len(names):
+                scores = centroids @ query
+                for idx in _top(scores, top_k):
+                    if min_similarity is not None and scores[idx] < min_similarity:
+                        break
+                    groups.append({'name': names[idx], 'similarity': round(float(scores[idx]), 4),
+                                   'face_count': int(counts[idx])})
+
+            images = []
+            if len(face_files):
+                scores = embeddings @ query
+                seen = set()
+                for idx in _top(scores, top_k * IMAGE_CANDIDATES_FACTOR):
+                    if len(images) == top_k or (min_similarity is not None and scores[idx] < min_similarity):
+                        break
+                    if face_files[idx] in seen:
+                        continue
+                    seen.add(face_files[idx])
+                    group_idx = face_groups[idx]
+                    images.append({'filename': face_files[idx],
+                                   'group': names[group_idx] if group_idx < len(names) else None,
+                                   'similarity': round(float(scores[idx]), 4)})
+        return {'groups': groups, 'images': images}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"faces": len(self._faces[2]), "groups": len(self._groups[0]), "stale": self._stale}
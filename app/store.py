@@ -0,0 +1,373 @@
+import os
+import re
+import json
+import itertools
+import sqlite3
+import threading
+import contextlib
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import logging
+from .ann import IVFIndex
+from .groups import FaceGroups
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = "grouping_store"
+# Sumas de grupo por generación: group_sums.<n>.npy; la vigente se apunta desde meta
+GROUP_SUMS_FILE = re.compile(r"^group_sums\.(\d+)\.npy$")
+# Embeddings por generación: embeddings.<n>.f32; cada reconstrucción completa empieza una
+EMBEDDINGS_FILE = re.compile(r"^embeddings\.(\d+)\.f32$")
+
+class ResultsStore:
+    """
+    Persistent grouping results, written incrementally and read in pages.
+
+    Face embeddings are appended to a raw float32 file and read back through a
+    memory map (row ``i`` is face ``id = i``); files, faces, groups and group
+    membership live in indexed SQLite tables, and the running group sums in a
+    ``.npy`` file. A run only writes the rows it adds, inside one transaction:
+    ``commit`` publishes it and ``rollback`` (or a crash) discards it,
+    including any embeddings appended in the meantime. Each save of the group
+    sums, and each ``clear`` of the embeddings, goes to a new generation file
+    that only becomes current when the transaction pointing ``meta`` at it
+    commits, so a full rebuild that fails leaves the previous results intact.
+
+    Writes go through one connection guarded by a lock (the grouping job);
+    reads open their own connection and therefore only see committed runs.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self.db_path = os.path.join(path, "results.sqlite3")
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS files ("
+            " name TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS faces ("
+            " id INTEGER PRIMARY KEY,"
+            " file TEXT NOT NULL,"
+            " group_idx INTEGER NOT NULL,"
+            " facial_area TEXT NOT NULL,"
+            " confidence REAL);"
+            "CREATE INDEX IF NOT EXISTS idx_faces_file ON faces (file);"
+            "CREATE INDEX IF NOT EXISTS idx_faces_group ON faces (group_idx);"
+            "CREATE TABLE IF NOT EXISTS groups ("
+            " idx INTEGER PRIMARY KEY,"
+            " name TEXT NOT NULL UNIQUE,"
+            " face_count INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS memberships ("
+            " id INTEGER PRIMARY KEY,"
+            " group_idx INTEGER NOT NULL,"
+            " file TEXT NOT NULL,"
+            " path TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_memberships_group ON memberships (group_idx, id);"
+            "CREATE INDEX IF NOT EXISTS idx_memberships_file ON memberships (file);"
+        )
+        self._conn.commit()
+
+        self._dim: Optional[int] = None
+        self._embeddings_generation = 0
+        self._rows = 0
+        self._embeddings_file = None
+        # Embeddings y sumas escritos por una ejecución que no llegó a confirmarse
+        self._load_committed()
+
+    # Escritura
+
+    def _embeddings_file_for(self, generation: int) -> str:
+        return os.path.join(self.path, f"embeddings.{generation}.f32")
+
+    @property
+    def embeddings_path(self) -> str:
+        """
+        Embeddings file the writer appends to.
+        """
+        return self._embeddings_file_for(self._embeddings_generation)
+
+    def _load_committed(self):
+        """
+        Reset the writer state to the committed run and drop files written
+        after it.
+        """
+        dim = self._meta(self._conn, 'dim')
+        self._dim = int(dim) if dim is not None else None
+        self._embeddings_generation = int(self._meta(self._conn, 'embeddings_generation') or 0)
+        self._rows = self._conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM faces").fetchone()[0]
+        size = self._rows * (self._dim or 0) * 4
+        if os.path.exists(self.embeddings_path) and os.path.getsize(self.embeddings_path) != size:
+            with open(self.embeddings_path, 'r+b') as f:
+                f.truncate(size)
+        self._prune_generations()
+
+    def _close_embeddings(self):
+        if self._embeddings_file is not None:
+            self._embeddings_file.close()
+            self._embeddings_file = None
+
+    def _append_embeddings(self, embeddings: np.ndarray) -> int:
+        if self._dim is None:
+            self._dim = embeddings.shape[1]
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self._dim),))
+        if self._embeddings_file is None:
+            self._embeddings_file = open(self.embeddings_path, 'ab')
+        first_id = self._rows
+        self._embeddings_file.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+        self._rows += len(embeddings)
+        return first_id
+
+    def add_image(self, filename: str, faces: List[Dict], memberships: List[Tuple[int, str]]):
+        """
+        Record an image whose ``faces`` (``embedding``, ``group_idx``,
+        ``facial_area``, ``confidence``) were grouped, and the ``(group_idx, path)``
+        where it was placed in each group.
+        """
+        with self._lock:
+            first_id = self._append_embeddings(np.stack([face['embedding'] for face in faces]))
+            self._conn.execute("INSERT OR REPLACE INTO files (name, status) VALUES (?, 'grouped')", (filename,))
+            self._conn.executemany(
+                "INSERT INTO faces (id, file, group_idx, facial_area, confidence) VALUES (?, ?, ?, ?, ?)",
+                [(first_id + i, filename, face['group_idx'], json.dumps(face['facial_area']), face['confidence'])
+                 for i, face in enumerate(faces)]
+            )
+            self._conn.executemany(
+                "INSERT INTO memberships (group_idx, file, path) VALUES (?, ?, ?)",
+                [(group_idx, filename, path) for group_idx, path in memberships]
+            )
+
+    def add_no_face(self, filename: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files (name, status) VALUES (?, 'no_face')", (filename,))
+
+    def add_error(self, filename: str):
+        """
+        Record an image that could not be read or processed; unlike no-face
+        images it is not treated as seen, so the next run retries it.
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files (name, status) VALUES (?, 'error')", (filename,))
+
+    def save_groups(self, groups: FaceGroups):
+        """
+        Write group names, face counts and running sums (membership is
+        recorded image by image in ``add_image``).
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO groups (idx, name, face_count) VALUES (?, ?, ?)",
+                [(idx, name, int(count)) for idx, (name, count) in enumerate(zip(groups.names, groups.counts))]
+            )
+            # Archivo nuevo: la generación confirmada no se toca hasta el commit
+            generation = int(self._meta(self._conn, 'group_sums_generation') or 0) + 1
+            np.save(self._group_sums_file(generation), groups.sums)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('group_sums_generation', ?)",
+                               (str(generation),))
+
+    def _group_sums_file(self, generation: int) -> str:
+        return os.path.join(self.path, f"group_sums.{generation}.npy")
+
+    def _prune_generations(self):
+        """
+        Delete group sums that are neither the committed generation nor the one
+        before it (kept for readers that loaded the previous run's names), and
+        embeddings files other than the committed one.
+        """
+        committed = self._meta(self._conn, 'group_sums_generation')
+        keep = set() if committed is None else {int(committed), int(committed) - 1}
+        for name in os.listdir(self.path):
+            match = GROUP_SUMS_FILE.match(name)
+            if match and int(match.group(1)) not in keep:
+                os.remove(os.path.join(self.path, name))
+            match = EMBEDDINGS_FILE.match(name)
+            if match and int(match.group(1)) != self._embeddings_generation:
+                os.remove(os.path.join(self.path, name))
+
+    def save_summary(self, summary: Dict):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('summary', ?)",
+                               (json.dumps(summary),))
+
+    def commit(self):
+        with self._lock:
+            self._close_embeddings()
+            self._conn.commit()
+            self._prune_generations()
+
+    def rollback(self):
+        with self._lock:
+            self._close_embeddings()
+            self._conn.rollback()
+            self._load_committed()
+
+    def clear(self):
+        """
+        Delete every stored result as part of the current run (full rebuild):
+        readers keep the committed results until ``commit``, and ``rollback``
+        restores them.
+        """
+        with self._lock:
+            self._close_embeddings()
+            for table in ('files', 'faces', 'groups', 'memberships'):
+                self._conn.execute(f"DELETE FROM {table}")
+            # Los contadores de generación se conservan: los archivos nuevos no
+            # pueden pisar los de la ejecución confirmada
+            self._conn.execute("DELETE FROM meta WHERE key IN ('dim', 'summary')")
+            self._embeddings_generation += 1
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('embeddings_generation', ?)",
+                               (str(self._embeddings_generation),))
+            if os.path.exists(self.embeddings_path):
+                os.remove(self.embeddings_path)
+            self._dim = None
+            self._rows = 0
+
+    def reset(self):
+        """
+        Delete every stored result right away (workspace clear).
+        """
+        with self._lock:
+            self.rollback()
+            self.clear()
+            self.commit()
+
+    # Lectura (solo ejecuciones confirmadas)
+
+    @contextlib.contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def summary(self) -> Optional[Dict]:
+        """
+        Message, mode and statistics of the last committed run, or None.
+        """
+        with self._reader() as conn:
+            summary = self._meta(conn, 'summary')
+        return json.loads(summary) if summary is not None else None
+
+    def seen_files(self) -> Set[str]:
+        """
+        Every file already handled, with or without faces (errors are retried).
+        """
+        with self._reader() as conn:
+            return {row[0] for row in conn.execute("SELECT name FROM files WHERE status != 'error'")}
+
+    def no_face_files(self) -> List[str]:
+        with self._reader() as conn:
+            return [row[0] for row in conn.execute("SELECT name FROM files WHERE status = 'no_face'")]
+
+    def group_memberships(self) -> Dict[str, List[str]]:
+        """
+        Images of every group, in insertion order, keyed by group name.
+        """
+        with self._reader() as conn:
+            memberships = {name: [] for (name,) in conn.execute("SELECT name FROM groups ORDER BY idx")}
+            for name, filename in conn.execute(
+                    "SELECT g.name, m.file FROM memberships m JOIN groups g ON g.idx = m.group_idx "
+                    "ORDER BY m.group_idx, m.id"):
+                memberships[name].append(filename)
+        return memberships
+
+    def face_owners(self, start: int = 0, end: int = -1) -> Tuple[np.ndarray, List[str]]:
+        """
+        Group index and file of the committed faces with ``start <= id < end``
+        (all from ``start`` on by default), aligned with ``embeddings()`` rows.
+        """
+        with self._reader() as conn:
+            rows = conn.execute("SELECT group_idx, file FROM faces WHERE id >= ? AND (? < 0 OR id < ?) ORDER BY id",
+                                (start, end, end)).fetchall()
+        return np.array([group_idx for group_idx, _ in rows], dtype=np.int32), [file for _, file in rows]
+
+    def grouped_faces(self) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Every grouped file with its faces (``id``, the row in ``embeddings()``,
+        plus ``group_idx``, ``facial_area`` and ``confidence``), in insertion order.
+        """
+        with self._reader() as conn:
+            rows = conn.execute("SELECT id, file, group_idx, facial_area, confidence FROM faces ORDER BY id")
+            for filename, faces in itertools.groupby(rows, key=lambda row: row[1]):
+                yield filename, [{'id': face_id, 'group_idx': group_idx,
+                                  'facial_area': json.loads(area), 'confidence': confidence}
+                                 for face_id, _, group_idx, area, confidence in faces]
+
+    def embeddings(self) -> np.ndarray:
+        """
+        Read-only memory map of every committed face embedding, ``(faces, dim)``.
+        """
+        # Con el lock de escritura: un commit no puede borrar el archivo entre
+        # la lectura de la generación y la apertura del mapa
+        with self._lock, self._reader() as conn:
+            conn.execute("BEGIN")
+            dim = self._meta(conn, 'dim')
+            generation = int(self._meta(conn, 'embeddings_generation') or 0)
+            rows = conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM faces").fetchone()[0]
+            if dim is None or rows == 0:
+                return np.zeros((0, int(dim or 0)), dtype=np.float32)
+            return np.memmap(self._embeddings_file_for(generation), dtype=np.float32, mode='r',
+                             shape=(rows, int(dim)))
+
+    def load_groups(self, index: Optional[IVFIndex] = None) -> Optional[FaceGroups]:
+        """
+        Restore the grouping state of the last committed run, or None when
+        there is none.
+        """
+        with self._reader() as conn:
+            # Una sola lectura consistente de la generación y los nombres
+            conn.execute("BEGIN")
+            generation = self._meta(conn, 'group_sums_generation')
+            names = [row[0] for row in conn.execute("SELECT name FROM groups ORDER BY idx")]
+            counts = np.array([row[0] for row in conn.execute("SELECT face_count FROM groups ORDER BY idx")],
+                              dtype=np.int64)
+        if generation is None:
+            return None
+        sums_path = self._group_sums_file(int(generation))
+        if not os.path.exists(sums_path):
+            return None
+        memberships = self.group_memberships()
+        sums = np.load(sums_path, mmap_mode='r')
+        if len(sums) != len(names):
+            return None
+        return FaceGroups.from_arrays(names, [memberships[name] for name in names], sums, counts, index)
+
+    def results(self) -> Optional[Dict]:
+        """
+        Summary of the last committed run plus its groups, in the format
+        returned by ``group_faces`` (without the per-file tables).
+        """
+        summary = self.summary()
+        if summary is None:
+            return None
+        output_folder = summary.get('output_folder', '')
+        with self._reader() as conn:
+            face_counts = dict(conn.execute("SELECT name, face_count FROM groups"))
+        summary['groups'] = [
+            {
+                'name': name,
+                'count': len(images),
+                'face_count': face_counts.get(name, 0),
+                'images': images,
+                'folder_path': os.path.join(output_folder, name)
+            }
+            for name, images in self.group_memberships().items()
+        ]
+        return summary
+
+    def close(self):
+        self.rollback()
+        self._conn.close()
@@ -0,0 +1,85 @@
+import os
+import time
+import uuid
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+import aiofiles
+from fastapi import UploadFile
+import logging
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_FILE_SIZE = int(os.environ.get("FACE_GROUPING_MAX_FILE_MB", "64")) * 1024 * 1024
+MAX_REQUEST_SIZE = int(os.environ.get("FACE_GROUPING_MAX_UPLOAD_MB", "2048")) * 1024 * 1024
+
+# Los temporales no tienen extensión de imagen: el catálogo y la agrupación los ignoran
+PARTIAL_SUFFIX = ".part"
+
+class UploadTooLarge(Exception):
+    pass
+
+async def stream_upload(upload: UploadFile, folder: str, max_bytes: int,
+                        chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, str, int, float]:
+    """
+    Write an upload to a temporary file in ``folder`` chunk by chunk, hashing
+    it on the way. Returns ``(tmp_path, sha256, size, seconds)``; raises
+    ``UploadTooLarge`` (after removing the partial file) past ``max_bytes``.
+    """
+    tmp_path = os.path.join(folder, f".upload-{uuid.uuid4().hex}{PARTIAL_SUFFIX}")
+    digest = hashlib.sha256()
+    size = 0
+    started = time.perf_counter()
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"{upload.filename} exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size, time.perf_counter() - started
+
+def _claim_filename(folder: str, filename: str) -> str:
+    """
+    Reserve a name in ``folder`` without overwriting: ``photo.jpg``, then
+    ``photo-1.jpg``, ``photo-2.jpg``... (O_EXCL makes the reservation atomic).
+    """
+    stem, extension = os.path.splitext(filename)
+    candidate = filename
+    attempt = 0
+    while True:
+        try:
+            os.close(os.open(os.path.join(folder, candidate), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate
+        except FileExistsError:
+            attempt += 1
+            candidate = f"{stem}-{attempt}{extension}"
+
+def finalize_upload(tmp_path: str, folder: str, filename: str, content_hash: str,
+                    find_duplicate, register, lock: threading.Lock) -> Dict:
+    """
+    Move a streamed upload into place, unless an input with the same bytes
+    already exists (``find_duplicate(hash)`` returns its name), in which case
+    the temporary file is dropped. ``register(name, hash)`` records the new
+    input. ``lock`` (one per input folder) makes the check and registration
+    atomic. Blocking; call off the event loop.
+    """
+    with lock:
+        duplicate_of: Optional[str] = find_duplicate(content_hash)
+        if duplicate_of is not None:
+            os.remove(tmp_path)
+            return {'filename': filename, 'duplicate_of': duplicate_of}
+
+        final_name = _claim_filename(folder, os.path.basename(filename))
+        os.replace(tmp_path, os.path.join(folder, final_name))
+        register(final_name, content_hash)
+    return {'filename': final_name, 'duplicate_of': None}
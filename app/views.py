@@ -1,77 +1,241 @@
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+import time
+# Inicio de la importación de la app, para medir cuánto tarda en arrancar
+IMPORT_STARTED = time.perf_counter()
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Query, Depends
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import os
-import shutil
+import asyncio
+from email.utils import formatdate
 import json
-import zipfile
-from typing import List
+import tempfile
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
-import aiofiles
-from .grouping import group_faces
+from .grouping import group_faces, get_face_embeddings, warm_up, CLUSTERING_MODES, DETECTOR_CASCADES
+from .catalog import HEAVY_RESULT_KEYS
+from .extraction import DEFAULT_BATCH_SIZE, default_workers
+from .jobs import JobManager
+from .zipstream import iter_zip
+from .thumbnails import DEFAULT_THUMBNAIL_SIZE, THUMBNAIL_SIZES, get_thumbnail, thumbnail_etag
+from .materialize import DEFAULT_STRATEGY, STRATEGIES as MATERIALIZATION_STRATEGIES
+from .metrics import REGISTRY
+from .profiling import profiled
+from .search import DEFAULT_TOP_K, SEARCH_SECONDS
+from .uploads import MAX_FILE_SIZE, MAX_REQUEST_SIZE, UploadTooLarge, finalize_upload, stream_upload
+from .warmup import Warmup
+from .workspaces import DEFAULT_WORKSPACE, Workspace, WorkspaceManager, WorkspaceNotFound
 
 # Initialize FastAPI app
 app = FastAPI(title="Face Grouping MVP", description="Agrupa fotos por rostro automáticamente")
 
+# Latencia por ruta (plantilla, no la URL concreta, para no multiplicar las series)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_seconds", "Request latency until the response headers are sent", ("method", "route", "status"))
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                                     route=route.path if route is not None else "unmatched", status=status)
+
 # Mount static files
 # app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 # Templates
-templates = Jinja2Templates(directory="app/templates")
+# Relativas al paquete: no dependen del directorio de trabajo
+templates = Jinja2Templates(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+
+# Espacios de trabajo aislados (entradas, grupos, resultados, cachés, catálogo e
+# índice de búsqueda propios), elegidos con ?workspace=; sin él se usa "default",
+# con las carpetas input_photos/ y grouped_photos/ de siempre
+INPUTS_PAGE_SIZE = 120
+GROUPS_PAGE_SIZE = 30
+WATCH_FILESYSTEM = os.environ.get("FACE_GROUPING_WATCH") == "1"
+workspaces = WorkspaceManager()
+
+def _open_workspace(name: str, create: bool = False) -> Workspace:
+    try:
+        return workspaces.get(name, create=create)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkspaceNotFound:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+
+def get_workspace(workspace: str = Query(DEFAULT_WORKSPACE)) -> Workspace:
+    return _open_workspace(workspace)
+
+def create_workspace(workspace: str = Query(DEFAULT_WORKSPACE)) -> Workspace:
+    # Solo subir imágenes crea un espacio nuevo; el resto de rutas responde 404
+    return _open_workspace(workspace, create=True)
+
+def _workspace_query(name: str, separator: str = "?") -> str:
+    # Las URLs del espacio por defecto quedan como antes
+    return "" if name == DEFAULT_WORKSPACE else f"{separator}workspace={name}"
+
+# Planificador global de trabajos en segundo plano: como mucho MAX_CONCURRENT_JOBS a
+# la vez y uno por espacio, tomados por turnos entre espacios. La inferencia de todos
+# comparte un pool de INFERENCE_WORKERS procesos, así que un trabajo grande no
+# acapara la CPU ni deja esperando a los demás
+MAX_CONCURRENT_JOBS = int(os.environ.get("FACE_GROUPING_MAX_JOBS", "2"))
+INFERENCE_WORKERS = int(os.environ.get("FACE_GROUPING_INFERENCE_WORKERS", "0")) or default_workers()
+JOB_EVENTS_INTERVAL = 0.5
+JOB_RESULT_EXCLUDED_KEYS = HEAVY_RESULT_KEYS + ('groups',)
+
+def _inference_workers(requested: Optional[int]) -> int:
+    # 1 corre en el hilo del trabajo; cualquier otro valor usa el pool compartido
+    return 1 if requested == 1 else INFERENCE_WORKERS
+
+def _run_grouping(workspace: str, profile: bool = False, **params) -> Dict:
+    workspace = workspaces.get(workspace)
+    # El lock del espacio evita que un /clear lo vacíe a mitad de la ejecución
+    with workspace.lock:
+        params.update(input_folder=workspace.input_folder, output_folder=workspace.output_folder,
+                      store=workspace.store, cache=workspace.cache)
+        if profile:
+            with profiled("process") as report:
+                results = group_faces(**params)
+            results['profile'] = report
+        else:
+            results = group_faces(**params)
+        workspace.catalog.set_results(results)
+        workspace.search_index.invalidate(full=results.get('mode') != "incremental")
+    # El trabajo guarda solo el resumen (se devuelve en /jobs y en el stream de
+    # eventos); los grupos se consultan en /results
+    return {k: v for k, v in results.items() if k not in JOB_RESULT_EXCLUDED_KEYS}
+
+job_manager = JobManager(_run_grouping, max_concurrent=MAX_CONCURRENT_JOBS)
+
+def _scheduler_stats() -> Dict:
+    return {**job_manager.stats(), "inference_workers": INFERENCE_WORKERS}
+
+# Carga de modelos en segundo plano al arrancar (FACE_GROUPING_WARMUP=0 la desactiva);
+# calienta el extractor que usa /process con los parámetros por defecto
+WARMUP_ENABLED = os.environ.get("FACE_GROUPING_WARMUP", "1") != "0"
+warmup = Warmup(lambda: warm_up(workers=INFERENCE_WORKERS))
+startup_seconds: Optional[float] = None
+
+def _input_image_info(workspace: Workspace, filename: str) -> Dict:
+    query = _workspace_query(workspace.name)
+    return {
+        'filename': filename,
+        'path': f"/input_image/{filename}{query}",
+        'thumbnail': f"/input_thumbnail/{filename}{query}"
+    }
 
-# Ensure directories exist
-INPUT_FOLDER = "input_photos"
-OUTPUT_FOLDER = "grouped_photos"
+def _resolve_group_image(workspace: Workspace, group_name: str, filename: str) -> Optional[str]:
+    """
+    Ruta real de una imagen de un grupo: el archivo en la carpeta de grupos si
+    fue materializado, o el original en la de entrada si el grupo es virtual.
+    """
+    if not workspace.catalog.in_group(group_name, filename):
+        return None
+    return _group_image_path(workspace, group_name, filename)
 
-os.makedirs(INPUT_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+def _group_image_path(workspace: Workspace, group_name: str, filename: str) -> Optional[str]:
+    # Para imágenes que ya se sabe que son del grupo
+    image_path = os.path.join(workspace.output_folder, group_name, filename)
+    if os.path.exists(image_path):
+        return image_path
+    
+    source_path = os.path.join(workspace.input_folder, filename)
+    if os.path.exists(source_path):
+        return source_path
+    return None
+
+@app.on_event("startup")
+async def start_catalog_watcher():
+    # Solo el espacio por defecto puede cambiar desde fuera de la app
+    if WATCH_FILESYSTEM:
+        workspaces.get(DEFAULT_WORKSPACE).catalog.watch()
+
+@app.on_event("startup")
+async def start_model_warmup():
+    global startup_seconds
+    if WARMUP_ENABLED:
+        warmup.start()
+    else:
+        warmup.disable()
+    startup_seconds = round(time.perf_counter() - IMPORT_STARTED, 3)
 
 @app.get("/", response_class=HTMLResponse)
-async def index(request: Request):
+async def index(request: Request, input_page: int = Query(1, ge=1), group_page: int = Query(1, ge=1),
+                workspace: str = Query(DEFAULT_WORKSPACE)):
     """
     Página principal con formulario de carga y visualización de resultados.
-    Muestra grupos existentes si los hay.
+    Muestra grupos existentes si los hay, paginados junto con las imágenes subidas.
+    Un espacio de trabajo que aún no existe se muestra vacío (se crea al subir).
     """
-    # Verificar si existen resultados previos
-    groups = []
+    try:
+        current = _open_workspace(workspace)
+    except HTTPException as e:
+        if e.status_code != 404:
+            raise
+        current = None
+    
+    # Resultados previos e imágenes de entrada desde el catálogo en memoria
     processing_info = None
+    groups, group_count, grouped_count = [], 0, 0
+    input_images, input_count = [], 0
+    if current is not None:
+        catalog = current.catalog
+        processing_info = catalog.results
+        group_page_items, group_count = catalog.groups_page((group_page - 1) * GROUPS_PAGE_SIZE, GROUPS_PAGE_SIZE)
+        groups = [
+            {'name': name, 'count': len(images), 'images': images}
+            for name, images in group_page_items
+        ]
+        grouped_count = catalog.grouped_count
+        
+        filenames, input_count = catalog.inputs_page((input_page - 1) * INPUTS_PAGE_SIZE, INPUTS_PAGE_SIZE)
+        input_images = [_input_image_info(current, filename) for filename in filenames]
     
-    if os.path.exists("processing_results.json"):
-        try:
-            with open("processing_results.json", 'r') as f:
-                processing_info = json.load(f)
-                groups = processing_info.get('groups', [])
-        except Exception as e:
-            print(f"Error loading previous results: {e}")
-    
-    # Obtener imágenes en input_folder
-    input_images = []
-    if os.path.exists(INPUT_FOLDER):
-        for filename in os.listdir(INPUT_FOLDER):
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')):
-                input_images.append({
-                    'filename': filename,
-                    'path': f"/input_image/{filename}"
-                })
-    
-    input_count = len(input_images)
-    
-    return templates.TemplateResponse("index.html", {
-        "request": request,
+    return templates.TemplateResponse(request, "index.html", {
+        "workspace": workspace,
+        "workspace_query": _workspace_query(workspace),
+        "workspace_param": _workspace_query(workspace, "&"),
         "groups": groups,
+        "group_count": group_count,
+        "grouped_count": grouped_count,
         "input_images": input_images,
         "input_count": input_count,
-        "processing_info": processing_info
+        "processing_info": processing_info,
+        "input_page": input_page,
+        "input_pages": max(1, -(-input_count // INPUTS_PAGE_SIZE)),
+        "group_page": group_page,
+        "group_pages": max(1, -(-group_count // GROUPS_PAGE_SIZE))
     })
 
 @app.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)):
+async def upload_files(request: Request, files: List[UploadFile] = File(...),
+                       workspace: Workspace = Depends(create_workspace)):
     """
-    Sube múltiples archivos de imagen al directorio input_photos/.
+    Sube múltiples archivos de imagen a la carpeta de entrada del espacio de
+    trabajo, que se crea si aún no existe.
+    Cada archivo se escribe por bloques mientras se calcula su hash: las
+    imágenes con el mismo contenido que una ya subida se omiten, y si el nombre
+    ya existe con otro contenido se guarda con un sufijo (`foto-1.jpg`) en lugar
+    de sobrescribirla. Se aplican límites de tamaño por archivo y por petición.
     """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_REQUEST_SIZE:
+        raise HTTPException(status_code=413, detail=f"Request exceeds the {MAX_REQUEST_SIZE} byte limit")
+    
     uploaded_files = []
+    renamed = []
+    duplicates = []
+    uploads = []
     errors = []
+    request_bytes = 0
+    started = time.perf_counter()
     
     for file in files:
         if file.filename is None:
@@ -83,12 +247,30 @@ async def upload_files(files: List[UploadFile] = File(...)):
             file_extension = Path(file.filename).suffix.lower()
             if file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']:
                 try:
-                    # Save file to input folder
-                    file_path = os.path.join(INPUT_FOLDER, file.filename)
-                    async with aiofiles.open(file_path, 'wb') as f:
-                        content = await file.read()
-                        await f.write(content)
-                    uploaded_files.append(file.filename)
+                    # Escritura por bloques con hash incremental; el límite por
+                    # petición se descuenta de lo ya recibido
+                    max_bytes = min(MAX_FILE_SIZE, MAX_REQUEST_SIZE - request_bytes)
+                    tmp_path, content_hash, size, seconds = await stream_upload(file, workspace.input_folder, max_bytes)
+                    request_bytes += size
+                    
+                    saved = await run_in_threadpool(
+                        finalize_upload, tmp_path, workspace.input_folder, file.filename, content_hash,
+                        workspace.catalog.find_by_hash, workspace.catalog.add_input, workspace.catalog.upload_lock)
+                    if saved['duplicate_of'] is not None:
+                        duplicates.append(saved)
+                        continue
+                    
+                    uploaded_files.append(saved['filename'])
+                    if saved['filename'] != file.filename:
+                        renamed.append({"original": file.filename, "filename": saved['filename']})
+                    uploads.append({
+                        "filename": saved['filename'],
+                        "bytes": size,
+                        "seconds": round(seconds, 4),
+                        "mb_per_second": round(size / seconds / (1024 * 1024), 2) if seconds > 0 else None
+                    })
+                except UploadTooLarge as e:
+                    errors.append(f"File too large: {str(e)}")
                 except Exception as e:
                     errors.append(f"Error uploading {file.filename}: {str(e)}")
             else:
@@ -96,215 +278,470 @@ async def upload_files(files: List[UploadFile] = File(...)):
         else:
             errors.append(f"Invalid file type: {file.filename}")
     
+    elapsed = time.perf_counter() - started
     return {
         "uploaded": uploaded_files,
+        "renamed": renamed,
+        "duplicates": duplicates,
         "errors": errors,
-        "total_uploaded": len(uploaded_files)
+        "total_uploaded": len(uploaded_files),
+        "uploads": uploads,
+        "total_bytes": request_bytes,
+        "mb_per_second": round(request_bytes / elapsed / (1024 * 1024), 2) if elapsed > 0 else None
     }
 
-@app.post("/process")
-async def process_images():
+@app.post("/process", status_code=202)
+async def process_images(workers: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                         matching: str = "exact", mode: str = "incremental",
+                         materialization: str = DEFAULT_STRATEGY, clustering: str = "greedy",
+                         detectors: str = "accurate", profile: bool = False,
+                         workspace: Workspace = Depends(get_workspace)):
     """
-    Procesa las imágenes subidas y las agrupa por rostros usando DeepFace.
+    Encola el procesamiento de las imágenes subidas y responde de inmediato con
+    el id del trabajo; el progreso se consulta en /jobs/{job_id} o se sigue en
+    vivo con /jobs/{job_id}/events.
+    Los trabajos de distintos espacios de trabajo corren en paralelo (hasta
+    FACE_GROUPING_MAX_JOBS a la vez, por turnos entre espacios); los de un mismo
+    espacio, uno tras otro.
+    `workers=1` extrae los embeddings en el propio trabajo; con cualquier otro
+    valor se usa el pool de procesos que comparten todos los trabajos
+    (FACE_GROUPING_INFERENCE_WORKERS). `batch_size` es el tamaño de los lotes;
+    `matching` elige búsqueda exacta ("exact") o aproximada ("ann") de grupos.
+    Por defecto (`mode="incremental"`) solo se procesan las imágenes nuevas y se
+    agregan a los grupos existentes; `mode="full"` reconstruye todos los grupos.
+    `materialization` define cómo se colocan las imágenes en cada grupo:
+    "hardlink" (por defecto), "symlink", "reflink", "copy" o "virtual".
+    `clustering="global"` agrupa todos los rostros en una sola pasada en lugar
+    de asignarlos uno a uno ("greedy"); siempre reconstruye los grupos.
+    `detectors` elige la cascada de detectores: "accurate" (RetinaFace) o
+    "fast" (OpenCV, pasando a RetinaFace solo en imágenes dudosas).
+    Con `profile=true` la ejecución se perfila con cProfile: el volcado queda en
+    la carpeta de perfiles y el resultado incluye su ruta y las funciones más costosas.
+    Una petición idéntica a un trabajo pendiente devuelve ese mismo trabajo.
     """
-    try:
-        # Verificar que hay imágenes para procesar
-        image_files = [f for f in os.listdir(INPUT_FOLDER) 
-                      if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'))]
-        
-        if not image_files:
-            raise HTTPException(status_code=400, detail="No images found in input folder")
-        
-        # Ejecutar el procesamiento de agrupación
-        results = group_faces(INPUT_FOLDER, OUTPUT_FOLDER)
-        
-        if results['success']:
-            return {
-                "success": True,
-                "message": results['message'],
-                "groups": results['groups'],
-                "stats": results['stats']
-            }
-        else:
-            raise HTTPException(status_code=500, detail=results['message'])
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+    if matching not in ("exact", "ann"):
+        raise HTTPException(status_code=400, detail=f"Unknown matching mode: {matching}")
+    if mode not in ("incremental", "full"):
+        raise HTTPException(status_code=400, detail=f"Unknown processing mode: {mode}")
+    if materialization not in MATERIALIZATION_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown materialization strategy: {materialization}")
+    if clustering not in CLUSTERING_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown clustering mode: {clustering}")
+    if detectors not in DETECTOR_CASCADES:
+        raise HTTPException(status_code=400, detail=f"Unknown detector cascade: {detectors}")
+    
+    # Verificar que hay imágenes para procesar
+    if workspace.catalog.input_count == 0:
+        raise HTTPException(status_code=400, detail="No images found in input folder")
+    
+    job, created = job_manager.submit({
+        "workspace": workspace.name,
+        "workers": _inference_workers(workers),
+        "batch_size": batch_size,
+        "matching": matching,
+        "mode": mode,
+        "materialization": materialization,
+        "clustering": clustering,
+        "detectors": detectors,
+        "profile": profile
+    }, queue=workspace.name)
+    
+    return {
+        "success": True,
+        "workspace": workspace.name,
+        "job_id": job.id,
+        "status": job.status,
+        "created": created,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }
+
+@app.get("/jobs")
+async def list_jobs(workspace: Optional[str] = None):
+    """
+    Lista los trabajos de procesamiento recientes, de todos los espacios de
+    trabajo o solo de `workspace`.
+    """
+    return {"jobs": [job.to_dict() for job in job_manager.list(workspace)]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Estado, progreso y resultado de un trabajo de procesamiento.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events con el progreso del trabajo (imagen actual, throughput y
+    ETA). El stream termina cuando el trabajo finaliza.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last_version = -1
+        while True:
+            if job.version != last_version:
+                last_version = job.version
+                yield f"data: {json.dumps(job.to_dict())}\n\n"
+                if job.finished:
+                    break
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
 @app.get("/results")
-async def get_results():
+async def get_results(offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+                      workspace: Workspace = Depends(get_workspace)):
     """
-    Obtiene los resultados del procesamiento y información de grupos.
+    Obtiene el resumen del último procesamiento y una página de grupos
+    (`offset`/`limit`). El detalle por archivo no se incluye.
     """
     try:
-        # Check if processing results exist
-        if os.path.exists("processing_results.json"):
-            with open("processing_results.json", 'r') as f:
-                results = json.load(f)
-        else:
-            results = None
-        
-        # Get group folders info
-        groups = []
-        if os.path.exists(OUTPUT_FOLDER):
-            for group_folder in os.listdir(OUTPUT_FOLDER):
-                group_path = os.path.join(OUTPUT_FOLDER, group_folder)
-                if os.path.isdir(group_path):
-                    images = [f for f in os.listdir(group_path) 
-                             if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'))]
-                    groups.append({
-                        "name": group_folder,
-                        "image_count": len(images),
-                        "images": images
-                    })
+        # Get group info
+        page, total = workspace.catalog.groups_page(offset, limit)
+        groups = [
+            {
+                "name": group_name,
+                "image_count": len(images),
+                "images": images
+            }
+            for group_name, images in page
+        ]
         
         return {
-            "processing_results": results,
-            "groups": groups
+            "processing_results": workspace.catalog.results,
+            "groups": groups,
+            "total_groups": total,
+            "offset": offset,
+            "limit": limit
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting results: {str(e)}")
 
+@app.post("/search")
+async def search_faces(file: UploadFile = File(...), top_k: int = Query(DEFAULT_TOP_K, ge=1, le=100),
+                       min_similarity: Optional[float] = Query(None, ge=-1.0, le=1.0),
+                       workspace: Workspace = Depends(get_workspace)):
+    """
+    Busca a las personas de una foto de consulta entre los rostros ya agrupados
+    del espacio de trabajo.
+    La imagen se procesa con la misma detección y modelo que /process y, por
+    cada rostro encontrado, se devuelven los `top_k` grupos (por centroide) y
+    las `top_k` imágenes más parecidas (por su mejor rostro), con la similitud
+    coseno; `min_similarity` descarta los resultados por debajo de ese valor.
+    """
+    if not (file.filename or "").lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')):
+        raise HTTPException(status_code=400, detail=f"Unsupported file format: {file.filename}")
+    
+    try:
+        tmp_path, _, _, _ = await stream_upload(file, tempfile.gettempdir(), MAX_FILE_SIZE)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"File too large: {str(e)}")
+    
+    try:
+        started = time.perf_counter()
+        with SEARCH_SECONDS.time(stage="embed"):
+            # En el pool compartido que calentó el arranque; la consulta no se guarda en la caché
+            faces = await run_in_threadpool(get_face_embeddings, tmp_path, workspace.cache,
+                                            INFERENCE_WORKERS, False)
+        embed_seconds = time.perf_counter() - started
+    finally:
+        os.remove(tmp_path)
+    
+    if not faces:
+        raise HTTPException(status_code=422, detail="No face detected in the query image")
+    
+    def search_all() -> List[Dict]:
+        return [workspace.search_index.search(face['embedding'], top_k, min_similarity) for face in faces]
+    
+    started = time.perf_counter()
+    matches = await run_in_threadpool(search_all)
+    search_seconds = time.perf_counter() - started
+    
+    query = _workspace_query(workspace.name)
+    for face_matches in matches:
+        for image in face_matches['images']:
+            image['thumbnail'] = f"/thumbnail/{image['group']}/{image['filename']}{query}"
+            image['path'] = f"/image/{image['group']}/{image['filename']}{query}"
+    
+    return {
+        "success": True,
+        "faces": [
+            {'facial_area': face['facial_area'], 'confidence': face['confidence'], **face_matches}
+            for face, face_matches in zip(faces, matches)
+        ],
+        "indexed_faces": len(workspace.search_index),
+        "embed_ms": round(embed_seconds * 1000, 2),
+        "search_ms": round(search_seconds * 1000, 2)
+    }
+
 @app.get("/image/{group_name}/{filename}")
-async def get_image(group_name: str, filename: str):
+async def get_image(group_name: str, filename: str, workspace: Workspace = Depends(get_workspace)):
     """
     Sirve una imagen específica de un grupo para mostrar en la galería.
     """
-    image_path = os.path.join(OUTPUT_FOLDER, group_name, filename)
+    image_path = _resolve_group_image(workspace, group_name, filename)
     
-    if not os.path.exists(image_path):
+    if image_path is None:
         raise HTTPException(status_code=404, detail="Image not found")
     
     return FileResponse(image_path)
 
+THUMBNAIL_CACHE_CONTROL = "public, max-age=604800"
+
+async def _thumbnail_response(request: Request, workspace: Workspace, source_path: str, size: int) -> Response:
+    """
+    Miniatura JPEG cacheada en disco con ETag/Last-Modified del original. Si el
+    cliente ya la tiene responde 304; la decodificación corre fuera del event loop.
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Unsupported thumbnail size: {size}")
+    
+    etag = f'"{thumbnail_etag(source_path, size)}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(os.path.getmtime(source_path), usegmt=True),
+        "Cache-Control": THUMBNAIL_CACHE_CONTROL
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        path, _ = await run_in_threadpool(get_thumbnail, source_path, size, workspace.thumbnail_folder)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating thumbnail: {str(e)}")
+    
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+@app.get("/thumbnail/{group_name}/{filename}")
+async def get_thumbnail_image(request: Request, group_name: str, filename: str,
+                              size: int = DEFAULT_THUMBNAIL_SIZE, workspace: Workspace = Depends(get_workspace)):
+    """
+    Sirve una miniatura de una imagen de un grupo para la galería.
+    """
+    image_path = _resolve_group_image(workspace, group_name, filename)
+    
+    if image_path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    return await _thumbnail_response(request, workspace, image_path, size)
+
+def _zip_response(entries: List[Tuple[str, str]], zip_filename: str) -> StreamingResponse:
+    """
+    Respuesta ZIP generada en streaming (en un hilo aparte, sin archivos temporales).
+    """
+    return StreamingResponse(
+        iter_zip(entries),
+        media_type='application/zip',
+        headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
+    )
+
+def _group_entries(workspace: Workspace, group_name: str, group_images: List[str],
+                   prefix: str = "") -> List[Tuple[str, str]]:
+    """
+    Entradas del ZIP de un grupo; recorre el disco, llamar fuera del event loop.
+    """
+    entries = []
+    for filename in group_images:
+        file_path = _group_image_path(workspace, group_name, filename)
+        if file_path is not None:
+            entries.append((prefix + filename, file_path))
+    return entries
+
+@app.get("/download")
+async def download_groups(groups: Optional[List[str]] = Query(None), workspace: Workspace = Depends(get_workspace)):
+    """
+    Descarga varios grupos (`?groups=person_1&groups=person_2`) o todos si no se
+    indica ninguno, en un solo ZIP con una carpeta por grupo.
+    """
+    all_groups = workspace.catalog.groups()
+    selected = groups or list(all_groups)
+    
+    missing = [group_name for group_name in selected if group_name not in all_groups]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Group not found: {', '.join(missing)}")
+    
+    def list_entries() -> List[Tuple[str, str]]:
+        entries = []
+        for group_name in selected:
+            entries.extend(_group_entries(workspace, group_name, all_groups[group_name], prefix=f"{group_name}/"))
+        return entries
+    
+    entries = await run_in_threadpool(list_entries)
+    
+    zip_filename = "all_groups.zip" if not groups else "groups.zip"
+    return _zip_response(entries, zip_filename)
+
 @app.get("/download/{group_name}")
-async def download_group(group_name: str):
+async def download_group(group_name: str, workspace: Workspace = Depends(get_workspace)):
     """
     Descarga un grupo específico como archivo ZIP.
     """
-    group_path = os.path.join(OUTPUT_FOLDER, group_name)
+    group_images = workspace.catalog.group_images(group_name)
     
-    if not os.path.exists(group_path):
+    if group_images is None:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    # Crear archivo ZIP temporal
-    zip_filename = f"{group_name}.zip"
-    zip_path = os.path.join(OUTPUT_FOLDER, zip_filename)
-    
-    try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for filename in os.listdir(group_path):
-                if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')):
-                    file_path = os.path.join(group_path, filename)
-                    zipf.write(file_path, filename)
-        
-        return FileResponse(
-            zip_path, 
-            media_type='application/zip',
-            filename=zip_filename,
-            headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating ZIP file: {str(e)}")
+    entries = await run_in_threadpool(_group_entries, workspace, group_name, group_images)
+    return _zip_response(entries, f"{group_name}.zip")
 
 @app.delete("/clear")
-async def clear_all():
+async def clear_all(workspace: Workspace = Depends(get_workspace)):
     """
-    Limpia todas las imágenes subidas y resultados de procesamiento.
+    Limpia todas las imágenes subidas y resultados de procesamiento del espacio
+    de trabajo; los demás espacios no se tocan.
     """
+    if job_manager.busy(workspace.name) or workspace.lock.locked():
+        raise HTTPException(status_code=409, detail="A processing job is still running")
+    
     try:
-        # Clear input folder
-        if os.path.exists(INPUT_FOLDER):
-            for file in os.listdir(INPUT_FOLDER):
-                file_path = os.path.join(INPUT_FOLDER, file)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-        
-        # Clear output folder
-        if os.path.exists(OUTPUT_FOLDER):
-            shutil.rmtree(OUTPUT_FOLDER)
-            os.makedirs(OUTPUT_FOLDER)
-        
-        # Remove processing results
-        if os.path.exists("processing_results.json"):
-            os.remove("processing_results.json")
-        
+        await run_in_threadpool(workspace.clear)
         return {"success": True, "message": "All data cleared successfully"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing data: {str(e)}")
 
 @app.get("/status")
-async def get_status():
+async def get_status(workspace: Workspace = Depends(get_workspace)):
     """
-    Obtiene el estado actual de la aplicación.
+    Obtiene el estado actual del espacio de trabajo y del planificador global.
+    `models.ready` indica si los modelos ya están cargados; antes de eso
+    /process funciona igual, pero el primer trabajo espera la carga.
     """
-    input_count = len([f for f in os.listdir(INPUT_FOLDER) 
-                      if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'))])
-    
-    group_count = 0
-    total_grouped_images = 0
-    
-    if os.path.exists(OUTPUT_FOLDER):
-        for group_folder in os.listdir(OUTPUT_FOLDER):
-            group_path = os.path.join(OUTPUT_FOLDER, group_folder)
-            if os.path.isdir(group_path):
-                group_count += 1
-                images = [f for f in os.listdir(group_path) 
-                         if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'))]
-                total_grouped_images += len(images)
+    catalog = workspace.catalog
+    active_job = job_manager.active(workspace.name)
     
     return {
-        "input_images": input_count,
-        "groups_created": group_count,
-        "grouped_images": total_grouped_images,
-        "has_results": os.path.exists("processing_results.json")
+        "workspace": workspace.name,
+        "input_images": catalog.input_count,
+        "groups_created": catalog.group_count,
+        "grouped_images": catalog.grouped_count,
+        "has_results": catalog.results is not None,
+        "embedding_cache": workspace.cache.stats(),
+        "active_job": active_job.to_dict() if active_job else None,
+        "jobs": job_manager.usage(workspace.name),
+        "scheduler": _scheduler_stats(),
+        "models": warmup.to_dict(),
+        "startup_seconds": startup_seconds
     }
 
+@app.get("/workspaces")
+async def list_workspaces():
+    """
+    Lista los espacios de trabajo con sus trabajos, y el estado del planificador
+    global (trabajos en curso y en espera, procesos de inferencia).
+    """
+    return {
+        "workspaces": [{"name": name, "jobs": job_manager.usage(name)} for name in workspaces.names()],
+        "scheduler": _scheduler_stats()
+    }
+
+def _existing_workspace(name: str) -> str:
+    try:
+        WorkspaceManager.validate(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not workspaces.exists(name):
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    return name
+
+@app.get("/workspaces/{name}")
+async def get_workspace_usage(name: str):
+    """
+    Uso de recursos de un espacio de trabajo: imágenes y grupos, bytes en disco
+    por carpeta (entradas, grupos, resultados, cachés), estadísticas de la caché
+    de embeddings y del índice de búsqueda, y trabajos ejecutados con su tiempo
+    de procesamiento acumulado.
+    """
+    workspace = workspaces.get(_existing_workspace(name))
+    usage = await run_in_threadpool(workspace.usage)
+    return {"name": workspace.name, **usage, "jobs": job_manager.usage(workspace.name)}
+
+@app.delete("/workspaces/{name}")
+async def delete_workspace(name: str):
+    """
+    Elimina un espacio de trabajo con todo su contenido. El espacio "default"
+    solo se puede limpiar con /clear.
+    """
+    name = _existing_workspace(name)
+    if name == DEFAULT_WORKSPACE:
+        raise HTTPException(status_code=400, detail="The default workspace cannot be removed")
+    if job_manager.busy(name):
+        raise HTTPException(status_code=409, detail="A processing job is still running")
+    
+    await run_in_threadpool(workspaces.remove, name)
+    return {"success": True, "message": f"Workspace {name} deleted successfully"}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Métricas en formato de texto de Prometheus: latencia por etapa del
+    agrupamiento, decodificación, detección y embeddings, y latencia de cada ruta.
+    """
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/input_image/{filename}")
-async def get_input_image(filename: str):
+async def get_input_image(filename: str, workspace: Workspace = Depends(get_workspace)):
     """
-    Sirve una imagen específica de la carpeta input_photos para mostrar en la galería.
+    Sirve una imagen específica de la carpeta de entrada para mostrar en la galería.
     """
-    image_path = os.path.join(INPUT_FOLDER, filename)
+    image_path = os.path.join(workspace.input_folder, filename)
     
     if not os.path.exists(image_path):
         raise HTTPException(status_code=404, detail="Image not found")
     
     return FileResponse(image_path)
 
+@app.get("/input_thumbnail/{filename}")
+async def get_input_thumbnail(request: Request, filename: str, size: int = DEFAULT_THUMBNAIL_SIZE,
+                              workspace: Workspace = Depends(get_workspace)):
+    """
+    Sirve una miniatura de una imagen de la carpeta de entrada para la galería.
+    """
+    image_path = os.path.join(workspace.input_folder, filename)
+    
+    if not os.path.exists(image_path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    return await _thumbnail_response(request, workspace, image_path, size)
+
 @app.get("/input_images")
-async def get_input_images():
+async def get_input_images(offset: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=5000),
+                           workspace: Workspace = Depends(get_workspace)):
     """
-    Obtiene la lista de imágenes en la carpeta input_photos.
+    Obtiene una página (`offset`/`limit`) de las imágenes en la carpeta de entrada.
     """
-    input_images = []
-    if os.path.exists(INPUT_FOLDER):
-        for filename in os.listdir(INPUT_FOLDER):
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')):
-                input_images.append({
-                    'filename': filename,
-                    'path': f"/input_image/{filename}"
-                })
+    filenames, total = workspace.catalog.inputs_page(offset, limit)
     
     return {
-        "images": input_images,
-        "count": len(input_images)
+        "images": [_input_image_info(workspace, filename) for filename in filenames],
+        "count": total,
+        "offset": offset,
+        "limit": limit
     }
 
 @app.delete("/input_image/{filename}")
-async def delete_input_image(filename: str):
+async def delete_input_image(filename: str, workspace: Workspace = Depends(get_workspace)):
     """
-    Elimina una imagen específica de la carpeta input_photos.
+    Elimina una imagen específica de la carpeta de entrada.
     """
-    image_path = os.path.join(INPUT_FOLDER, filename)
+    image_path = os.path.join(workspace.input_folder, filename)
     
     if not os.path.exists(image_path):
         raise HTTPException(status_code=404, detail="Image not found")
     
     try:
         os.remove(image_path)
+        workspace.catalog.remove_input(filename)
         return {"success": True, "message": f"Image {filename} deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting image: {str(e)}") 
\ No newline at end of file
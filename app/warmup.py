@@ -0,0 +1,63 @@
+import time
+import threading
+from typing import Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+class Warmup:
+    """
+    Runs a model warm-up once on a background thread and tracks whether the
+    models are ready. Requests never wait on it: a job submitted while it is
+    still running simply shares the models being loaded.
+    """
+
+    def __init__(self, target: Callable[[], None]):
+        self._target = target
+        self._thread: Optional[threading.Thread] = None
+        self.status = PENDING
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self.status = DISABLED
+
+    def _run(self):
+        self.status = WARMING
+        self.started_at = time.time()
+        started = time.perf_counter()
+        try:
+            self._target()
+            self.status = READY
+        except Exception as e:
+            logger.error(f"❌ Model warm-up failed: {str(e)}")
+            self.status = FAILED
+            self.error = str(e)
+        finally:
+            self.seconds = round(time.perf_counter() - started, 3)
+
+    def to_dict(self) -> Dict:
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "error": self.error
+        }
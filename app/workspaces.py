@@ -0,0 +1,201 @@
+import os
+import re
+import shutil
+import threading
+from typing import Dict, List, Optional
+import logging
+from .catalog import Catalog
+from .embedding_cache import EmbeddingCache
+from .grouping import get_embedding_cache, get_results_store
+from .search import FaceSearchIndex
+from .store import ResultsStore
+from .thumbnails import THUMBNAIL_CACHE_FOLDER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKSPACE = "default"
+WORKSPACES_FOLDER = "workspaces"
+# El espacio por defecto conserva las carpetas de siempre, en la raíz
+DEFAULT_INPUT_FOLDER = "input_photos"
+DEFAULT_OUTPUT_FOLDER = "grouped_photos"
+# Letras, dígitos, "-" y "_": el nombre se usa como carpeta
+WORKSPACE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+class WorkspaceNotFound(Exception):
+    pass
+
+def workspace_paths(workdir: str) -> Dict[str, str]:
+    return {
+        'inputs': os.path.join(workdir, "inputs"),
+        'groups': os.path.join(workdir, "groups"),
+        'store': os.path.join(workdir, "store"),
+        'cache': os.path.join(workdir, "embedding_cache.sqlite3"),
+        'thumbnails': os.path.join(workdir, "thumbnails")
+    }
+
+def disk_usage(path: str) -> int:
+    """
+    Bytes used by a file or a folder tree (apparent sizes; links are not followed).
+    """
+    try:
+        if not os.path.isdir(path) or os.path.islink(path):
+            return os.lstat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                continue
+    return total
+
+class Workspace:
+    """
+    One tenant's isolated state: input and output folders, results store,
+    embedding cache, thumbnail cache, catalog and search index.
+
+    ``lock`` is held while a grouping run or a clear modifies the workspace,
+    so the two never overlap.
+    """
+
+    def __init__(self, name: str, input_folder: str, output_folder: str, store: ResultsStore,
+                 cache: EmbeddingCache, thumbnail_folder: str = THUMBNAIL_CACHE_FOLDER):
+        self.name = name
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.thumbnail_folder = thumbnail_folder
+        self.store = store
+        self.cache = cache
+        self.lock = threading.Lock()
+        os.makedirs(input_folder, exist_ok=True)
+        os.makedirs(output_folder, exist_ok=True)
+        self.catalog = Catalog(input_folder, output_folder, store, cache)
+        self.search_index = FaceSearchIndex(store)
+
+    def clear(self):
+        """
+        Delete the uploaded images, groups, stored results and thumbnails
+        (the embedding cache is kept).
+        """
+        with self.lock:
+            for file in os.listdir(self.input_folder):
+                file_path = os.path.join(self.input_folder, file)
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+
+            if os.path.exists(self.output_folder):
+                shutil.rmtree(self.output_folder)
+            os.makedirs(self.output_folder)
+
+            self.store.reset()
+            if os.path.exists(self.thumbnail_folder):
+                shutil.rmtree(self.thumbnail_folder)
+
+            self.catalog.clear()
+            self.search_index.invalidate(full=True)
+        logger.info(f"🧹 Cleared workspace {self.name}")
+
+    def usage(self) -> Dict:
+        """
+        Contents and disk usage of the workspace. Walks its folders, so keep it
+        off the event loop.
+        """
+        disk = {
+            "inputs": disk_usage(self.input_folder),
+            "groups": disk_usage(self.output_folder),
+            "store": disk_usage(self.store.path),
+            "embedding_cache": sum(disk_usage(self.cache.path + suffix) for suffix in ("", "-wal")),
+            "thumbnails": disk_usage(self.thumbnail_folder)
+        }
+        disk["total"] = sum(disk.values())
+        return {
+            "input_images": self.catalog.input_count,
+            "groups_created": self.catalog.group_count,
+            "grouped_images": self.catalog.grouped_count,
+            "has_results": self.catalog.results is not None,
+            "disk_bytes": disk,
+            "embedding_cache": self.cache.stats(),
+            "search_index": self.search_index.stats()
+        }
+
+    def close(self):
+        self.store.close()
+        self.cache.close()
+
+class WorkspaceManager:
+    """
+    Workspaces by name, opened on first use. Only ``get(name, create=True)``
+    creates a new one on disk; otherwise unknown names are an error.
+
+    ``"default"`` is the original single-user layout (``input_photos/``,
+    ``grouped_photos/`` and the process-wide results store and embedding
+    cache); every other workspace lives in its own folder under ``folder``
+    with the same layout as a CLI workspace.
+    """
+
+    def __init__(self, folder: str = WORKSPACES_FOLDER):
+        self.folder = folder
+        self._workspaces: Dict[str, Workspace] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validate(name: str):
+        if not WORKSPACE_NAME.match(name):
+            raise ValueError(f"Invalid workspace name '{name}'")
+
+    def exists(self, name: str) -> bool:
+        return (name == DEFAULT_WORKSPACE or name in self._workspaces
+                or os.path.isdir(os.path.join(self.folder, name)))
+
+    def get(self, name: str = DEFAULT_WORKSPACE, create: bool = False) -> Workspace:
+        """
+        Open workspace ``name``; raises ``WorkspaceNotFound`` if it does not
+        exist yet and ``create`` is False.
+        """
+        self.validate(name)
+        with self._lock:
+            if name not in self._workspaces:
+                if not create and not self.exists(name):
+                    raise WorkspaceNotFound(f"Workspace '{name}' not found")
+                self._workspaces[name] = self._open(name)
+            return self._workspaces[name]
+
+    def _open(self, name: str) -> Workspace:
+        if name == DEFAULT_WORKSPACE:
+            return Workspace(name, DEFAULT_INPUT_FOLDER, DEFAULT_OUTPUT_FOLDER,
+                             get_results_store(), get_embedding_cache())
+        paths = workspace_paths(os.path.join(self.folder, name))
+        logger.info(f"📂 Opening workspace {name}")
+        return Workspace(name, paths['inputs'], paths['groups'], ResultsStore(paths['store']),
+                         EmbeddingCache(paths['cache']), paths['thumbnails'])
+
+    def names(self) -> List[str]:
+        """
+        The default workspace plus every workspace on disk or open.
+        """
+        names = {DEFAULT_WORKSPACE}
+        if os.path.isdir(self.folder):
+            names.update(name for name in os.listdir(self.folder)
+                         if WORKSPACE_NAME.match(name) and os.path.isdir(os.path.join(self.folder, name)))
+        with self._lock:
+            names.update(self._workspaces)
+        return sorted(names)
+
+    def remove(self, name: str):
+        """
+        Delete a workspace and everything in it. The default workspace can only
+        be cleared.
+        """
+        self.validate(name)
+        if name == DEFAULT_WORKSPACE:
+            raise ValueError("The default workspace cannot be removed")
+        with self._lock:
+            workspace: Optional[Workspace] = self._workspaces.pop(name, None)
+        if workspace is not None:
+            with workspace.lock:
+                workspace.close()
+        shutil.rmtree(os.path.join(self.folder, name), ignore_errors=True)
+        logger.info(f"🗑️ Removed workspace {name}")
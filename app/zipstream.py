@@ -0,0 +1,56 @@
+import zipfile
+from typing import Iterable, Iterator, List, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+# Formatos ya comprimidos: se guardan sin recomprimir
+STORED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+class _StreamBuffer:
+    """
+    Write-only, non-seekable sink for ``zipfile``; bytes are drained as they arrive.
+    Without ``seek``/``tell`` zipfile writes data descriptors after each entry
+    instead of rewinding to patch the local headers.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_zip(entries: Iterable[Tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Generate a ZIP archive of ``(arcname, path)`` entries chunk by chunk.
+    Memory use is bounded by ``chunk_size`` and nothing is written to disk.
+    Images in compressed formats are stored, everything else is deflated.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+        for arcname, path in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            if path.lower().endswith(STORED_EXTENSIONS):
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+
+            with open(path, 'rb') as source, archive.open(info, 'w') as destination:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    destination.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # Directorio central, escrito al cerrar el archivo
+    yield buffer.drain()
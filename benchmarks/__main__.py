@@ -0,0 +1,33 @@
+"""
+Run every benchmark with small defaults and emit one combined JSON report.
+
+    python -m benchmarks --scale 10 --output bench.json
+"""
+import os
+import argparse
+from benchmarks import (ann_benchmark, clustering_benchmark, endpoint_benchmark, pipeline_benchmark,
+                        search_benchmark, startup_benchmark)
+from benchmarks.report import emit
+
+def run(scale: int) -> dict:
+    # El pipeline y los endpoints cambian de directorio de trabajo
+    cwd = os.getcwd()
+    try:
+        return {
+            "ann": ann_benchmark.run(500 * scale, 4, 8, 0.6),
+            "clustering": clustering_benchmark.run(200 * scale, 5, 0.06, 0.6, 1, 4096),
+            "pipeline": pipeline_benchmark.run(1000 * scale, 50 * scale, 100 * scale, "hardlink",
+                                               "exact", "greedy", False, 500 * scale),
+            "search": search_benchmark.run(1000 * scale, 10, 200, 10, 0.06),
+            "endpoints": endpoint_benchmark.run(500 * scale, 50 * scale, 50, 4),
+            "startup": startup_benchmark.run(3, 16, 1, 300.0)
+        }
+    finally:
+        os.chdir(cwd)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="multiply every dataset size")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    emit("all", run(args.scale), args.output)
@@ -0,0 +1,68 @@
+"""
+Compare greedy online grouping with two-pass global clustering.
+
+Generates labelled synthetic embeddings, groups them with both strategies and
+reports wall time and pairwise precision/recall against the true identities.
+Greedy grouping is also run on a reshuffled copy to show its order dependence.
+
+Identity centers are random and nearly orthogonal, so faces of different
+people are never similar enough to be linked: global clustering reaches F1
+1.0 from 300 to 10000 identities at the default noise (0.06), and higher
+noise only splits identities. This data cannot show single-linkage chaining
+between look-alikes; on real embeddings ``--min-samples 2`` or more keeps
+isolated bridging faces from merging two clusters.
+
+    python -m benchmarks.clustering_benchmark --identities 2000 --faces 5
+"""
+import argparse
+import time
+import numpy as np
+from app.clustering import DEFAULT_TILE_SIZE, cluster_embeddings
+from benchmarks.ann_benchmark import build_groups
+from benchmarks.report import emit, pairwise_scores
+from benchmarks.synthetic import labelled_embeddings
+
+def greedy_labels(embeddings: np.ndarray, threshold: float) -> np.ndarray:
+    # El grupo que recibió cada rostro al insertarlo, como en group_faces
+    return build_groups(embeddings, threshold)[1]
+
+def run(identities: int, faces: int, noise: float, threshold: float,
+        min_samples: int, tile_size: int) -> dict:
+    embeddings, truth = labelled_embeddings(identities, faces, noise=noise)
+
+    started = time.perf_counter()
+    greedy = greedy_labels(embeddings, threshold)
+    greedy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clustered = cluster_embeddings(embeddings, threshold, min_samples, tile_size)
+    global_seconds = time.perf_counter() - started
+
+    # Mismos rostros en otro orden: el greedy puede cambiar de resultado
+    order = np.random.default_rng(1).permutation(len(embeddings))
+    reshuffled = greedy_labels(embeddings[order], threshold)
+
+    return {
+        "faces": len(embeddings),
+        "identities": identities,
+        "noise": noise,
+        "threshold": threshold,
+        "greedy": {"groups": int(greedy.max()) + 1, "seconds": round(greedy_seconds, 3),
+                   **pairwise_scores(truth, greedy),
+                   "reshuffled": pairwise_scores(truth[order], reshuffled)},
+        "global": {"groups": int(clustered.max()) + 1, "seconds": round(global_seconds, 3),
+                   "min_samples": min_samples, **pairwise_scores(truth, clustered)}
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--identities", type=int, default=2000)
+    parser.add_argument("--faces", type=int, default=5, help="faces per identity")
+    parser.add_argument("--noise", type=float, default=0.06)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--min-samples", type=int, default=1)
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    emit("clustering", run(args.identities, args.faces, args.noise, args.threshold,
+                           args.min_samples, args.tile_size), args.output)
@@ -0,0 +1,149 @@
+"""
+Load-test the read endpoints: /status, /results, the gallery page, input
+listings, thumbnails and ZIP downloads.
+
+By default a synthetic workspace is grouped with the stub backend and the
+app is driven in-process through Starlette's TestClient; with ``--url`` the
+requests go to a running server instead (its data is used as is). Any
+response other than 2xx aborts the benchmark, so a broken endpoint is never
+reported as a fast one.
+
+    python -m benchmarks.endpoint_benchmark --images 2000 --requests 200 --concurrency 8
+    python -m benchmarks.endpoint_benchmark --url http://localhost:8000
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from benchmarks.pipeline_benchmark import INPUT_FOLDER, OUTPUT_FOLDER, prepare_workspace, release_workspace
+from benchmarks.report import emit, latency_summary
+
+# (nombre, plantilla de ruta); {group} y {image} se rellenan rotando sobre los datos
+ENDPOINTS = [
+    ("status", "/status"),
+    ("results", "/results?limit=100"),
+    ("gallery", "/?input_page=1&group_page=1"),
+    ("input_images", "/input_images?limit=120"),
+    ("group_thumbnail", "/thumbnail/{group}/{image}?size=128"),
+    ("input_thumbnail", "/input_thumbnail/{image}"),
+    ("group_image", "/image/{group}/{image}"),
+    ("download_group", "/download/{group}")
+]
+
+# GET de una ruta -> (código HTTP, cuerpo)
+Fetch = Callable[[str], Tuple[int, bytes]]
+
+def client_fetch() -> Fetch:
+    from fastapi.testclient import TestClient
+    from app.views import app
+    client = TestClient(app)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    def fetch(path: str) -> Tuple[int, bytes]:
+        response = client.get(path)
+        return response.status_code, response.content
+    return fetch
+
+def url_fetch(base_url: str) -> Fetch:
+    def fetch(path: str) -> Tuple[int, bytes]:
+        try:
+            with urllib.request.urlopen(base_url.rstrip('/') + path, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, b''
+    return fetch
+
+def load_test(fetch: Fetch, path_for: Callable[[int], str], requests: int, concurrency: int) -> Dict:
+    """
+    Issue ``requests`` GETs (``path_for(i)``) from ``concurrency`` threads and
+    report latency percentiles, throughput and status codes. Raises
+    ``RuntimeError`` on the first response that is not 2xx.
+    """
+    def one(i: int) -> Tuple[float, int, int]:
+        path = path_for(i)
+        started = time.perf_counter()
+        status, body = fetch(path)
+        elapsed = time.perf_counter() - started
+        if not 200 <= status < 300:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return elapsed, status, len(body)
+
+    samples: List[float] = []
+    statuses: Dict[str, int] = {}
+    transferred = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, status, size in pool.map(one, range(requests)):
+            samples.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            transferred += size
+    wall = time.perf_counter() - started
+
+    return {
+        **latency_summary(samples),
+        "requests_per_second": round(requests / wall, 2) if wall > 0 else None,
+        "statuses": statuses,
+        "bytes": transferred
+    }
+
+def run(images: int, identities: int, requests: int, concurrency: int,
+        url: Optional[str] = None, keep: bool = False) -> Dict:
+    workspace = None
+    setup: Dict = {}
+    if url is None:
+        workspace = prepare_workspace(images, identities)
+        from app.grouping import group_faces
+        started = time.perf_counter()
+        group_faces(INPUT_FOLDER, OUTPUT_FOLDER, use_cache=False, workers=1, mode="full")
+        setup = {"images": images, "identities": identities,
+                 "dataset_seconds": workspace['dataset_seconds'],
+                 "grouping_seconds": round(time.perf_counter() - started, 3)}
+        fetch = client_fetch()
+    else:
+        fetch = url_fetch(url)
+
+    try:
+        # Grupos e imágenes reales sobre los que rotar las peticiones
+        status, body = fetch("/results?limit=50")
+        if status != 200:
+            raise RuntimeError(f"GET /results returned {status}")
+        listing = json.loads(body)
+        groups = [group['name'] for group in listing.get('groups', [])]
+        pairs = [(group['name'], image) for group in listing.get('groups', []) for image in group['images'][:5]]
+        if not pairs:
+            raise RuntimeError("No grouped images to request")
+
+        endpoints = {}
+        for name, template in ENDPOINTS:
+            def path_for(i: int, template: str = template) -> str:
+                group, image = pairs[i % len(pairs)]
+                if template.startswith("/download/"):
+                    group = groups[i % len(groups)]
+                return template.format(group=group, image=image)
+            # Las descargas son mucho más pesadas: menos peticiones
+            count = max(1, requests // 10) if name.startswith("download") else requests
+            endpoints[name] = load_test(fetch, path_for, count, concurrency)
+
+        return {"target": url or "in-process", "concurrency": concurrency, "setup": setup,
+                "endpoints": endpoints}
+    finally:
+        if workspace is not None and not keep:
+            release_workspace(workspace)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--identities", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process app")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary workspace")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    emit("endpoints", run(args.images, args.identities, args.requests, args.concurrency,
+                          args.url, args.keep), args.output)
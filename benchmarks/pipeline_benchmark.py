@@ -0,0 +1,165 @@
+"""
+Time the grouping pipeline minus inference on a synthetic image folder.
+
+Writes small JPEGs whose names encode their identities, swaps the embedding
+backend for ``StubEmbeddingBackend`` and runs ``group_faces`` end to end
+(cache, matching, materialization, results store): a full run, then an
+incremental run over new images. Also times loading the stored state and
+the per-call cost of ``find_best_group`` / ``update_group_centroid``.
+
+    python -m benchmarks.pipeline_benchmark --images 100000 --identities 5000
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Dict, Optional
+from benchmarks.report import emit, latency_summary
+from benchmarks.synthetic import StubEmbeddingBackend, labelled_embeddings, write_image_folder
+
+INPUT_FOLDER = "input_photos"
+OUTPUT_FOLDER = "grouped_photos"
+
+def _reset_app_state():
+    # Los singletons de la app apuntan a rutas relativas del workspace actual:
+    # cerrarlos antes de cambiar de directorio o borrarlo
+    import app.grouping
+    if app.grouping._results_store is not None:
+        app.grouping._results_store.close()
+    app.grouping._results_store = None
+    app.grouping._embedding_cache = None
+    views = sys.modules.get("app.views")
+    if views is not None:
+        from app.workspaces import WorkspaceManager
+        views.workspaces = WorkspaceManager()
+
+def prepare_workspace(images: int, identities: int, workdir: Optional[str] = None) -> Dict:
+    """
+    Create (and ``chdir`` into) a workspace with ``images`` synthetic inputs and
+    install the stub backend. The app keeps its state relative to the working
+    directory, so this must happen before the first grouping run.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="face-grouping-bench-")
+    _reset_app_state()
+    os.chdir(workdir)
+    started = time.perf_counter()
+    write_image_folder(INPUT_FOLDER, images, identities)
+    dataset_seconds = time.perf_counter() - started
+    StubEmbeddingBackend(identities).install()
+    # Los logs por imagen dominarían el tiempo medido
+    logging.getLogger("app").setLevel(logging.ERROR)
+    return {"workdir": workdir, "dataset_seconds": round(dataset_seconds, 3)}
+
+def release_workspace(workspace: Dict):
+    """
+    Close the app state opened in a ``prepare_workspace`` workspace and delete it.
+    """
+    _reset_app_state()
+    os.chdir(tempfile.gettempdir())
+    shutil.rmtree(workspace['workdir'], ignore_errors=True)
+
+def _run_summary(results: Dict, seconds: float) -> Dict:
+    stats = results['stats']
+    return {
+        "seconds": round(seconds, 3),
+        "images": stats['total'] - stats['already_grouped'],
+        "images_per_second": stats.get('images_per_second'),
+        "faces": stats['faces_detected'],
+        "groups": stats['total_groups'],
+        "materialize_seconds": stats['materialize_seconds'],
+        "clustering_seconds": stats.get('clustering_seconds'),
+        "stages": stats.get('stages', {})
+    }
+
+def time_group_operations(calls: int, identities: int, threshold: float = 0.6) -> Dict:
+    """
+    Per-call latency of matching and centroid updates against the stored groups.
+    """
+    from app.grouping import find_best_group, get_results_store, update_group_centroid
+
+    groups = get_results_store().load_groups()
+    queries, _ = labelled_embeddings(identities, max(1, calls // identities + 1))
+    queries = queries[:calls]
+
+    match_samples, update_samples = [], []
+    for query in queries:
+        started = time.perf_counter()
+        idx = find_best_group(query, groups, threshold)
+        match_samples.append(time.perf_counter() - started)
+        if idx is not None:
+            started = time.perf_counter()
+            update_group_centroid(groups, idx, query)
+            update_samples.append(time.perf_counter() - started)
+    return {
+        "groups": len(groups),
+        "find_best_group": latency_summary(match_samples),
+        "update_group_centroid": latency_summary(update_samples)
+    }
+
+def run(images: int, identities: int, incremental: int, materialization: str, matching: str,
+        clustering: str, use_cache: bool, calls: int, keep: bool = False) -> Dict:
+    workspace = prepare_workspace(images, identities)
+    from app.grouping import group_faces, get_results_store
+    from app.store import ResultsStore
+    try:
+        params = dict(input_folder=INPUT_FOLDER, output_folder=OUTPUT_FOLDER, use_cache=use_cache,
+                      workers=1, matching=matching, materialization=materialization)
+
+        started = time.perf_counter()
+        full = group_faces(mode="full", clustering=clustering, **params)
+        full_seconds = time.perf_counter() - started
+
+        write_image_folder(os.path.join(workspace['workdir'], "new_photos"), incremental, identities, seed=1)
+        for name in os.listdir("new_photos"):
+            # Nombres distintos a los del primer lote (los índices se repiten)
+            os.replace(os.path.join("new_photos", name), os.path.join(INPUT_FOLDER, "new_" + name))
+        started = time.perf_counter()
+        update = group_faces(mode="incremental", **params)
+        update_seconds = time.perf_counter() - started
+
+        # Estado persistido: abrir el store y reconstruir los grupos
+        started = time.perf_counter()
+        store = ResultsStore(get_results_store().path)
+        store.load_groups()
+        load_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        store.results()
+        results_seconds = time.perf_counter() - started
+        store.close()
+
+        return {
+            "images": images,
+            "identities": identities,
+            "materialization": materialization,
+            "matching": matching,
+            "clustering": clustering,
+            "use_cache": use_cache,
+            "dataset_seconds": workspace['dataset_seconds'],
+            "full_run": _run_summary(full, full_seconds),
+            "incremental_run": _run_summary(update, update_seconds),
+            "store": {"load_groups_seconds": round(load_seconds, 3),
+                      "load_results_seconds": round(results_seconds, 3)},
+            "group_operations": time_group_operations(calls, identities)
+        }
+    finally:
+        if not keep:
+            release_workspace(workspace)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=10000)
+    parser.add_argument("--identities", type=int, default=500)
+    parser.add_argument("--incremental", type=int, default=500, help="new images for the incremental run")
+    parser.add_argument("--materialization", default="hardlink")
+    parser.add_argument("--matching", default="exact")
+    parser.add_argument("--clustering", default="greedy")
+    parser.add_argument("--use-cache", action="store_true")
+    parser.add_argument("--calls", type=int, default=5000, help="group operations to time")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary workspace")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    emit("pipeline", run(args.images, args.identities, args.incremental, args.materialization,
+                         args.matching, args.clustering, args.use_cache, args.calls, args.keep), args.output)
@@ -0,0 +1,89 @@
+"""
+JSON output shared by the benchmarks, tagged with enough context (commit,
+versions, machine) to compare runs across versions, and the scores used to
+compare groupings.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from typing import Dict, List, Optional
+import numpy as np
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def latency_summary(samples: List[float]) -> Dict:
+    """
+    Count, throughput and latency percentiles (milliseconds) of timed calls.
+    """
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p95_ms": round(float(np.percentile(values, 95)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "max_ms": round(float(values.max()), 4)
+    }
+
+def _pairs(counts: np.ndarray) -> float:
+    counts = counts.astype(np.float64)
+    return float((counts * (counts - 1) / 2).sum())
+
+def pairwise_scores(truth: np.ndarray, predicted: np.ndarray) -> Dict:
+    """
+    Pairwise precision/recall: over all pairs of faces, how many pairs put in
+    the same group share an identity, and how many same-identity pairs were
+    put together.
+    """
+    _, joint = np.unique(np.stack([truth, predicted]), axis=1, return_counts=True)
+    together = _pairs(joint)
+    predicted_pairs = _pairs(np.unique(predicted, return_counts=True)[1])
+    true_pairs = _pairs(np.unique(truth, return_counts=True)[1])
+    precision = together / predicted_pairs if predicted_pairs else 1.0
+    recall = together / true_pairs if true_pairs else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4)}
+
+def adjusted_rand_index(first: np.ndarray, second: np.ndarray) -> float:
+    """
+    Agreement between two groupings of the same faces, corrected for chance
+    (1.0 identical, around 0.0 unrelated).
+    """
+    _, joint = np.unique(np.stack([first, second]), axis=1, return_counts=True)
+    together = _pairs(joint)
+    first_pairs = _pairs(np.unique(first, return_counts=True)[1])
+    second_pairs = _pairs(np.unique(second, return_counts=True)[1])
+    total = _pairs(np.array([len(first)]))
+    expected = first_pairs * second_pairs / total if total else 0.0
+    best = (first_pairs + second_pairs) / 2
+    return round((together - expected) / (best - expected), 4) if best != expected else 1.0
+
+def emit(name: str, results: Dict, output: Optional[str] = None):
+    """
+    Print ``results`` as JSON (and write them to ``output`` when given).
+    """
+    report = {"benchmark": name, "environment": environment(), "results": results}
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + "\n")
+    sys.stdout.write(text + "\n")
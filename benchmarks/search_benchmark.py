@@ -0,0 +1,65 @@
+"""
+Time /search queries against the in-memory face index.
+
+Fills ``FaceSearchIndex`` with labelled synthetic faces (one group per
+identity, centroids from the true labels) and reports per-query latency and
+how often the best group and best image belong to the probe's identity.
+
+    python -m benchmarks.search_benchmark --identities 10000 --faces 10
+"""
+import time
+import argparse
+import numpy as np
+from app.search import DEFAULT_TOP_K, FaceSearchIndex
+from benchmarks.report import emit, latency_summary
+from benchmarks.synthetic import DIM, identity_centers, labelled_embeddings
+
+def build_index(identities: int, faces: int, noise: float) -> FaceSearchIndex:
+    embeddings, labels = labelled_embeddings(identities, faces, noise=noise)
+    sums = np.zeros((identities, embeddings.shape[1]), dtype=np.float32)
+    np.add.at(sums, labels, embeddings)
+    centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    index = FaceSearchIndex()
+    index.load(embeddings, labels.astype(np.int32), [f"{i:07d}_id{label}.jpg" for i, label in enumerate(labels)],
+               [f"person_{identity + 1}" for identity in range(identities)], centroids,
+               np.bincount(labels, minlength=identities))
+    return index
+
+def run(identities: int, faces: int, queries: int, top_k: int, noise: float) -> dict:
+    started = time.perf_counter()
+    index = build_index(identities, faces, noise)
+    build_seconds = time.perf_counter() - started
+
+    # Sondas nuevas: otra muestra de ruido alrededor de los mismos centros
+    rng = np.random.default_rng(1)
+    probe_ids = rng.integers(identities, size=queries)
+    probes = identity_centers(identities)[probe_ids] + rng.normal(scale=noise, size=(queries, DIM))
+
+    samples, group_hits, image_hits = [], 0, 0
+    for identity, probe in zip(probe_ids, probes.astype(np.float32)):
+        started = time.perf_counter()
+        result = index.search(probe, top_k)
+        samples.append(time.perf_counter() - started)
+        group_hits += result['groups'][0]['name'] == f"person_{identity + 1}"
+        image_hits += result['images'][0]['filename'].endswith(f"_id{identity}.jpg")
+
+    return {
+        "faces": len(index),
+        "groups": identities,
+        "top_k": top_k,
+        "build_seconds": round(build_seconds, 3),
+        "query": latency_summary(samples),
+        "top1_group_accuracy": round(group_hits / queries, 4),
+        "top1_image_accuracy": round(image_hits / queries, 4)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--identities", type=int, default=10000)
+    parser.add_argument("--faces", type=int, default=10, help="faces per identity")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--noise", type=float, default=0.06)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    emit("search", run(args.identities, args.faces, args.queries, args.top_k, args.noise), args.output)
@@ -0,0 +1,156 @@
+"""
+Measure startup and first-request latency.
+
+- ``import``: fresh interpreters importing ``app.views``, and which heavy ML
+  modules the import pulled in (should be none).
+- ``first_response``: a uvicorn server started in a temporary workspace,
+  timed until its first ``/status`` answer, then until the background model
+  warm-up reports ready (or failed).
+- ``first_run``: with the real models (skipped when DeepFace is missing), a
+  cold ``group_faces`` run against a second one, and a run after ``warm_up``.
+
+    python -m benchmarks.startup_benchmark --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from typing import Dict, Optional
+from benchmarks.report import emit, latency_summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("deepface", "tensorflow", "keras", "retinaface", "cv2", "torch")
+
+IMPORT_SCRIPT = f"""
+import sys, json, time
+started = time.perf_counter()
+import app.views
+print(json.dumps({{"seconds": time.perf_counter() - started,
+                  "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def _environment(**extra) -> Dict[str, str]:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.update(extra)
+    return env
+
+def time_import(repeat: int) -> Dict:
+    samples, heavy = [], set()
+    workdir = tempfile.mkdtemp(prefix="face-grouping-startup-")
+    try:
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=workdir, env=_environment(),
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            samples.append(result['seconds'])
+            heavy.update(result['heavy_modules'])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {**latency_summary(samples), "heavy_modules": sorted(heavy)}
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _get_status(url: str) -> Optional[Dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None
+
+def time_first_response(warmup: bool, timeout: float) -> Dict:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/status"
+    workdir = tempfile.mkdtemp(prefix="face-grouping-startup-")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.views:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=_environment(FACE_GROUPING_WARMUP="1" if warmup else "0"),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        status = None
+        while status is None and time.perf_counter() - started < timeout:
+            status = _get_status(url)
+            time.sleep(0.02)
+        if status is None:
+            return {"error": f"no response within {timeout}s"}
+        first_response = time.perf_counter() - started
+
+        # El warm-up sigue en segundo plano; se espera a que termine
+        while status['models']['status'] in ("pending", "warming") and time.perf_counter() - started < timeout:
+            time.sleep(0.1)
+            status = _get_status(url) or status
+        return {
+            "warmup": warmup,
+            "first_response_seconds": round(first_response, 3),
+            "app_startup_seconds": status.get('startup_seconds'),
+            "models": status['models'],
+            "models_settled_seconds": round(time.perf_counter() - started, 3)
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def time_first_run(images: int, workers: int) -> Dict:
+    try:
+        import deepface  # noqa: F401
+    except ImportError:
+        return {"skipped": "deepface is not installed"}
+    from benchmarks.pipeline_benchmark import INPUT_FOLDER, OUTPUT_FOLDER
+    from benchmarks.synthetic import write_image_folder
+
+    workdir = tempfile.mkdtemp(prefix="face-grouping-startup-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        write_image_folder(INPUT_FOLDER, images, max(1, images // 4), size=160)
+        from app.grouping import group_faces, warm_up
+        params = dict(input_folder=INPUT_FOLDER, output_folder=OUTPUT_FOLDER, use_cache=False,
+                      workers=workers, mode="full")
+
+        timings = {}
+        for name in ("cold_run", "second_run"):
+            started = time.perf_counter()
+            group_faces(**params)
+            timings[name + "_seconds"] = round(time.perf_counter() - started, 3)
+        # Mismo costo de arranque para otra cascada, esta vez con warm-up previo
+        started = time.perf_counter()
+        warm_up(detectors="fast", workers=workers)
+        timings["warm_up_seconds"] = round(time.perf_counter() - started, 3)
+        started = time.perf_counter()
+        group_faces(detectors="fast", **params)
+        timings["run_after_warm_up_seconds"] = round(time.perf_counter() - started, 3)
+        return {"images": images, "workers": workers, **timings}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run(repeat: int, images: int, workers: int, timeout: float) -> Dict:
+    return {
+        "import": time_import(repeat),
+        "first_response": {
+            "without_warmup": time_first_response(False, timeout),
+            "with_warmup": time_first_response(True, timeout)
+        },
+        "first_run": time_first_run(images, workers)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters for the import timing")
+    parser.add_argument("--images", type=int, default=16, help="images for the first-run timing")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    emit("startup", run(args.repeat, args.images, args.workers, args.timeout), args.output)
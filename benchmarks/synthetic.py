@@ -0,0 +1,110 @@
+"""
+Synthetic data for the benchmarks: labelled embedding sets, image folders
+and a stub embedding backend, so the pipeline can be timed without models.
+"""
+import os
+import zlib
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from PIL import Image
+
+DIM = 128
+
+def identity_centers(identities: int, dim: int = DIM, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(identities, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    return centers
+
+def labelled_embeddings(identities: int, faces_per_identity: int, dim: int = DIM,
+                        noise: float = 0.06, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ``faces_per_identity`` noisy unit vectors around each of ``identities``
+    random centers, shuffled. Returns ``(embeddings, identity_labels)``.
+    """
+    # Flujo distinto del de los centros: con la misma semilla el ruido repetiría
+    # los centros y acercaría rostros de identidades distintas
+    rng = np.random.default_rng([seed, 1])
+    centers = identity_centers(identities, dim, seed)
+    labels = np.repeat(np.arange(identities), faces_per_identity)
+    faces = centers[labels] + rng.normal(scale=noise, size=(len(labels), dim)).astype(np.float32)
+    faces /= np.linalg.norm(faces, axis=1, keepdims=True)
+    order = rng.permutation(len(faces))
+    return faces[order], labels[order]
+
+def synthetic_embeddings(identities: int, faces_per_identity: int, dim: int = DIM,
+                         noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    return labelled_embeddings(identities, faces_per_identity, dim, noise, seed)[0]
+
+def image_name(index: int, identities: Sequence[int]) -> str:
+    """
+    File name encoding the identities in the image: ``000042_id7-id19.jpg``.
+    """
+    return f"{index:06d}_" + "-".join(f"id{identity}" for identity in identities) + ".jpg"
+
+def parse_identities(filename: str) -> List[int]:
+    tag = os.path.splitext(os.path.basename(filename))[0].rsplit('_', 1)[-1]
+    return [int(part[2:]) for part in tag.split('-') if part.startswith('id')]
+
+def write_image_folder(folder: str, images: int, identities: int, multi_face_ratio: float = 0.1,
+                       no_face_ratio: float = 0.02, size: int = 32, seed: int = 0) -> List[str]:
+    """
+    Fill ``folder`` with small, distinct JPEGs whose names say which
+    identities they show (``_none`` means no face). Returns the names.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for index in range(images):
+        draw = rng.random()
+        if draw < no_face_ratio:
+            people: List[int] = []
+        elif draw < no_face_ratio + multi_face_ratio:
+            people = sorted(rng.choice(identities, size=2, replace=False).tolist())
+        else:
+            people = [int(rng.integers(identities))]
+        name = image_name(index, people) if people else f"{index:06d}_none.jpg"
+        pixels = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(os.path.join(folder, name), quality=75)
+        names.append(name)
+    return names
+
+class StubEmbeddingBackend:
+    """
+    Drop-in replacement for ``app.extraction.embed_images`` that derives each
+    face from the file name (identity center plus noise seeded by the name),
+    so results are deterministic and no model is loaded. Install it with
+    ``install()``; it only applies to in-process extraction (``workers=1``).
+    """
+
+    def __init__(self, identities: int, dim: int = DIM, noise: float = 0.06, seed: int = 0):
+        self.centers = identity_centers(identities, dim, seed)
+        self.noise = noise
+        self.calls = 0
+
+    def __call__(self, image_paths: Sequence[str], settings: Dict):
+        from app.extraction import STATUS_NO_FACE, STATUS_OK
+        self.calls += 1
+        results = []
+        for image_path in image_paths:
+            people = parse_identities(image_path)
+            if not people:
+                results.append((STATUS_NO_FACE, []))
+                continue
+            rng = np.random.default_rng(zlib.crc32(os.path.basename(image_path).encode('utf-8')))
+            faces = []
+            for n, identity in enumerate(people):
+                vector = self.centers[identity] + rng.normal(scale=self.noise, size=self.centers.shape[1])
+                vector = (vector / np.linalg.norm(vector)).astype(np.float32)
+                faces.append({
+                    'embedding': vector,
+                    'facial_area': {'x': 40 * n, 'y': 0, 'w': 32, 'h': 32, 'left_eye': None, 'right_eye': None},
+                    'confidence': 0.99
+                })
+            results.append((STATUS_OK, faces))
+        return results
+
+    def install(self):
+        import app.extraction
+        app.extraction.embed_images = self
+        return self
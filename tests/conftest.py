@@ -0,0 +1,23 @@
+import logging
+import pytest
+import app.extraction
+from benchmarks.synthetic import StubEmbeddingBackend
+
+IDENTITIES = 12
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # La app guarda su estado relativo al directorio de trabajo
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def stub_backend(monkeypatch):
+    """
+    Deterministic embeddings derived from file names (no models); only for
+    in-process extraction, so runs must use ``workers=1``.
+    """
+    logging.getLogger("app").setLevel(logging.WARNING)
+    backend = StubEmbeddingBackend(IDENTITIES, noise=0.02)
+    monkeypatch.setattr(app.extraction, "embed_images", backend)
+    return backend
@@ -0,0 +1,43 @@
+import numpy as np
+from app.ann import IVFIndex
+from app.groups import FaceGroups
+from benchmarks.ann_benchmark import build_groups
+from benchmarks.report import pairwise_scores
+from benchmarks.synthetic import labelled_embeddings, synthetic_embeddings
+
+def test_untrained_index_defers_to_exact_search():
+    index = IVFIndex(min_train_size=4)
+    groups = FaceGroups(index=index)
+    for seed in range(3):
+        groups.add_group(f"person_{seed + 1}", np.random.default_rng(seed).normal(size=8))
+    assert not index.trained and index.probes == 0
+    assert index.candidates(groups.centroids[0]) is None
+    assert groups.match(groups.centroids[1], 0.6) == 1
+
+def test_probes_scale_with_lists():
+    vectors = labelled_embeddings(400, 1)[0]
+    index = IVFIndex()
+    index.train(vectors)
+    assert len(index.coarse) == 20
+    assert index.probes == 10
+    assert IVFIndex(nprobe=3).probes == 0
+    index.nprobe = 3
+    assert index.probes == 3
+
+def test_updates_move_groups_between_lists():
+    vectors = labelled_embeddings(300, 1)[0]
+    index = IVFIndex(nprobe=1)
+    index.train(vectors)
+    before = int(np.argmax(index.coarse @ vectors[0]))
+    after = int(np.argmin(index.coarse @ vectors[0]))
+    index.update(0, index.coarse[after])
+    assert 0 in index.candidates(index.coarse[after])
+    assert 0 not in index.candidates(index.coarse[before])
+
+def test_default_probes_keep_exact_grouping():
+    embeddings = synthetic_embeddings(2000, 4)
+    exact, exact_labels, _ = build_groups(embeddings, 0.6)
+    approximate, ann_labels, _ = build_groups(embeddings, 0.6, IVFIndex())
+    assert approximate.index.trained
+    assert len(approximate) - len(exact) <= 40
+    assert pairwise_scores(exact_labels, ann_labels)['recall'] >= 0.99
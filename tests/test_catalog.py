@@ -0,0 +1,63 @@
+import os
+import app.embedding_cache
+from app.catalog import Catalog
+from app.embedding_cache import EmbeddingCache, hash_file
+from app.grouping import group_faces
+from app.store import ResultsStore
+from benchmarks.synthetic import write_image_folder
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def test_content_hashes_survive_restart(workdir, monkeypatch):
+    os.makedirs("inputs")
+    _write("inputs/a.jpg", b"first")
+    _write("inputs/b.jpg", b"second")
+    store = ResultsStore("store")
+    cache = EmbeddingCache("cache.sqlite3")
+    assert Catalog("inputs", "groups", store, cache).find_by_hash(hash_file("inputs/b.jpg")) == "b.jpg"
+    cache.close()
+
+    # Tras reiniciar no se vuelve a leer ningún archivo sin cambios
+    read = []
+    monkeypatch.setattr(app.embedding_cache, "hash_file", lambda path: read.append(path) or hash_file(path))
+    cache = EmbeddingCache("cache.sqlite3")
+    catalog = Catalog("inputs", "groups", store, cache)
+    assert catalog.find_by_hash(hash_file("inputs/a.jpg")) == "a.jpg"
+    assert read == []
+
+    _write("inputs/b.jpg", b"changed!")
+    catalog.reload()
+    assert catalog.find_by_hash(hash_file("inputs/b.jpg")) == "b.jpg"
+    assert read == [os.path.abspath("inputs/b.jpg")]
+    cache.close()
+    store.close()
+
+def test_status_is_answered_from_memory(workdir, stub_backend, monkeypatch):
+    names = write_image_folder("inputs", 20, len(stub_backend.centers))
+    store = ResultsStore("store")
+    catalog = Catalog("inputs", "groups", store)
+    assert (catalog.input_count, catalog.group_count, catalog.results) == (20, 0, None)
+
+    results = group_faces("inputs", "groups", use_cache=False, workers=1, store=store)
+    catalog.set_results(results)
+    _write("inputs/new.jpg", b"new")
+    catalog.add_input("new.jpg")
+    catalog.remove_input(names[0])
+    os.remove(os.path.join("inputs", names[0]))
+
+    # Tras cargarse, las consultas no vuelven a leer el disco ni el store
+    with monkeypatch.context() as patched:
+        patched.setattr(os, "listdir", None)
+        patched.setattr(store, "results", None)
+        assert catalog.input_count == 20
+        assert catalog.group_count == len(results['groups'])
+        assert catalog.grouped_count == sum(group['count'] for group in results['groups'])
+        assert catalog.results['stats'] == results['stats'] and 'processed_files' not in catalog.results
+
+    # Un catálogo nuevo llega al mismo estado desde el disco y el store
+    reloaded = Catalog("inputs", "groups", store)
+    assert reloaded.inputs_page()[0] == catalog.inputs_page()[0]
+    assert reloaded.groups() == catalog.groups()
+    store.close()
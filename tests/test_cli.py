@@ -0,0 +1,44 @@
+import os
+from app.cli import run_group, run_merge
+from app.store import ResultsStore
+from app.workspaces import workspace_paths
+from benchmarks.synthetic import write_image_folder
+
+def test_shards_cover_every_image_once_and_merge(workdir, stub_backend):
+    names = write_image_folder("archive/a", 40, len(stub_backend.centers))
+    names += write_image_folder("archive/b", 40, len(stub_backend.centers), seed=1)
+    shards = [f"runs/shard-{i}" for i in range(3)]
+    for i, output in enumerate(shards):
+        run_group(["archive"], output, recursive=True, shard=(i, 3), workers=1, use_cache=False)
+
+    selected = [set(os.listdir(workspace_paths(output)['inputs'])) for output in shards]
+    assert sum(len(files) for files in selected) == len(names)
+    assert len(set().union(*selected)) == len(names)
+
+    merged = run_merge(shards, "runs/merged")
+    store = ResultsStore(workspace_paths("runs/merged")['store'])
+    try:
+        seen = store.seen_files()
+    finally:
+        store.close()
+    assert len(seen) == len(names)
+    assert merged['stats']['processed'] + merged['stats']['no_face'] == len(names)
+    # Las identidades repartidas entre shards quedan unidas en un solo grupo
+    assert merged['stats']['total_groups'] < merged['stats']['shard_groups']
+    grouped = [image for group in merged['groups'] for image in group['images']]
+    assert len(set(grouped)) == merged['stats']['processed']
+
+def test_merge_skips_empty_shards(workdir, stub_backend):
+    names = write_image_folder("archive", 2, len(stub_backend.centers), no_face_ratio=0.0)
+    write_image_folder("blank", 1, len(stub_backend.centers), no_face_ratio=1.0)
+    shards = [f"runs/shard-{i}" for i in range(4)]
+    outcomes = [run_group(["archive"], output, shard=(i, 4), workers=1, use_cache=False)['success']
+                for i, output in enumerate(shards)]
+    assert not all(outcomes)
+    # Un shard con imágenes pero sin rostros sí guarda resultados
+    run_group(["blank"], "runs/blank", workers=1, use_cache=False)
+
+    merged = run_merge(shards + ["runs/blank"], "runs/merged")
+    assert merged['stats']['shards'] == outcomes.count(True) + 1
+    assert merged['stats']['processed'] == len(names)
+    assert merged['stats']['no_face'] == 1
@@ -0,0 +1,48 @@
+import numpy as np
+from app.clustering import cluster_embeddings
+from benchmarks.synthetic import labelled_embeddings
+
+def _components(embeddings, threshold):
+    # Referencia: componentes conexas sobre la matriz de similitudes completa
+    adjacency = embeddings @ embeddings.T > threshold
+    labels = np.full(len(embeddings), -1)
+    count = 0
+    for start in range(len(embeddings)):
+        if labels[start] >= 0:
+            continue
+        stack = [start]
+        labels[start] = count
+        while stack:
+            node = stack.pop()
+            for neighbor in np.nonzero(adjacency[node] & (labels < 0))[0]:
+                labels[neighbor] = count
+                stack.append(neighbor)
+        count += 1
+    return labels
+
+def test_tiled_passes_match_connected_components():
+    embeddings, identities = labelled_embeddings(40, 5)
+    # Bloques pequeños: los vecinos quedan repartidos entre muchos bloques
+    labels = cluster_embeddings(embeddings, 0.6, tile_size=16)
+    assert np.array_equal(labels, _components(embeddings, 0.6))
+    assert np.array_equal(labels, cluster_embeddings(embeddings, 0.6))
+    # Etiquetas por orden de aparición, una por identidad
+    assert labels[0] == 0 and np.all(np.diff(np.maximum.accumulate(labels)) <= 1)
+    assert len(set(zip(labels.tolist(), identities.tolist()))) == 40 == labels.max() + 1
+
+def test_partition_does_not_depend_on_order():
+    embeddings = labelled_embeddings(30, 4)[0]
+    order = np.random.default_rng(1).permutation(len(embeddings))
+    labels = cluster_embeddings(embeddings, 0.6)
+    shuffled = cluster_embeddings(embeddings[order], 0.6)
+    assert len({(a, b) for a, b in zip(labels[order].tolist(), shuffled.tolist())}) == labels.max() + 1
+
+def test_border_faces_join_their_most_similar_core():
+    # Dos núcleos de 6 rostros (0-5 y 109-114 grados), un rostro a 56.5 grados,
+    # vecino de los dos con umbral 0.6, y uno aislado
+    degrees = np.radians([0, 1, 2, 3, 4, 5, 56.5, 109, 110, 111, 112, 113, 114, 250])
+    embeddings = np.stack([np.cos(degrees), np.sin(degrees)], axis=1).astype(np.float32)
+    assert cluster_embeddings(embeddings, 0.6).tolist() == [0] * 13 + [1]
+    # Con min_samples=5 el del medio es borde: no une los núcleos, se suma al más parecido
+    labels = cluster_embeddings(embeddings, 0.6, min_samples=5, tile_size=4)
+    assert labels.tolist() == [0] * 7 + [1] * 6 + [2]
@@ -0,0 +1,58 @@
+import numpy as np
+from PIL import Image
+from app.decoding import DecodedImage, crop_face, decode_image, iter_decoded
+
+def _save(path, size, color=(255, 0, 0), orientation=None):
+    image = Image.new("RGB", size, color)
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    image.save(path, "PNG", exif=exif)
+    return str(path)
+
+def test_large_images_are_downscaled_for_detection(tmp_path):
+    decoded = decode_image(_save(tmp_path / "wide.png", (4000, 1000)), max_side=1600)
+    assert decoded.full.shape == (1000, 4000, 3)
+    assert decoded.detection.shape == (400, 1600, 3)
+    assert decoded.scale == 2.5
+    # BGR, como lo espera OpenCV/DeepFace
+    assert decoded.full[0, 0].tolist() == [0, 0, 255]
+
+    small = decode_image(_save(tmp_path / "small.png", (800, 600)), max_side=1600)
+    assert small.scale == 1.0 and small.detection is small.full
+
+def test_exif_orientation_is_applied(tmp_path):
+    # Orientación 6: la imagen se muestra girada 90 grados
+    decoded = decode_image(_save(tmp_path / "rotated.png", (300, 200), orientation=6), max_side=150)
+    assert decoded.full.shape[:2] == (300, 200)
+    assert decoded.detection.shape[:2] == (150, 100)
+
+def test_detection_coordinates_map_to_the_original():
+    full = np.zeros((1000, 4000, 3), dtype=np.uint8)
+    decoded = DecodedImage(full, full[::2, ::2], 2.5)
+    area = {'x': 10, 'y': 21, 'w': 40, 'h': 41, 'left_eye': (30, 33), 'right_eye': None}
+    assert decoded.to_original(area) == {'x': 25, 'y': 52, 'w': 100, 'h': 102,
+                                         'left_eye': [75, 82], 'right_eye': None}
+    assert DecodedImage(full, full, 1.0).to_original(area) == area
+
+def test_crops_come_from_the_full_image():
+    image = np.arange(100 * 120 * 3, dtype=np.uint32).reshape(100, 120, 3).astype(np.uint8)
+    area = {'x': 30, 'y': 20, 'w': 40, 'h': 50}
+    assert np.array_equal(crop_face(image, area), image[20:70, 30:70])
+    # Ojos ya nivelados: el giro es nulo y el recorte coincide
+    level = dict(area, left_eye=(60, 40), right_eye=(40, 40))
+    aligned = crop_face(image, level)
+    assert aligned.shape == (50, 40, 3)
+    assert np.array_equal(aligned, image[20:70, 30:70])
+    tilted = crop_face(image, dict(area, left_eye=(60, 50), right_eye=(40, 40)))
+    assert tilted.shape == (50, 40, 3) and not np.array_equal(tilted, aligned)
+
+def test_decoding_keeps_input_order_and_reports_failures(tmp_path):
+    paths = [_save(tmp_path / f"{i}.png", (10 + i, 10)) for i in range(5)]
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    paths.insert(2, str(broken))
+    decoded = list(iter_decoded(paths, prefetch=3))
+    assert [path for path, _ in decoded] == paths
+    assert isinstance(decoded[2][1], Exception)
+    assert [result.full.shape[1] for path, result in decoded if path != str(broken)] == [10, 11, 12, 13, 14]
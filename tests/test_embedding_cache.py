@@ -0,0 +1,64 @@
+import shutil
+import types
+import numpy as np
+import app.embedding_cache
+from app.embedding_cache import EmbeddingCache
+from app.grouping import group_faces
+from app.store import ResultsStore
+from benchmarks.synthetic import write_image_folder
+
+def _faces(seed, count=1):
+    rng = np.random.default_rng(seed)
+    return [{'embedding': rng.normal(size=4).astype(np.float32), 'facial_area': {'x': i}, 'confidence': 0.9}
+            for i in range(count)]
+
+def test_hits_misses_and_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    key = cache.make_key("abc", {'model_name': "Facenet"})
+    assert key != cache.make_key("abc", {'model_name': "ArcFace"})
+    assert cache.get(key) == (False, [])
+
+    faces = _faces(0, count=2)
+    cache.put(key, faces)
+    cache.put(cache.make_key("empty", {}), [])
+    found, cached = cache.get(key)
+    assert found and [face['facial_area'] for face in cached] == [{'x': 0}, {'x': 1}]
+    assert all(np.array_equal(a['embedding'], b['embedding']) for a, b in zip(cached, faces))
+    # "Sin rostro" también queda en el cache
+    assert cache.get(cache.make_key("empty", {})) == (True, [])
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+    cache.close()
+
+    reopened = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    assert reopened.get(key)[0] and reopened.stats()['entries'] == 2
+    reopened.close()
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(app.embedding_cache, "time", types.SimpleNamespace(time=lambda: next(clock)))
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.put("a", _faces(1))
+    cache.put("b", _faces(2))
+    cache.get("a")
+    cache.put("c", _faces(3))
+
+    assert cache.get("b") == (False, [])
+    assert cache.get("a")[0] and cache.get("c")[0]
+    assert cache.stats()['evictions'] == 1 and cache.stats()['entries'] == 2
+    cache.close()
+
+def test_renamed_images_are_served_from_the_cache(workdir, stub_backend):
+    write_image_folder("inputs", 15, len(stub_backend.centers))
+    cache = EmbeddingCache("cache.sqlite3")
+    first = group_faces("inputs", "groups", workers=1, store=ResultsStore("store"), cache=cache)
+    assert first['stats']['embedding_cache']['misses'] == 15
+
+    shutil.copytree("inputs", "renamed")
+    for path in sorted((workdir / "renamed").iterdir()):
+        path.rename(path.with_name("copy_" + path.name))
+    second = group_faces("renamed", "groups2", workers=1, store=ResultsStore("store2"), cache=cache)
+    assert second['stats']['embedding_cache']['hits'] == 15
+    assert second['stats']['embedding_cache']['misses'] == 0
+    assert ({frozenset(name[len("copy_"):] for name in group['images']) for group in second['groups']}
+            == {frozenset(group['images']) for group in first['groups']})
+    cache.close()
@@ -0,0 +1,113 @@
+import sys
+import types
+import numpy as np
+import pytest
+import app.extraction as extraction
+from app.decoding import DecodedImage
+from app.extraction import _detect_faces, _filter_faces
+from app.grouping import DETECTOR_CASCADES, embedding_settings
+
+def _decoded(height, width, detection_height, detection_width, scale):
+    # Solo importan las formas: arrays sin memoria propia
+    full = np.broadcast_to(np.zeros((1, 1, 3), dtype=np.uint8), (height, width, 3))
+    detection = np.broadcast_to(np.zeros((1, 1, 3), dtype=np.uint8), (detection_height, detection_width, 3))
+    return DecodedImage(full, detection, scale)
+
+def _face(x, y, w, h, confidence):
+    return {'facial_area': {'x': x, 'y': y, 'w': w, 'h': h, 'left_eye': None, 'right_eye': None},
+            'confidence': confidence}
+
+OPENCV = {'backend': 'opencv', 'min_confidence': 0.0, 'escalate_below': 0.0}
+
+def test_whole_frame_is_rejected_with_non_integer_scale():
+    # 6000x3988 detectado a 1600x1063 (escala 3.75): el cuadro mapeado mide 3986 de alto
+    decoded = _decoded(3988, 6000, 1063, 1600, 3.75)
+    assert decoded.to_original({'h': 1063})['h'] < 3988 - 1
+    kept = _filter_faces([_face(0, 0, 1600, 1063, 0.0)], decoded, OPENCV, embedding_settings())
+    assert kept == []
+
+def test_faces_are_filtered_and_mapped_to_original_coordinates():
+    decoded = _decoded(3988, 6000, 1063, 1600, 3.75)
+    stage = {'backend': 'retinaface', 'min_confidence': 0.5, 'escalate_below': 0.0}
+    faces = [_face(100, 200, 40, 40, 0.99), _face(300, 300, 40, 40, 0.2), _face(500, 500, 5, 5, 0.99)]
+    kept = _filter_faces(faces, decoded, stage, embedding_settings())
+    assert kept == [({'x': 375, 'y': 750, 'w': 150, 'h': 150, 'left_eye': None, 'right_eye': None}, 0.99)]
+
+@pytest.fixture
+def fake_detectors(monkeypatch):
+    """
+    A stand-in for DeepFace's detectors: ``answers[backend]`` is what each
+    backend returns; calls are recorded in order.
+    """
+    answers, calls = {}, []
+
+    def extract_faces(img_path, detector_backend, enforce_detection, align):
+        calls.append(detector_backend)
+        return answers[detector_backend]
+
+    preprocessing = types.SimpleNamespace(resize_image=lambda img, target_size: img[np.newaxis],
+                                          normalize_input=lambda img, normalization: img)
+    deepface = types.ModuleType("deepface")
+    deepface.DeepFace = types.SimpleNamespace(extract_faces=extract_faces)
+    deepface.modules = types.SimpleNamespace(preprocessing=preprocessing)
+    monkeypatch.setitem(sys.modules, "deepface", deepface)
+    monkeypatch.setitem(sys.modules, "deepface.modules", deepface.modules)
+    return answers, calls
+
+def _image():
+    full = np.zeros((400, 600, 3), dtype=np.uint8)
+    return DecodedImage(full, full, 1.0)
+
+def test_accurate_cascade_falls_back_only_without_faces(fake_detectors):
+    answers, calls = fake_detectors
+    settings = embedding_settings("accurate")
+    answers['retinaface'] = [_face(10, 10, 80, 80, 0.3)]
+    answers['opencv'] = [_face(0, 0, 600, 400, 0.0), _face(200, 100, 60, 60, 4.0)]
+
+    detected = _detect_faces(_image(), "a.jpg", settings, (160, 160))
+    assert calls == ["retinaface", "opencv"]
+    assert [(area['x'], confidence) for _, area, confidence in detected] == [(200, 4.0)]
+
+    calls.clear()
+    answers['retinaface'] = [_face(10, 10, 80, 80, 0.9)]
+    detected = _detect_faces(_image(), "a.jpg", settings, (160, 160))
+    assert calls == ["retinaface"]
+    assert len(detected) == 1
+
+def test_fast_cascade_escalates_doubtful_images(fake_detectors):
+    answers, calls = fake_detectors
+    settings = embedding_settings("fast")
+    assert settings['detector_cascade'] == DETECTOR_CASCADES['fast']
+    answers['opencv'] = [_face(10, 10, 80, 80, 2.0)]
+    answers['retinaface'] = [_face(12, 12, 78, 78, 0.95), _face(300, 100, 50, 50, 0.9)]
+
+    detected = _detect_faces(_image(), "a.jpg", settings, (160, 160))
+    assert calls == ["opencv", "retinaface"]
+    assert len(detected) == 2
+
+    calls.clear()
+    answers['opencv'] = [_face(10, 10, 80, 80, 9.0)]
+    assert len(_detect_faces(_image(), "a.jpg", settings, (160, 160))) == 1
+    assert calls == ["opencv"]
+
+def test_every_face_of_an_image_is_embedded(monkeypatch):
+    faces = {"two.jpg": 2, "none.jpg": 0, "broken.jpg": None, "one.jpg": 1}
+
+    def decode(image_paths, max_side):
+        for path in image_paths:
+            yield path, OSError("unreadable") if faces[path] is None else _image()
+
+    def detect(decoded, image_path, settings, target_size):
+        return [(np.full((1, 4), len(image_path) + n, dtype=np.float32), {'x': n}, 0.9)
+                for n in range(faces[image_path])]
+
+    model = types.SimpleNamespace(input_shape=(4, 4), model=lambda batch, training: batch)
+    monkeypatch.setattr(extraction, "iter_decoded", decode)
+    monkeypatch.setattr(extraction, "_detect_faces", detect)
+    monkeypatch.setattr(extraction, "load_model", lambda settings: model)
+
+    results = extraction.embed_images(list(faces), embedding_settings())
+    assert [status for status, _ in results] == [extraction.STATUS_OK, extraction.STATUS_NO_FACE,
+                                                 extraction.STATUS_ERROR, extraction.STATUS_OK]
+    assert [[face['facial_area'] for face in found] for _, found in results] == [[{'x': 0}, {'x': 1}], [], [], [{'x': 0}]]
+    assert all(np.isclose(np.linalg.norm(face['embedding']), 1.0) for _, found in results for face in found)
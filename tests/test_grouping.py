@@ -0,0 +1,81 @@
+import os
+import shutil
+from app.extraction import STATUS_ERROR
+from app.grouping import group_faces
+from app.store import ResultsStore
+from benchmarks.synthetic import write_image_folder
+
+def _partition(results):
+    return {frozenset(group['images']) for group in results['groups']}
+
+def _group(input_folder, name, **params):
+    return group_faces(input_folder, f"{name}_groups", use_cache=False, workers=1,
+                       store=ResultsStore(f"{name}_store"), **params)
+
+def test_incremental_run_matches_full_rebuild(workdir, stub_backend):
+    names = write_image_folder("inputs", 80, len(stub_backend.centers))
+    os.makedirs("later")
+    for name in names[40:]:
+        shutil.move(os.path.join("inputs", name), os.path.join("later", name))
+
+    first = _group("inputs", "incremental")
+    assert first['mode'] == "full"
+    for name in names[40:]:
+        shutil.move(os.path.join("later", name), os.path.join("inputs", name))
+    second = _group("inputs", "incremental")
+    full = _group("inputs", "full", mode="full")
+
+    assert second['mode'] == "incremental"
+    assert second['stats']['already_grouped'] == 40
+    assert second['stats']['processed'] + second['stats']['no_face'] == 40
+    assert _partition(second) == _partition(full)
+    # Cada grupo reúne una sola identidad
+    assert len(full['groups']) == len({identity for name in names for identity in name[7:-4].split('-')
+                                       if identity != "none"})
+
+def test_failed_images_are_retried(workdir, stub_backend, monkeypatch):
+    names = write_image_folder("inputs", 20, len(stub_backend.centers), no_face_ratio=0.0)
+    broken = names[3]
+
+    def flaky(image_paths, settings):
+        results = stub_backend(image_paths, settings)
+        return [(STATUS_ERROR, []) if os.path.basename(path) == broken else result
+                for path, result in zip(image_paths, results)]
+
+    monkeypatch.setattr("app.extraction.embed_images", flaky)
+    first = _group("inputs", "run")
+    assert first['error_files'] == [broken]
+    assert first['stats']['no_face'] == 0
+
+    monkeypatch.setattr("app.extraction.embed_images", stub_backend)
+    second = _group("inputs", "run")
+    assert second['stats']['processed'] == 1
+    assert second['stats']['errors'] == 0
+    assert any(broken in group['images'] for group in second['groups'])
+
+def test_failed_full_rebuild_keeps_previous_results(workdir, stub_backend, monkeypatch):
+    write_image_folder("inputs", 30, len(stub_backend.centers))
+    first = _group("inputs", "run")
+    folders = sorted(os.listdir("run_groups"))
+
+    def crash(image_paths, settings):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr("app.extraction.embed_images", crash)
+    store = ResultsStore("run_store")
+    try:
+        group_faces("inputs", "run_groups", use_cache=False, workers=1, store=store, mode="full")
+    except RuntimeError:
+        pass
+    store.rollback()
+
+    assert sorted(os.listdir("run_groups")) == folders
+    assert _partition(store.results()) == _partition(first)
+    assert len(store.embeddings()) == first['stats']['faces_detected']
+
+    # La siguiente reconstrucción completa reemplaza la carpeta sin dejar restos
+    monkeypatch.setattr("app.extraction.embed_images", stub_backend)
+    full = group_faces("inputs", "run_groups", use_cache=False, workers=1, store=store, mode="full")
+    assert _partition(full) == _partition(first)
+    assert sorted(os.listdir(".")) == ["inputs", "run_groups", "run_store"]
+    assert all(os.path.exists(path) for record in full['processed_files'].values() for path in record['paths'])
@@ -0,0 +1,45 @@
+import numpy as np
+from app.groups import FaceGroups
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_match_picks_the_most_similar_group_above_threshold():
+    groups = FaceGroups()
+    assert groups.match(_unit([1, 0, 0]), 0.6) is None
+    groups.add_group("person_1", _unit([1, 0, 0]))
+    groups.add_group("person_2", _unit([0, 1, 0]))
+    groups.add_group("person_3", _unit([1, 0, 0]))
+
+    assert groups.match(_unit([0.2, 1, 0]), 0.6) == 1
+    # Empate entre grupos idénticos: gana el más antiguo
+    assert groups.match(_unit([1, 0.1, 0]), 0.6) == 0
+    assert groups.match(_unit([0, 0, 1]), 0.6) is None
+    # Sin normalizar da lo mismo: se compara por coseno
+    assert groups.match(np.array([0, 5, 0], dtype=np.float32), 0.6) == 1
+
+def test_centroids_follow_the_running_mean_past_capacity():
+    rng = np.random.default_rng(0)
+    embeddings = [rng.normal(size=16).astype(np.float32) for _ in range(200)]
+    groups = FaceGroups(capacity=2)
+    assigned = {}
+    for i, embedding in enumerate(embeddings):
+        idx = i % 70
+        if idx == len(groups):
+            groups.add_group(f"person_{idx + 1}", embedding)
+        else:
+            groups.update(idx, embedding)
+        assigned.setdefault(idx, []).append(embedding)
+
+    assert len(groups) == 70 and groups.dim == 16
+    for idx, members in assigned.items():
+        mean = np.sum(members, axis=0)
+        assert np.allclose(groups.centroids[idx], mean / np.linalg.norm(mean), atol=1e-5)
+        assert groups.counts[idx] == len(members)
+        assert np.allclose(groups.sums[idx], mean, atol=1e-4)
+
+    restored = FaceGroups.from_arrays(groups.names, groups.images, groups.sums, groups.counts)
+    assert np.allclose(restored.centroids, groups.centroids, atol=1e-6)
+    query = embeddings[5] + 0.01
+    assert restored.match(query, 0.0) == groups.match(query, 0.0)
@@ -0,0 +1,59 @@
+import threading
+from app.jobs import COMPLETED, JobManager
+
+class BlockingRunner:
+    """
+    Records the order jobs start in and holds each one until released.
+    """
+
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+        self.first_started = threading.Event()
+
+    def __call__(self, progress_callback=None, name=None):
+        with self._lock:
+            self.started.append(name)
+        self.first_started.set()
+        self.release.wait(5)
+        return {'success': True, 'name': name}
+
+def _wait(jobs):
+    for job in jobs:
+        for _ in range(500):
+            if job.finished:
+                break
+            threading.Event().wait(0.01)
+    assert all(job.status == COMPLETED for job in jobs)
+
+def test_identical_pending_jobs_are_reused():
+    runner = BlockingRunner()
+    manager = JobManager(runner)
+    first, created = manager.submit({'name': "a"}, queue="one")
+    again, created_again = manager.submit({'name': "a"}, queue="one")
+    other_queue, created_other = manager.submit({'name': "a"}, queue="two")
+
+    assert created and not created_again and created_other
+    assert again is first and other_queue is not first
+    runner.release.set()
+    _wait([first, other_queue])
+    # Terminado el trabajo, los mismos parámetros vuelven a encolarse
+    _, created_after = manager.submit({'name': "a"}, queue="one")
+    assert created_after
+
+def test_queues_are_served_round_robin():
+    runner = BlockingRunner()
+    manager = JobManager(runner, max_concurrent=1)
+    blocker, _ = manager.submit({'name': "blocker"}, queue="busy")
+    assert runner.first_started.wait(5)
+
+    jobs = [manager.submit({'name': f"busy-{i}"}, queue="busy")[0] for i in range(3)]
+    jobs.append(manager.submit({'name': "quiet-0"}, queue="quiet")[0])
+    jobs.append(manager.submit({'name': "other-0"}, queue="other")[0])
+    runner.release.set()
+    _wait([blocker] + jobs)
+
+    # Tras el primer trabajo de "busy", las colas que esperan pasan antes que su backlog
+    assert runner.started[:3] == ["blocker", "quiet-0", "other-0"]
+    assert runner.started[3:] == ["busy-0", "busy-1", "busy-2"]
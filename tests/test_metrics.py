@@ -0,0 +1,91 @@
+import threading
+from app.grouping import group_faces
+from app.metrics import Registry
+from app.store import ResultsStore
+from benchmarks.synthetic import write_image_folder
+
+def test_render_uses_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc(route='/a"b')
+    requests.inc(2, route="/c")
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/a\\"b"} 1' in lines
+    assert 'requests_total{route="/c"} 2' in lines
+    # Buckets acumulados, +Inf igual al total
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 4.05" in lines
+    assert "latency_seconds_count 4" in lines
+
+def test_summary_since_snapshot_and_quantiles():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.00001, 0.001, 0.1))
+    latency.observe(0.05)
+    before = registry.snapshot()
+    for _ in range(9):
+        latency.observe(0.000005)
+    latency.observe(0.0005)
+
+    entry = registry.summary(since=before)["latency_seconds"]["total"]
+    assert entry["count"] == 10
+    assert entry["p50_seconds"] == 0.00001
+    assert entry["p95_seconds"] == 0.001
+
+def test_drained_worker_metrics_merge_into_parent():
+    parent, worker = Registry(), Registry()
+    for registry in (parent, worker):
+        registry.counter("images_total", "Images", ("status",))
+    worker.metrics()[0].inc(3, status="ok")
+    parent.merge(worker.drain())
+    parent.merge(worker.drain())
+    assert parent.summary() == {"images_total": {"ok": 3}}
+
+def test_run_registry_only_sees_its_own_context():
+    registry = Registry()
+    counter = registry.counter("events_total", "Events")
+    results = {}
+
+    def work(name, count):
+        with registry.run() as run:
+            for _ in range(count):
+                counter.inc()
+            results[name] = run.summary()
+
+    threads = [threading.Thread(target=work, args=(name, count)) for name, count in (("a", 3), ("b", 5))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc()
+
+    assert results == {"a": {"events_total": {"total": 3}}, "b": {"events_total": {"total": 5}}}
+    assert registry.summary() == {"events_total": {"total": 9}}
+
+def test_concurrent_grouping_runs_report_their_own_stages(workdir, stub_backend):
+    identities = len(stub_backend.centers)
+    write_image_folder("first", 60, identities)
+    write_image_folder("second", 20, identities, seed=1)
+    results = {}
+
+    def run(name):
+        results[name] = group_faces(name, f"{name}_groups", use_cache=False, workers=1,
+                                    store=ResultsStore(f"{name}_store"))
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("first", "second")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, images in (("first", 60), ("second", 20)):
+        stages = results[name]['stats']['stages']
+        assert sum(stages['images_grouped_total'].values()) == images
+        # Las etapas por rostro duran microsegundos: p50 por debajo del milisegundo
+        assert stages['grouping_stage_seconds']['matching']['p50_seconds'] < 0.001
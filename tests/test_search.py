@@ -0,0 +1,50 @@
+import os
+import shutil
+import numpy as np
+from app.grouping import group_faces
+from app.search import FaceSearchIndex
+from app.store import ResultsStore
+from benchmarks.synthetic import parse_identities, write_image_folder
+
+def _run(store, **params):
+    return group_faces("inputs", "groups", use_cache=False, workers=1, store=store, **params)
+
+def test_index_follows_incremental_and_full_runs(workdir, stub_backend, monkeypatch):
+    names = write_image_folder("inputs", 40, len(stub_backend.centers), multi_face_ratio=0.0)
+    os.makedirs("later")
+    for name in names[20:]:
+        shutil.move(os.path.join("inputs", name), os.path.join("later", name))
+    store = ResultsStore("store")
+    index = FaceSearchIndex(store)
+    _run(store)
+
+    query = stub_backend.centers[parse_identities(names[0])[0]]
+    found = index.search(query, top_k=3)
+    assert len(index) == len(store.embeddings())
+    assert parse_identities(found['images'][0]['filename']) == parse_identities(names[0])
+    assert found['groups'][0]['name'] == found['images'][0]['group']
+    assert [image['similarity'] for image in found['images']] == sorted(
+        (image['similarity'] for image in found['images']), reverse=True)
+
+    # Ejecución incremental: solo se leen las filas nuevas
+    for name in names[20:]:
+        shutil.move(os.path.join("later", name), os.path.join("inputs", name))
+    _run(store)
+    index.invalidate()
+    starts = []
+    face_owners = store.face_owners
+    monkeypatch.setattr(store, "face_owners", lambda start, end: starts.append(start) or face_owners(start, end))
+    faces_before = index.stats()['faces']
+    index.search(query)
+    assert starts == [faces_before]
+    assert len(index) == len(store.embeddings()) > faces_before
+    assert not index.stats()['stale']
+
+    # Reconstrucción completa: se vuelve a cargar todo, con los mismos rostros
+    full = _run(store, mode="full")
+    index.invalidate(full=True)
+    result = index.search(query, top_k=100, min_similarity=0.9)
+    assert starts[-1] == 0 and len(index) == len(store.embeddings())
+    group = next(group for group in full['groups'] if group['name'] == result['groups'][0]['name'])
+    assert {image['filename'] for image in result['images']} == set(group['images'])
+    assert np.array_equal(index._faces[0], np.asarray(store.embeddings()))
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+from app.groups import FaceGroups
+from app.store import ResultsStore
+
+def _vector(seed, dim=8):
+    vector = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def _add(store, groups, filename, seed):
+    embedding = _vector(seed)
+    idx = groups.match(embedding, 0.6)
+    if idx is None:
+        idx = groups.add_group(f"person_{len(groups) + 1}", embedding)
+    else:
+        groups.update(idx, embedding)
+    groups.images[idx].append(filename)
+    store.add_image(filename, [{'embedding': embedding, 'group_idx': idx,
+                                'facial_area': {'x': 0, 'y': 0, 'w': 10, 'h': 10}, 'confidence': 0.9}],
+                    [(idx, filename)])
+
+def test_rolled_back_run_leaves_committed_state(tmp_path):
+    store = ResultsStore(str(tmp_path / "store"))
+    groups = FaceGroups()
+    for i in range(3):
+        _add(store, groups, f"{i}.jpg", i)
+    store.save_groups(groups)
+    store.commit()
+    committed = store.load_groups()
+
+    # Ejecución que escribe todo y falla antes del commit
+    for i in range(3, 6):
+        _add(store, groups, f"{i}.jpg", i)
+    store.save_groups(groups)
+    store.rollback()
+
+    reloaded = store.load_groups()
+    assert reloaded.names == committed.names
+    assert np.allclose(reloaded.sums, committed.sums)
+    assert store.seen_files() == {"0.jpg", "1.jpg", "2.jpg"}
+    assert len(store.embeddings()) == 3
+
+def test_uncommitted_run_is_discarded_on_reopen(tmp_path):
+    path = str(tmp_path / "store")
+    store = ResultsStore(path)
+    groups = FaceGroups()
+    _add(store, groups, "a.jpg", 0)
+    store.save_groups(groups)
+    store.commit()
+
+    _add(store, groups, "b.jpg", 1)
+    store.save_groups(groups)
+    # Sin commit ni rollback: como si el proceso hubiera muerto
+    store._conn.close()
+
+    reopened = ResultsStore(path)
+    assert reopened.seen_files() == {"a.jpg"}
+    assert reopened.load_groups().names == ["person_1"]
+    assert len(reopened.embeddings()) == 1
+    reopened.close()
+
+def test_errors_are_not_seen(tmp_path):
+    store = ResultsStore(str(tmp_path / "store"))
+    store.add_no_face("empty.jpg")
+    store.add_error("broken.jpg")
+    store.commit()
+    assert store.seen_files() == {"empty.jpg"}
+    store.close()
+
+def test_cleared_run_keeps_committed_state_until_commit(tmp_path):
+    store = ResultsStore(str(tmp_path / "store"))
+    groups = FaceGroups()
+    for i in range(3):
+        _add(store, groups, f"{i}.jpg", i)
+    store.save_groups(groups)
+    store.commit()
+    committed = np.array(store.embeddings())
+
+    store.clear()
+    rebuilt = FaceGroups()
+    _add(store, rebuilt, "new.jpg", 7)
+    store.save_groups(rebuilt)
+    # Los lectores siguen viendo la ejecución confirmada
+    assert np.array_equal(store.embeddings(), committed)
+    store.rollback()
+    assert store.seen_files() == {"0.jpg", "1.jpg", "2.jpg"}
+    assert np.array_equal(store.embeddings(), committed)
+
+    store.clear()
+    _add(store, FaceGroups(), "new.jpg", 7)
+    store.commit()
+    assert store.seen_files() == {"new.jpg"}
+    assert np.allclose(store.embeddings(), _vector(7)[None])
+    store.reset()
+    assert store.seen_files() == set() and len(store.embeddings()) == 0
+    assert [name for name in os.listdir(store.path) if name.endswith(".f32")] == []
+    store.close()
@@ -0,0 +1,59 @@
+import io
+import os
+import pytest
+from PIL import Image
+
+@pytest.fixture
+def client(workdir):
+    from fastapi.testclient import TestClient
+    from app.views import app
+    return TestClient(app)
+
+def _jpeg(color, size=(16, 16)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+def _upload(client, workspace, files):
+    response = client.post(f"/upload?workspace={workspace}",
+                           files=[("files", (name, data, "image/jpeg")) for name, data in files])
+    assert response.status_code == 200
+    return response.json()
+
+def test_upload_skips_identical_content(client):
+    first = _upload(client, "dedup", [("a.jpg", _jpeg("red")), ("b.jpg", _jpeg("blue"))])
+    assert first['uploaded'] == ["a.jpg", "b.jpg"]
+
+    second = _upload(client, "dedup", [("copy.jpg", _jpeg("red")), ("a.jpg", _jpeg("green"))])
+    assert [entry['duplicate_of'] for entry in second['duplicates']] == ["a.jpg"]
+    # Mismo nombre con otro contenido: se guarda con otro nombre
+    assert second['renamed'] == [{"original": "a.jpg", "filename": "a-1.jpg"}]
+    assert sorted(os.listdir("workspaces/dedup/inputs")) == ["a-1.jpg", "a.jpg", "b.jpg"]
+
+def test_thumbnails_are_cached_and_revalidated(client):
+    _upload(client, "thumbs", [("wide.jpg", _jpeg("red", (600, 400)))])
+    url = "/input_thumbnail/wide.jpg?workspace=thumbs&size=128"
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers["content-type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(first.content)).size == (128, 85)
+    etag = first.headers["etag"]
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert client.get(url.replace("128", "100")).status_code == 400
+    assert len(os.listdir("workspaces/thumbs/thumbnails")) == 1
+
+    # Otro original con el mismo nombre: cambia el validador
+    path = "workspaces/thumbs/inputs/wide.jpg"
+    with open(path, "wb") as f:
+        f.write(_jpeg("blue", (300, 600)))
+    os.utime(path, ns=(1, 1))
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert Image.open(io.BytesIO(changed.content)).size == (64, 128)
+
+def test_reads_do_not_create_workspaces(client):
+    assert client.get("/status?workspace=ghost").status_code == 404
+    assert client.get("/input_images?workspace=ghost").status_code == 404
+    assert not os.path.exists("workspaces/ghost")
+    assert client.get("/status?workspace=bad!name").status_code == 400
@@ -0,0 +1,27 @@
+import io
+import os
+import zipfile
+from app.zipstream import iter_zip
+
+def test_streamed_archive_is_valid(tmp_path):
+    contents = {
+        "photo.jpg": os.urandom(300_000),
+        "notes.txt": b"face grouping\n" * 5000,
+        "empty.png": b""
+    }
+    entries = []
+    for name, data in contents.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        entries.append((f"person_1/{name}", str(path)))
+
+    chunks = list(iter_zip(entries, chunk_size=64 * 1024))
+    assert len(chunks) > 2
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == [arcname for arcname, _ in entries]
+        for name, data in contents.items():
+            assert archive.read(f"person_1/{name}") == data
+        # Las imágenes se guardan sin recomprimir; el resto se comprime
+        assert archive.getinfo("person_1/photo.jpg").compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo("person_1/notes.txt").compress_type == zipfile.ZIP_DEFLATED